@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    name = 'api'
+
+    def ready(self):
+        # Registra os receivers (fatos mensais etc.)
+        from . import signals  # noqa: F401
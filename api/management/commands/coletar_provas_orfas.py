@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from api.services.provas import provas_orfas, coletar_orfas
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove do armazenamento (e da tabela ArquivoProva) os arquivos de prova "
+        "que nenhum preenchimento referencia mais, em lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=200, help="Objetos por lote.")
+        parser.add_argument("--idade-minima-horas", type=int, default=24,
+                            help="Ignora objetos mais novos que isso (envios em andamento).")
+        parser.add_argument("--dry-run", action="store_true", help="Só reporta, não remove.")
+
+    def handle(self, *args, **opts):
+        idade = timedelta(hours=max(0, opts["idade_minima_horas"]))
+
+        if opts["dry_run"]:
+            resumo = provas_orfas(idade).aggregate(bytes=Sum('tamanho'))
+            total = provas_orfas(idade).count()
+            self.stdout.write(self.style.WARNING(
+                f"DRY-RUN: {total} objeto(s) órfão(s), {resumo['bytes'] or 0} bytes. Nada removido."
+            ))
+            return
+
+        def progresso(removidos):
+            self.stdout.write(f"Removidos até agora: {removidos}")
+
+        removidos = coletar_orfas(lote=max(1, opts["lote"]), idade_minima=idade, progresso=progresso)
+        self.stdout.write(self.style.SUCCESS(f"✔ Coleta concluída. removidos={removidos}"))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.services.estaticos import empacotar_front
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera o build do front: .js/.css com hash do conteúdo no nome, HTMLs "
+        "apontando para eles e variantes .gz/.br pré-comprimidas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--origem", default=settings.FRONTEND_DIR, help="Fontes do front.")
+        parser.add_argument("--destino", default=settings.FRONTEND_BUILD_DIR, help="Diretório do build.")
+        parser.add_argument("--sem-compressao", action="store_true", help="Não gera .gz/.br.")
+
+    def handle(self, *args, **opts):
+        manifesto = empacotar_front(opts["origem"], opts["destino"], comprimir_arquivos=not opts["sem_compressao"])
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Front empacotado em {opts['destino']}: {len(manifesto)} asset(s) com hash. "
+            "Reinicie os workers para passarem a servir o build."
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.services.auditoria import estruturar_logs
+
+
+class Command(BaseCommand):
+    help = (
+        "Preenche tipo_acao/indicador/indicador_nome/setor/competencia/valor dos logs de ação antigos "
+        "a partir do texto da mensagem, em lotes. Pode ser interrompido e executado de novo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=2000, help="Logs por SELECT/UPDATE.")
+
+    def handle(self, *args, **opts):
+        inicio = time.monotonic()
+        total = estruturar_logs(
+            lote=max(1, opts["lote"]),
+            progresso=lambda n: self.stdout.write(f"  {n} logs estruturados…"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {total} logs estruturados ({time.monotonic() - inicio:.2f}s)."
+        ))
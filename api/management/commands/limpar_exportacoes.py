@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.services.jobs_relatorios import limpar_exportacoes
+
+
+class Command(BaseCommand):
+    help = (
+        "Marca como falhos os jobs de exportação travados (REPORT_EXPORT_TIMEOUT) e apaga "
+        "jobs e arquivos mais velhos que REPORT_EXPORT_TTL_HORAS. Agende no crontab (ex.: '0 * * * *')."
+    )
+
+    def handle(self, *args, **opts):
+        removidos = limpar_exportacoes()
+        self.stdout.write(self.style.SUCCESS(f"✔ Limpeza concluída. jobs={removidos}"))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import ConfiguracaoArmazenamento
+from api.services.migracao_armazenamento import estimar, itens_a_migrar, migrar_armazenamento
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia os arquivos de prova de um armazenamento para outro (ex.: local → S3) "
+        "em paralelo e reescreve as URLs dos preenchimentos em lotes. Retomável: "
+        "o progresso fica em MigracaoArmazenamentoItem."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--origem", type=int, required=True, help="ID da ConfiguracaoArmazenamento de origem.")
+        parser.add_argument("--destino", type=int, help="ID do destino (padrão: a configuração ativa).")
+        parser.add_argument("--workers", type=int, default=16, help="Transferências simultâneas.")
+        parser.add_argument("--lote", type=int, default=500, help="Objetos por lote de reescrita de URLs.")
+        parser.add_argument("--dry-run", action="store_true", help="Só estima objetos e bytes, não copia.")
+
+    def handle(self, *args, **opts):
+        origem = ConfiguracaoArmazenamento.objects.filter(pk=opts["origem"]).first()
+        if opts["destino"]:
+            destino = ConfiguracaoArmazenamento.objects.filter(pk=opts["destino"]).first()
+        else:
+            destino = ConfiguracaoArmazenamento.objects.filter(ativo=True).first()
+        if origem is None or destino is None:
+            raise CommandError("Configuração de origem/destino não encontrada.")
+        if origem.pk == destino.pk:
+            raise CommandError("Origem e destino são a mesma configuração.")
+
+        workers = max(1, opts["workers"])
+        if opts["dry_run"]:
+            estimativa = estimar(origem, itens_a_migrar(origem), workers=workers)
+            self.stdout.write(self.style.WARNING(
+                f"DRY-RUN: {estimativa['objetos']} objeto(s), {estimativa['bytes']} bytes "
+                f"({estimativa['bytes'] / 1024 ** 3:.2f} GiB) de {origem.tipo}#{origem.pk} → {destino.tipo}#{destino.pk}. "
+                f"Inacessíveis na origem: {estimativa['inacessiveis']}. Nada copiado."
+            ))
+            return
+
+        inicio = time.monotonic()
+
+        def progresso(migrados, falhas, total):
+            self.stdout.write(f"{migrados}/{total} migrado(s), {falhas} falha(s) — {time.monotonic() - inicio:.0f}s")
+
+        resumo = migrar_armazenamento(origem, destino, workers=workers, lote=opts["lote"], progresso=progresso)
+        estilo = self.style.SUCCESS if not resumo.falhas else self.style.WARNING
+        self.stdout.write(estilo(
+            f"✔ Migração concluída. migrados={resumo.migrados} (retomados={resumo.retomados}) "
+            f"falhas={resumo.falhas}. Rode de novo para tentar as falhas."
+        ))
@@ -0,0 +1,45 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Indicador
+from api.services.metas import reconciliar_metas
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcilia MetaMensal de todos os indicadores ativos de uma vez: cria as metas "
+        "alinhadas faltantes e remove desalinhadas/futuras (até o mês passado, por padrão)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ate", help="Último mês a garantir, AAAA-MM (padrão: mês passado).")
+        parser.add_argument("--indicador", type=int, action="append", help="Restringe a estes IDs (repetível).")
+        parser.add_argument("--incluir-inativos", action="store_true", help="Inclui indicadores inativos.")
+        parser.add_argument("--lote", type=int, default=5000, help="Linhas por INSERT/DELETE.")
+        parser.add_argument("--dry-run", action="store_true", help="Só reporta, não altera.")
+
+    def handle(self, *args, **opts):
+        ate = None
+        if opts["ate"]:
+            try:
+                ano, mes = map(int, opts["ate"].split("-"))
+                ate = date(ano, mes, 1)
+            except ValueError:
+                raise CommandError("--ate deve estar no formato AAAA-MM.")
+
+        qs = Indicador.objects.all() if opts["incluir_inativos"] else Indicador.objects.filter(ativo=True)
+        if opts["indicador"]:
+            qs = qs.filter(pk__in=opts["indicador"])
+
+        inicio = time.monotonic()
+        resumo = reconciliar_metas(qs, ate=ate, lote=max(1, opts["lote"]), aplicar=not opts["dry_run"])
+        texto = (
+            f"indicadores={resumo.indicadores} criadas={resumo.criadas} "
+            f"removidas={resumo.removidas} ({time.monotonic() - inicio:.2f}s)"
+        )
+        if opts["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"DRY-RUN: {texto}. Nada alterado."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✔ Metas reconciliadas. {texto}"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from api.models import FatoMensal
+from api.services.fatos import reconstruir_fatos
+from api.services.cache_relatorios import invalidar_relatorios
+
+
+class Command(BaseCommand):
+    help = "Reconstrói a tabela de fatos mensais (FatoMensal) em lotes de indicadores."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--indicador-id", type=int, action="append", default=None,
+                            help="Restringe a um indicador (pode repetir).")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Indicadores por lote.")
+        parser.add_argument("--limpar", action="store_true",
+                            help="Apaga todos os fatos antes (apenas sem --indicador-id).")
+
+    def handle(self, *args, **opts):
+        ids = opts["indicador_id"]
+        chunk = max(1, opts["chunk_size"])
+        started = now()
+
+        if opts["limpar"] and not ids:
+            apagados, _ = FatoMensal.objects.all().delete()
+            self.stdout.write(f"Fatos removidos: {apagados}")
+
+        def progresso(feitos, total, gravados):
+            self.stdout.write(f"Indicadores {feitos}/{total} — fatos gravados: {gravados}")
+
+        total = reconstruir_fatos(indicador_ids=ids, chunk_size=chunk, progresso=progresso)
+        invalidar_relatorios()
+
+        finished = now()
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Fatos mensais reconstruídos: {total} in {(finished - started).total_seconds():.2f}s"
+        ))
@@ -1,11 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from datetime import date
-from dateutil.relativedelta import relativedelta
-from api.models import MetaMensal, Preenchimento
-
-def first_of_month(d: date) -> date:
-    return date(d.year, d.month, 1)
+from api.services.rollover import competencias_futuras
 
 class Command(BaseCommand):
     help = "Remove MetaMensal e Preenchimento PENDENTE em competências no futuro (>= início do mês atual)."
@@ -15,13 +10,7 @@ class Command(BaseCommand):
 
     def handle(self, *args, **opts):
         dry = opts.get("dry_run", True)
-        hoje0 = first_of_month(date.today())
-
-        metas_qs = MetaMensal.objects.filter(mes__gte=hoje0)
-        fut_preench_qs = Preenchimento.objects.extra(
-            where=["(ano > %s) OR (ano = %s AND mes >= %s)"],
-            params=[hoje0.year, hoje0.year, hoje0.month]
-        ).filter(confirmado=False)
+        metas_qs, fut_preench_qs = competencias_futuras()
 
         self.stdout.write(f"Metas futuras: {metas_qs.count()}")
         self.stdout.write(f"Preenchimentos pendentes futuros: {fut_preench_qs.count()}")
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from api.services.uploads import triagem_staging, processar_upload, descartar_staging
+
+
+class Command(BaseCommand):
+    help = (
+        "Reenvia ao armazenamento ativo os arquivos de prova que ficaram no staging "
+        "(worker reiniciado ou falha definitiva após as retentativas). Só considera "
+        "arquivos antigos de preenchimentos com envio 'failed' ou 'pending' travado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Só reporta, não envia.")
+        parser.add_argument("--idade-minima-minutos", type=int, default=30,
+                            help="Ignora arquivos mais novos que isso (uploads em andamento).")
+
+    def handle(self, *args, **opts):
+        dry = opts["dry_run"]
+        enviados, falhas = 0, 0
+        reenviar, descartar = triagem_staging(max(0, opts["idade_minima_minutos"]) * 60)
+
+        for caminho in descartar:
+            if dry:
+                self.stdout.write(f"Descartável: arquivo={caminho}")
+            else:
+                descartar_staging(caminho)
+
+        for pk, caminho in reenviar:
+            if dry:
+                self.stdout.write(f"Pendente: preenchimento={pk} arquivo={caminho}")
+                continue
+
+            # Usa a configuração ATIVA no momento do reprocessamento
+            if processar_upload(pk, caminho):
+                enviados += 1
+            else:
+                falhas += 1
+
+        if dry:
+            self.stdout.write(self.style.WARNING("DRY-RUN: nenhuma alteração aplicada."))
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Reprocessamento concluído. enviados={enviados} falhas={falhas} descartados={len(descartar)}"
+        ))
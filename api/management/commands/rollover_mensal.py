@@ -0,0 +1,35 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services.rollover import executar_rollover
+
+
+class Command(BaseCommand):
+    help = (
+        "Virada de mês: limpa competências futuras, reconcilia metas, cria placeholders "
+        "e aquece os caches do dashboard. Agende no crontab (ex.: '0 * * * *'): roda uma "
+        "vez por competência (watermark) e em uma instância só (lock consultivo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--competencia", help="Mês que começou, AAAA-MM (só o mês atual; padrão: mês atual).")
+        parser.add_argument("--forcar", action="store_true", help="Refaz mesmo com o watermark concluído.")
+
+    def handle(self, *args, **opts):
+        hoje = None
+        if opts["competencia"]:
+            try:
+                ano, mes = map(int, opts["competencia"].split("-"))
+                hoje = date(ano, mes, 1)
+            except ValueError:
+                raise CommandError("--competencia deve estar no formato AAAA-MM.")
+
+        try:
+            resumo = executar_rollover(hoje=hoje, forcar=opts["forcar"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if resumo is None:
+            self.stdout.write(self.style.WARNING("Nada feito: competência já concluída ou virada em execução."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✔ Virada concluída: {resumo}"))
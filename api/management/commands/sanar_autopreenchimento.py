@@ -6,6 +6,7 @@ from dateutil.relativedelta import relativedelta
 from datetime import date
 
 from api.models import Indicador, Preenchimento, MetaMensal
+from api.services.fatos import agendar_atualizacao
 
 def first_of_month(d: date) -> date:
     return date(d.year, d.month, 1)
@@ -141,6 +142,8 @@ class Command(BaseCommand):
                     if to_set_null_ids:
                         Preenchimento.objects.filter(id__in=to_set_null_ids).update(valor_realizado=None)
                         total_changed["set_null"] += len(to_set_null_ids)
+                        # update() não dispara signals: recalcula os fatos mensais do indicador
+                        agendar_atualizacao(ind.id)
                     if to_delete_ids:
                         Preenchimento.objects.filter(id__in=to_delete_ids).delete()
                         total_changed["deleted"] += len(to_delete_ids)
@@ -0,0 +1,12 @@
+from api.services.auditoria import em_lote
+
+
+class AuditoriaMiddleware:
+    """Grava os logs de ação da requisição em um único INSERT ao final dela."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with em_lote():
+            return self.get_response(request)
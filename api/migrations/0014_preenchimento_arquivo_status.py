@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_configuracao_permitir_editar_meta_gestor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='preenchimento',
+            name='arquivo_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Envio pendente'), ('done', 'Enviado'), ('failed', 'Falha no envio')], max_length=10, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-19 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_preenchimento_arquivo_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='preenchimento',
+            index=models.Index(fields=['preenchido_por', 'ano', 'mes', 'id'], name='idx_preench_autor_comp'),
+        ),
+    ]
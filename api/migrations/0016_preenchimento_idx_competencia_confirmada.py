@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_preenchimento_idx_autor_competencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='preenchimento',
+            index=models.Index(models.F('indicador'), models.Func(models.F('ano'), models.F('mes'), models.Value(1), function='MAKE_DATE', output_field=models.DateField()), condition=models.Q(('confirmado', True)), name='idx_preench_ind_comp_conf'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_preenchimento_idx_competencia_confirmada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FatoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField(help_text='Primeiro dia do mês de referência.')),
+                ('valor_realizado', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valor_meta', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('atingido', models.BooleanField(default=False)),
+                ('variacao', models.DecimalField(blank=True, decimal_places=2, help_text='(realizado - meta) / meta * 100; nulo quando a meta é 0/ausente.', max_digits=12, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('indicador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fatos_mensais', to='api.indicador')),
+                ('preenchimento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.preenchimento')),
+                ('setor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fatos_mensais', to='api.setor')),
+            ],
+            options={
+                'verbose_name': 'Fato Mensal',
+                'verbose_name_plural': 'Fatos Mensais',
+                'ordering': ('indicador_id', 'competencia'),
+                'indexes': [models.Index(fields=['competencia'], name='idx_fato_mensal_comp'), models.Index(fields=['setor', 'competencia'], name='idx_fato_mensal_setor_comp')],
+                'constraints': [models.UniqueConstraint(fields=('indicador', 'competencia'), name='uq_fato_mensal_ind_comp')],
+            },
+        ),
+    ]
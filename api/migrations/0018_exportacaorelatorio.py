@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_fatomensal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacaoRelatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=64)),
+                ('formato', models.CharField(choices=[('pdf', 'PDF'), ('xlsx', 'Excel')], max_length=4)),
+                ('status', models.CharField(choices=[('pending', 'Na fila'), ('running', 'Gerando'), ('done', 'Concluído'), ('failed', 'Falhou')], default='pending', max_length=10)),
+                ('escopo', models.CharField(help_text='Hash do escopo de visibilidade de quem pediu.', max_length=16)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('arquivo', models.CharField(blank=True, default='', help_text='Nome no default_storage.', max_length=255)),
+                ('total_linhas', models.PositiveIntegerField(default=0)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportação de Relatório',
+                'verbose_name_plural': 'Exportações de Relatórios',
+                'ordering': ('-criado_em',),
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'failed'), _negated=True), fields=('chave',), name='uq_exportacao_chave_ativa')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_exportacaorelatorio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoProva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('chave', models.CharField(help_text='Chave/caminho do objeto no backend.', max_length=512)),
+                ('url', models.CharField(max_length=1024)),
+                ('tamanho', models.BigIntegerField()),
+                ('content_type', models.CharField(max_length=100)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('armazenamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='provas', to='api.configuracaoarmazenamento')),
+            ],
+            options={
+                'verbose_name': 'Arquivo de Prova',
+                'verbose_name_plural': 'Arquivos de Prova',
+            },
+        ),
+        migrations.AddField(
+            model_name='preenchimento',
+            name='prova',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='preenchimentos', to='api.arquivoprova'),
+        ),
+        migrations.AddIndex(
+            model_name='arquivoprova',
+            index=models.Index(fields=['criado_em'], name='idx_arquivo_prova_criado'),
+        ),
+        migrations.AddConstraint(
+            model_name='arquivoprova',
+            constraint=models.UniqueConstraint(fields=('armazenamento', 'sha256'), name='uq_arquivo_prova_arm_sha256'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_arquivoprova'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arquivoprova',
+            name='miniatura_url',
+            field=models.CharField(blank=True, default='', max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='arquivoprova',
+            name='preview_url',
+            field=models.CharField(blank=True, default='', max_length=1024),
+        ),
+    ]
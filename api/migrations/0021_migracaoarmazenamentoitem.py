@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_arquivoprova_variantes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='preenchimento',
+            name='arquivo',
+            field=models.FileField(blank=True, max_length=1024, null=True, upload_to='provas/'),
+        ),
+        migrations.CreateModel(
+            name='MigracaoArmazenamentoItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave_origem', models.CharField(max_length=512)),
+                ('status', models.CharField(choices=[('copiado', 'Copiado (URLs pendentes)'), ('concluido', 'Concluído'), ('falhou', 'Falhou')], max_length=10)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('atualizado_em', models.DateTimeField()),
+                ('destino', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.configuracaoarmazenamento')),
+                ('origem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.configuracaoarmazenamento')),
+                ('prova', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.arquivoprova')),
+            ],
+            options={
+                'verbose_name': 'Item de Migração de Armazenamento',
+                'verbose_name_plural': 'Itens de Migração de Armazenamento',
+                'constraints': [models.UniqueConstraint(fields=('origem', 'destino', 'chave_origem'), name='uq_migracao_arm_item')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_migracaoarmazenamentoitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RolloverMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('competencia', models.DateField(help_text='1º dia do mês que começou.', unique=True)),
+                ('iniciado_em', models.DateTimeField()),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('resumo', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'verbose_name': 'Virada de Mês',
+                'verbose_name_plural': 'Viradas de Mês',
+                'ordering': ('-competencia',),
+            },
+        ),
+    ]
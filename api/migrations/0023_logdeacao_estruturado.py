@@ -0,0 +1,55 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_rollovermensal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logdeacao',
+            name='competencia',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='logdeacao',
+            name='indicador',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.indicador'),
+        ),
+        migrations.AddField(
+            model_name='logdeacao',
+            name='setor',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.setor'),
+        ),
+        migrations.AddField(
+            model_name='logdeacao',
+            name='tipo_acao',
+            field=models.CharField(blank=True, choices=[('indicador_criado', 'Indicador cadastrado'), ('indicador_editado', 'Indicador editado'), ('indicador_excluido', 'Indicador excluído'), ('preenchimento_criado', 'Preenchimento'), ('preenchimento_atualizado', 'Preenchimento atualizado'), ('preenchimento_excluido', 'Preenchimento excluído'), ('metas_em_lote', 'Metas mensais em lote'), ('setor_criado', 'Setor cadastrado'), ('setor_editado', 'Setor editado'), ('setor_excluido', 'Setor excluído'), ('configuracao', 'Configuração'), ('senha_alterada', 'Senha alterada'), ('outro', 'Outro')], default='', max_length=30),
+        ),
+        migrations.AddField(
+            model_name='logdeacao',
+            name='valor',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='logdeacao',
+            index=models.Index(fields=['tipo_acao', 'data'], name='idx_log_tipo_data'),
+        ),
+        migrations.AddIndex(
+            model_name='logdeacao',
+            index=models.Index(fields=['indicador', 'data'], name='idx_log_indicador_data'),
+        ),
+        migrations.AddIndex(
+            model_name='logdeacao',
+            index=models.Index(fields=['setor', 'data'], name='idx_log_setor_data'),
+        ),
+        migrations.AddIndex(
+            model_name='logdeacao',
+            index=models.Index(fields=['competencia'], name='idx_log_competencia'),
+        ),
+    ]
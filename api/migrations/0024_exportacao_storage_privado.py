@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_logdeacao_estruturado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportacaorelatorio',
+            name='arquivo',
+            field=models.CharField(blank=True, default='', help_text='Nome no storage privado (REPORT_EXPORT_ROOT).', max_length=255),
+        ),
+    ]
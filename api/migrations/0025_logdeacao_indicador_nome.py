@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_exportacao_storage_privado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logdeacao',
+            name='indicador_nome',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        # Busca por trecho do nome (icontains → UPPER(...) LIKE): GIN trigram, se o
+        # servidor tiver pg_trgm e a role puder criá-la. Sem ele a coluna funciona, só sem índice.
+        migrations.RunSQL(
+            sql="""
+                DO $$
+                BEGIN
+                    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+                        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+                        CREATE INDEX IF NOT EXISTS idx_log_indicador_nome_trgm
+                            ON api_logdeacao USING gin (UPPER(indicador_nome::text) gin_trgm_ops);
+                    END IF;
+                EXCEPTION WHEN insufficient_privilege THEN
+                    -- role sem permissão para CREATE EXTENSION: segue sem o índice
+                    RAISE NOTICE 'pg_trgm indisponível (%), idx_log_indicador_nome_trgm não criado', SQLERRM;
+                END
+                $$;
+            """,
+            reverse_sql="DROP INDEX IF EXISTS idx_log_indicador_nome_trgm;",
+        ),
+    ]
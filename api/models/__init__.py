@@ -3,6 +3,10 @@ from .usuarios import Usuario
 from .indicadores import Indicador, Meta, MetaMensal, Preenchimento, PermissaoIndicador
 from .configuracoes import ConfiguracaoArmazenamento, ConfiguracaoNotificacao, Configuracao
 from .logs import LogDeAcao
+from .fatos import FatoMensal
+from .exportacoes import ExportacaoRelatorio
+from .provas import ArquivoProva, MigracaoArmazenamentoItem
+from .rollover import RolloverMensal
 
 __all__ = [
     "Setor",
@@ -16,4 +20,9 @@ __all__ = [
     "ConfiguracaoNotificacao",
     "Configuracao",
     "LogDeAcao",
+    "FatoMensal",
+    "ExportacaoRelatorio",
+    "ArquivoProva",
+    "MigracaoArmazenamentoItem",
+    "RolloverMensal",
 ]
@@ -0,0 +1,61 @@
+from django.db import models
+from django.db.models import Q
+
+from .usuarios import Usuario
+
+
+# ======================
+# 🔹 EXPORTAÇÃO DE RELATÓRIO (em segundo plano)
+# ======================
+class ExportacaoRelatorio(models.Model):
+    """
+    Job de geração de PDF/XLSX grandes. 'chave' identifica (formato, escopo,
+    filtros, versão dos dados): pedidos idênticos reaproveitam o mesmo job e
+    o mesmo arquivo. Processado por api.services.jobs_relatorios.
+    """
+    FORMATO_PDF = 'pdf'
+    FORMATO_XLSX = 'xlsx'
+    FORMATO_CHOICES = [
+        (FORMATO_PDF, 'PDF'),
+        (FORMATO_XLSX, 'Excel'),
+    ]
+
+    PENDENTE = 'pending'
+    PROCESSANDO = 'running'
+    CONCLUIDO = 'done'
+    FALHOU = 'failed'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Na fila'),
+        (PROCESSANDO, 'Gerando'),
+        (CONCLUIDO, 'Concluído'),
+        (FALHOU, 'Falhou'),
+    ]
+    STATUS_ATIVOS = (PENDENTE, PROCESSANDO, CONCLUIDO)
+
+    chave = models.CharField(max_length=64)
+    formato = models.CharField(max_length=4, choices=FORMATO_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDENTE)
+    escopo = models.CharField(max_length=16, help_text="Hash do escopo de visibilidade de quem pediu.")
+    params = models.JSONField(default=dict, blank=True)
+    solicitado_por = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='+')
+    arquivo = models.CharField(max_length=255, blank=True, default='', help_text="Nome no storage privado (REPORT_EXPORT_ROOT).")
+    total_linhas = models.PositiveIntegerField(default=0)
+    erro = models.TextField(blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Exportação de Relatório"
+        verbose_name_plural = "Exportações de Relatórios"
+        ordering = ('-criado_em',)
+        constraints = [
+            # Um único job vivo por chave; jobs com falha podem ser refeitos
+            models.UniqueConstraint(
+                fields=['chave'],
+                condition=~Q(status='failed'),
+                name='uq_exportacao_chave_ativa',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.formato} #{self.pk} ({self.status})"
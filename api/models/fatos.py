@@ -0,0 +1,45 @@
+from django.db import models
+
+from .setores import Setor
+from .indicadores import Indicador, Preenchimento
+
+
+# ======================
+# 🔹 FATO MENSAL (pré-agregado p/ relatórios)
+# ======================
+class FatoMensal(models.Model):
+    """
+    Uma linha por (indicador, competência) com valor realizado: o preenchimento
+    de referência do mês (confirmado mais recente), a meta resolvida
+    (MetaMensal → fallback Indicador.valor_meta), atingimento e variação.
+    Mantido por api.services.fatos (signals + comando reconstruir_fatos_mensais).
+    """
+    indicador = models.ForeignKey(Indicador, on_delete=models.CASCADE, related_name='fatos_mensais')
+    setor = models.ForeignKey(Setor, on_delete=models.CASCADE, related_name='fatos_mensais')
+    competencia = models.DateField(help_text="Primeiro dia do mês de referência.")
+    preenchimento = models.ForeignKey(
+        Preenchimento, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    valor_realizado = models.DecimalField(max_digits=10, decimal_places=2)
+    valor_meta = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    atingido = models.BooleanField(default=False)
+    variacao = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True,
+        help_text="(realizado - meta) / meta * 100; nulo quando a meta é 0/ausente."
+    )
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Fato Mensal"
+        verbose_name_plural = "Fatos Mensais"
+        ordering = ('indicador_id', 'competencia')
+        constraints = [
+            models.UniqueConstraint(fields=['indicador', 'competencia'], name='uq_fato_mensal_ind_comp'),
+        ]
+        indexes = [
+            models.Index(fields=['competencia'], name='idx_fato_mensal_comp'),
+            models.Index(fields=['setor', 'competencia'], name='idx_fato_mensal_setor_comp'),
+        ]
+
+    def __str__(self):
+        return f"{self.indicador_id} - {self.competencia.strftime('%m/%Y')} : {self.valor_realizado}"
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q, Func, Value
 from django.conf import settings
 from datetime import date
 from django.core.validators import MinValueValidator, MaxValueValidator
@@ -55,10 +56,6 @@ class Indicador(models.Model):
             models.Index(fields=['setor', 'ativo'], name='idx_indicador_setor_ativo'),
         ]
 
-    def buscar_meta_para_mes(self, ano, mes):
-        data = date(ano, mes, 1)
-        return self.metas_mensais.filter(mes=data).first()
-
     def __str__(self):
         return self.nome
 
@@ -103,6 +100,15 @@ class MetaMensal(models.Model):
 # 🔹 PREENCHIMENTOS
 # ======================
 class Preenchimento(models.Model):
+    ARQUIVO_PENDENTE = 'pending'
+    ARQUIVO_CONCLUIDO = 'done'
+    ARQUIVO_FALHOU = 'failed'
+    ARQUIVO_STATUS_CHOICES = [
+        (ARQUIVO_PENDENTE, 'Envio pendente'),
+        (ARQUIVO_CONCLUIDO, 'Enviado'),
+        (ARQUIVO_FALHOU, 'Falha no envio'),
+    ]
+
     indicador = models.ForeignKey(Indicador, on_delete=models.CASCADE, related_name='preenchimentos')
 
     # ✅ agora pode ser nulo; sem default 0.00
@@ -116,14 +122,33 @@ class Preenchimento(models.Model):
     preenchido_por = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     data_preenchimento = models.DateTimeField(auto_now_add=True)
     comentario = models.TextField(blank=True, null=True)
-    arquivo = models.FileField(upload_to='provas/', blank=True, null=True)
+    # Guarda a URL no backend (S3/Azure/GCS com chave por conteúdo passam de 100 caracteres)
+    arquivo = models.FileField(upload_to='provas/', max_length=1024, blank=True, null=True)
+    # Objeto deduplicado por conteúdo (SHA-256) do qual 'arquivo' aponta a URL
+    prova = models.ForeignKey(
+        'ArquivoProva', on_delete=models.SET_NULL, null=True, blank=True, related_name='preenchimentos'
+    )
     origem = models.CharField(max_length=255, blank=True, null=True)
 
+    # Estado do envio assíncrono do arquivo de prova (None = sem envio em andamento)
+    arquivo_status = models.CharField(
+        max_length=10, choices=ARQUIVO_STATUS_CHOICES, blank=True, null=True
+    )
+
     class Meta:
         unique_together = ('indicador', 'mes', 'ano', 'preenchido_por')
         indexes = [
             models.Index(fields=['indicador', 'ano', 'mes'], name='idx_preench_indicador_ano_mes'),
             models.Index(fields=['data_preenchimento'], name='idx_preench_data'),
+            # keyset de /preenchimentos/meus/ (ordem ano, mes, id desc)
+            models.Index(fields=['preenchido_por', 'ano', 'mes', 'id'], name='idx_preench_autor_comp'),
+            # anti-join de pendências: (indicador, make_date(ano, mes, 1)) dos confirmados
+            models.Index(
+                F('indicador'),
+                Func(F('ano'), F('mes'), Value(1), function='MAKE_DATE', output_field=models.DateField()),
+                name='idx_preench_ind_comp_conf',
+                condition=Q(confirmado=True),
+            ),
             # (opcional) ajuda a filtrar pendentes
             # models.Index(fields=['confirmado'], name='idx_preench_confirmado'),
         ]
@@ -1,16 +1,61 @@
 from django.db import models
 from django.db.models import Q
 from .usuarios import Usuario
+from .setores import Setor
+from .indicadores import Indicador
 
 
 # ======================
 # 🔹 LOG DE AÇÕES
 # ======================
 class LogDeAcao(models.Model):
+    INDICADOR_CRIADO = 'indicador_criado'
+    INDICADOR_EDITADO = 'indicador_editado'
+    INDICADOR_EXCLUIDO = 'indicador_excluido'
+    PREENCHIMENTO_CRIADO = 'preenchimento_criado'
+    PREENCHIMENTO_ATUALIZADO = 'preenchimento_atualizado'
+    PREENCHIMENTO_EXCLUIDO = 'preenchimento_excluido'
+    METAS_EM_LOTE = 'metas_em_lote'
+    SETOR_CRIADO = 'setor_criado'
+    SETOR_EDITADO = 'setor_editado'
+    SETOR_EXCLUIDO = 'setor_excluido'
+    CONFIGURACAO = 'configuracao'
+    SENHA_ALTERADA = 'senha_alterada'
+    OUTRO = 'outro'
+    TIPO_ACAO_CHOICES = [
+        (INDICADOR_CRIADO, 'Indicador cadastrado'),
+        (INDICADOR_EDITADO, 'Indicador editado'),
+        (INDICADOR_EXCLUIDO, 'Indicador excluído'),
+        (PREENCHIMENTO_CRIADO, 'Preenchimento'),
+        (PREENCHIMENTO_ATUALIZADO, 'Preenchimento atualizado'),
+        (PREENCHIMENTO_EXCLUIDO, 'Preenchimento excluído'),
+        (METAS_EM_LOTE, 'Metas mensais em lote'),
+        (SETOR_CRIADO, 'Setor cadastrado'),
+        (SETOR_EDITADO, 'Setor editado'),
+        (SETOR_EXCLUIDO, 'Setor excluído'),
+        (CONFIGURACAO, 'Configuração'),
+        (SENHA_ALTERADA, 'Senha alterada'),
+        (OUTRO, 'Outro'),
+    ]
+
     usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True)
     acao = models.CharField(max_length=255)
     data = models.DateTimeField(auto_now_add=True)
 
+    # Colunas estruturadas (filtros indexados). '' = log antigo ainda não
+    # estruturado (ver manage.py estruturar_logs). Sem FK no banco: o log
+    # sobrevive à exclusão do indicador/setor e é gravado depois do commit
+    tipo_acao = models.CharField(max_length=30, choices=TIPO_ACAO_CHOICES, blank=True, default='')
+    indicador = models.ForeignKey(Indicador, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                                  null=True, blank=True, related_name='+')
+    setor = models.ForeignKey(Setor, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+                              null=True, blank=True, related_name='+')
+    competencia = models.DateField(null=True, blank=True)
+    valor = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Nome do indicador na data do log: a busca acha indicadores excluídos/renomeados
+    # (índice trigram em UPPER(indicador_nome), criado na migração se houver pg_trgm)
+    indicador_nome = models.CharField(max_length=255, blank=True, default='')
+
     class Meta:
         verbose_name = "Log de Ação"
         verbose_name_plural = "Logs de Ações"
@@ -25,6 +70,10 @@ class LogDeAcao(models.Model):
         indexes = [
             models.Index(fields=['usuario', 'data'], name='idx_log_usuario_data'),
             models.Index(fields=['data'], name='idx_log_data'),
+            models.Index(fields=['tipo_acao', 'data'], name='idx_log_tipo_data'),
+            models.Index(fields=['indicador', 'data'], name='idx_log_indicador_data'),
+            models.Index(fields=['setor', 'data'], name='idx_log_setor_data'),
+            models.Index(fields=['competencia'], name='idx_log_competencia'),
         ]
 
     def __str__(self):
@@ -0,0 +1,81 @@
+from django.db import models
+
+from .configuracoes import ConfiguracaoArmazenamento
+
+
+# ======================
+# 🔹 ARQUIVO DE PROVA (endereçado por conteúdo)
+# ======================
+class ArquivoProva(models.Model):
+    """
+    Um objeto por (armazenamento, SHA-256): a mesma planilha/PDF anexada a
+    vários indicadores é enviada uma vez e referenciada por Preenchimento.prova.
+    Objetos sem referência são removidos pelo comando coletar_provas_orfas.
+    """
+    CONTENT_TYPES_IMAGEM = ('image/jpeg', 'image/png', 'image/webp')
+
+    armazenamento = models.ForeignKey(
+        ConfiguracaoArmazenamento, on_delete=models.CASCADE, related_name='provas'
+    )
+    sha256 = models.CharField(max_length=64)
+    chave = models.CharField(max_length=512, help_text="Chave/caminho do objeto no backend.")
+    url = models.CharField(max_length=1024)
+    tamanho = models.BigIntegerField()
+    content_type = models.CharField(max_length=100)
+    # Variantes WebP (só imagens), gravadas ao lado do original
+    preview_url = models.CharField(max_length=1024, blank=True, default='')
+    miniatura_url = models.CharField(max_length=1024, blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Arquivo de Prova"
+        verbose_name_plural = "Arquivos de Prova"
+        constraints = [
+            models.UniqueConstraint(fields=['armazenamento', 'sha256'], name='uq_arquivo_prova_arm_sha256'),
+        ]
+        indexes = [
+            models.Index(fields=['criado_em'], name='idx_arquivo_prova_criado'),
+        ]
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.tamanho} bytes)"
+
+    @property
+    def e_imagem(self) -> bool:
+        return self.content_type in self.CONTENT_TYPES_IMAGEM
+
+
+# ======================
+# 🔹 CHECKPOINT DA MIGRAÇÃO ENTRE ARMAZENAMENTOS
+# ======================
+class MigracaoArmazenamentoItem(models.Model):
+    """
+    Progresso do comando migrar_armazenamento, um registro por objeto de origem.
+    'copiado' guarda a prova já no destino: ao retomar, só falta reescrever as URLs.
+    """
+    COPIADO = 'copiado'
+    CONCLUIDO = 'concluido'
+    FALHOU = 'falhou'
+    STATUS_CHOICES = [
+        (COPIADO, 'Copiado (URLs pendentes)'),
+        (CONCLUIDO, 'Concluído'),
+        (FALHOU, 'Falhou'),
+    ]
+
+    origem = models.ForeignKey(ConfiguracaoArmazenamento, on_delete=models.CASCADE, related_name='+')
+    destino = models.ForeignKey(ConfiguracaoArmazenamento, on_delete=models.CASCADE, related_name='+')
+    chave_origem = models.CharField(max_length=512)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    prova = models.ForeignKey(ArquivoProva, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    erro = models.TextField(blank=True, default='')
+    atualizado_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Item de Migração de Armazenamento"
+        verbose_name_plural = "Itens de Migração de Armazenamento"
+        constraints = [
+            models.UniqueConstraint(fields=['origem', 'destino', 'chave_origem'], name='uq_migracao_arm_item'),
+        ]
+
+    def __str__(self):
+        return f"{self.chave_origem} [{self.status}]"
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+# ======================
+# 🔹 VIRADA DE MÊS (watermark)
+# ======================
+class RolloverMensal(models.Model):
+    """
+    Uma linha por competência aberta pelo job de virada de mês (api.cron).
+    'concluido_em' preenchido = trabalho do mês feito; novas execuções viram no-op.
+    """
+    competencia = models.DateField(unique=True, help_text="1º dia do mês que começou.")
+    iniciado_em = models.DateTimeField()
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    resumo = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        verbose_name = "Virada de Mês"
+        verbose_name_plural = "Viradas de Mês"
+        ordering = ('-competencia',)
+
+    def __str__(self):
+        return f"{self.competencia:%m/%Y} ({'concluída' if self.concluido_em else 'em aberto'})"
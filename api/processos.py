@@ -0,0 +1,14 @@
+"""
+Ponto de entrada de processos filhos ('spawn'). Este módulo não importa
+models: o filho desserializa o initializer antes de o Django estar pronto.
+"""
+
+
+def inicializar_django(banco: dict) -> None:
+    """Configura o Django no processo novo, apontando para o mesmo banco do pai."""
+    import django
+    from django.conf import settings
+
+    # NAME pode ter sido trocado em runtime no pai (ex.: banco de testes)
+    settings.DATABASES['default'].update(banco)
+    django.setup()
@@ -1,9 +1,14 @@
 from .setores import SetorSerializer, SetorSimplesSerializer
 from .usuarios import UsuarioSerializer
-from .indicadores import IndicadorSerializer, MetaSerializer, MetaMensalSerializer
-from .preenchimentos import PreenchimentoSerializer, PreenchimentoHistoricoSerializer
+from .indicadores import IndicadorSerializer, MetaSerializer, MetaMensalSerializer, MetaMensalLoteSerializer
+from .preenchimentos import (
+    PreenchimentoSerializer,
+    PreenchimentoHistoricoSerializer,
+    PreenchimentoSlimSerializer,
+)
 from .configuracoes import ConfiguracaoSerializer, ConfiguracaoArmazenamentoSerializer
 from .logs import LogDeAcaoSerializer
+from .exportacoes import ExportacaoRelatorioSerializer
 
 __all__ = [
     "SetorSerializer",
@@ -12,9 +17,12 @@ __all__ = [
     "IndicadorSerializer",
     "MetaSerializer",
     "MetaMensalSerializer",
+    "MetaMensalLoteSerializer",
     "PreenchimentoSerializer",
     "PreenchimentoHistoricoSerializer",
+    "PreenchimentoSlimSerializer",
     "ConfiguracaoSerializer",
     "ConfiguracaoArmazenamentoSerializer",
     "LogDeAcaoSerializer",
+    "ExportacaoRelatorioSerializer",
 ]
@@ -0,0 +1,23 @@
+from django.urls import reverse
+from rest_framework import serializers
+from api.models import ExportacaoRelatorio
+
+
+# =============================
+# 🔹 EXPORTAÇÕES DE RELATÓRIO
+# =============================
+class ExportacaoRelatorioSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportacaoRelatorio
+        fields = ['id', 'formato', 'status', 'params', 'total_linhas', 'erro',
+                  'criado_em', 'concluido_em', 'download_url']
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != ExportacaoRelatorio.CONCLUIDO:
+            return None
+        url = reverse('relatorio-exportacao-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -8,7 +8,8 @@ from rest_framework import serializers
 
 from api.models import Indicador, Meta, MetaMensal, Preenchimento
 from api.utils import parse_mes_inicial, normalize_number
-from api.utils.periodicidade import meses_permitidos
+from api.utils.periodicidade import mes_alinhado, meses_permitidos
+from api.services.metas import propagar_valor_meta, reconciliar_metas
 
 def _first_of_month(d: date) -> date:
     return date(d.year, d.month, 1)
@@ -55,6 +56,10 @@ class IndicadorSerializer(CleanModelSerializer):
     # Agora mes_final é persistido no Model e legível (não write_only)
     mes_final = serializers.DateField(required=False, allow_null=True)
 
+    # Propagação do novo valor_meta às metas mensais existentes ('AAAA-MM')
+    propagar_meta_desde = serializers.CharField(required=False, allow_null=True, allow_blank=True, write_only=True)
+    propagar_meta_ate = serializers.CharField(required=False, allow_null=True, allow_blank=True, write_only=True)
+
     class Meta:
         model = Indicador
         fields = [
@@ -66,6 +71,7 @@ class IndicadorSerializer(CleanModelSerializer):
             'visibilidade',
             'extracao_indicador',
             'metas_mensais', 'ativo',
+            'propagar_meta_desde', 'propagar_meta_ate',
         ]
         read_only_fields = ('id', 'criado_em')
         extra_kwargs = {
@@ -83,15 +89,35 @@ class IndicadorSerializer(CleanModelSerializer):
     def validate_mes_final(self, v):
         return parse_mes_inicial(v)
 
+    def _validate_competencia(self, v, campo):
+        try:
+            d = parse_mes_inicial(v)
+        except ValueError:
+            d = None
+        if v not in (None, '') and not isinstance(d, date):
+            raise serializers.ValidationError({campo: "Use o formato AAAA-MM."})
+        return d
+
     def validate(self, attrs):
         """
-        Garante que mes_final >= mes_inicial quando ambos existirem.
+        Garante que mes_final >= mes_inicial quando ambos existirem
+        e que a faixa de propagação do valor_meta seja coerente.
         """
         attrs = super().validate(attrs)
         mes_inicial = attrs.get('mes_inicial') or getattr(self.instance, 'mes_inicial', None)
         mes_final = attrs.get('mes_final', getattr(self.instance, 'mes_final', None))
         if mes_inicial and mes_final and _first_of_month(mes_final) < _first_of_month(mes_inicial):
             raise serializers.ValidationError({"mes_final": "mes_final não pode ser anterior a mes_inicial."})
+
+        desde = self._validate_competencia(attrs.get('propagar_meta_desde'), 'propagar_meta_desde')
+        ate = self._validate_competencia(attrs.get('propagar_meta_ate'), 'propagar_meta_ate')
+        if ate and not desde:
+            raise serializers.ValidationError({"propagar_meta_desde": "Informe o início da propagação."})
+        if desde and 'valor_meta' not in attrs:
+            raise serializers.ValidationError({"propagar_meta_desde": "A propagação exige um novo valor_meta."})
+        if desde and ate and ate < desde:
+            raise serializers.ValidationError({"propagar_meta_ate": "propagar_meta_ate não pode ser anterior a propagar_meta_desde."})
+        attrs['propagar_meta_desde'], attrs['propagar_meta_ate'] = desde, ate
         return attrs
 
     def validate_valor_meta(self, v):
@@ -133,43 +159,20 @@ class IndicadorSerializer(CleanModelSerializer):
     # ---------- Helpers internos ----------
     def _ensure_metas_ate(self, indicador: Indicador, target_end: date, hard_cap: bool):
         """
-        Reconciliador:
+        Reconciliador (ver api.services.metas.reconciliar_metas):
         1) Calcula meses PERMITIDOS pela periodicidade/âncora até target_end (respeita mes_final).
         2) Cria metas FALTANTES para esses meses.
         3) Remove metas DESALINHADAS dentro do range.
         4) Se hard_cap=True, remove metas > target_end.
         """
-        target_end = _first_of_month(target_end)
-
-        # 1) meses permitidos pela regra centralizada
-        permitidos = meses_permitidos(indicador, ate=target_end)
-
-        existentes_qs = MetaMensal.objects.filter(indicador=indicador)
-        existentes = set(existentes_qs.values_list('mes', flat=True))
-
-        # 2) criar faltantes alinhadas
-        to_create = [
-            MetaMensal(indicador=indicador, mes=m, valor_meta=indicador.valor_meta)
-            for m in permitidos if m not in existentes
-        ]
-        if to_create:
-            MetaMensal.objects.bulk_create(to_create, ignore_conflicts=True)
-
-        # 3) remover desalinhadas dentro do range
-        if permitidos:
-            base_range = min(permitidos)
-            (existentes_qs
-            .filter(mes__gte=base_range, mes__lte=target_end)
-            .exclude(mes__in=permitidos)
-            .delete())
-
-        # 4) hard cap: corta qualquer coisa após target_end
-        if hard_cap:
-            MetaMensal.objects.filter(indicador=indicador, mes__gt=target_end).delete()
+        reconciliar_metas(Indicador.objects.filter(pk=indicador.pk), ate=_first_of_month(target_end), hard_cap=hard_cap)
 
     # ---------- Create ----------
     @transaction.atomic
     def create(self, validated_data):
+        # Sem metas anteriores: todas nascem com o valor_meta informado
+        validated_data.pop('propagar_meta_desde', None)
+        validated_data.pop('propagar_meta_ate', None)
         instance = super().create(validated_data)  # full_clean depois via CleanModelSerializer
 
         if instance.mes_final:
@@ -188,6 +191,8 @@ class IndicadorSerializer(CleanModelSerializer):
     @transaction.atomic
     def update(self, instance, validated_data):
         old_start = instance.mes_inicial
+        propagar_desde = validated_data.pop('propagar_meta_desde', None)
+        propagar_ate = validated_data.pop('propagar_meta_ate', None)
         instance = super().update(instance, validated_data)
 
         if instance.mes_final:
@@ -207,6 +212,11 @@ class IndicadorSerializer(CleanModelSerializer):
         # Garante metas mensais (até mês passado, removendo o futuro)
         self._ensure_metas_ate(instance, target_end, hard_cap)
 
+        # Novas metas já nascem com o valor atual; as existentes na faixa pedida são
+        # atualizadas num único UPDATE (em vez de um PATCH por /metas-mensais/{id}/)
+        if propagar_desde:
+            propagar_valor_meta(instance, instance.valor_meta, propagar_desde, propagar_ate)
+
         return instance
 
 
@@ -225,3 +235,73 @@ class MetaMensalSerializer(CleanModelSerializer):
     class Meta:
         model = MetaMensal
         fields = ['id', 'indicador', 'mes', 'valor_meta']
+
+
+class MetaMensalLoteSerializer(serializers.Serializer):
+    """
+    Entrada de POST /metas-mensais/bulk/, em uma das formas:
+      - {"metas": [{"indicador": 1, "mes": "2025-01", "valor_meta": 10}, ...]}
+      - {"indicador": 1, "valor_meta": 10, "desde": "2025-01", "ate": "2025-06"}
+        → todos os meses do calendário do indicador na faixa
+    validated_data['itens'] = [(indicador_id, mes, valor_meta)]
+    """
+    metas = serializers.ListField(child=serializers.DictField(), required=False, allow_empty=False)
+    indicador = serializers.PrimaryKeyRelatedField(queryset=Indicador.objects.all(), required=False)
+    valor_meta = serializers.CharField(required=False)
+    desde = serializers.CharField(required=False)
+    ate = serializers.CharField(required=False)
+
+    def _competencia(self, v, campo):
+        try:
+            d = parse_mes_inicial(v)
+        except ValueError:
+            d = None
+        if not isinstance(d, date):
+            raise serializers.ValidationError({campo: "Use o formato AAAA-MM."})
+        return d
+
+    def _valor(self, v, campo):
+        if v in (None, ''):
+            raise serializers.ValidationError({campo: "valor_meta é obrigatório."})
+        return normalize_number(v, campo)
+
+    def _faixa(self, attrs):
+        indicador = attrs.get('indicador')
+        if indicador is None or 'desde' not in attrs or 'ate' not in attrs:
+            raise serializers.ValidationError("Informe 'metas' ou 'indicador', 'valor_meta', 'desde' e 'ate'.")
+        desde = self._competencia(attrs['desde'], 'desde')
+        ate = self._competencia(attrs['ate'], 'ate')
+        if ate < desde:
+            raise serializers.ValidationError({"ate": "ate não pode ser anterior a desde."})
+        valor = self._valor(attrs.get('valor_meta'), 'valor_meta')
+        # meses_permitidos estende até mes_final quando ele passa de 'ate'; mes_alinhado corta o que vier depois dele
+        meses = sorted(m for m in meses_permitidos(indicador, ate=ate)
+                       if desde <= m <= ate and mes_alinhado(indicador, m.year, m.month))
+        if not meses:
+            raise serializers.ValidationError({"desde": "Nenhum mês do calendário do indicador na faixa."})
+        return [(indicador.pk, mes, valor) for mes in meses]
+
+    def _lista(self, metas):
+        brutos = []
+        for i, item in enumerate(metas):
+            try:
+                indicador_id = int(item.get('indicador'))
+            except (TypeError, ValueError):
+                raise serializers.ValidationError({"metas": {i: "indicador inválido."}})
+            brutos.append((indicador_id, self._competencia(item.get('mes'), f"metas[{i}].mes"),
+                           self._valor(item.get('valor_meta'), f"metas[{i}].valor_meta")))
+
+        indicadores = Indicador.objects.in_bulk({ind for ind, _, _ in brutos})
+        itens = []
+        for i, (indicador_id, mes, valor) in enumerate(brutos):
+            indicador = indicadores.get(indicador_id)
+            if indicador is None:
+                raise serializers.ValidationError({"metas": {i: "Indicador não encontrado."}})
+            if not mes_alinhado(indicador, mes.year, mes.month):
+                raise serializers.ValidationError({"metas": {i: "Mês fora do calendário do indicador."}})
+            itens.append((indicador_id, mes, valor))
+        return itens
+
+    def validate(self, attrs):
+        attrs['itens'] = self._lista(attrs['metas']) if attrs.get('metas') else self._faixa(attrs)
+        return attrs
@@ -10,8 +10,10 @@ class LogDeAcaoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = LogDeAcao
-        fields = ['id', 'usuario_nome', 'acao', 'data']
-        read_only_fields = ['id', 'usuario_nome', 'data']
+        fields = ['id', 'usuario_nome', 'acao', 'data', 'tipo_acao', 'indicador', 'indicador_nome', 'setor',
+                  'competencia', 'valor']
+        read_only_fields = ['id', 'usuario_nome', 'data', 'tipo_acao', 'indicador', 'indicador_nome', 'setor',
+                            'competencia', 'valor']
 
     def get_usuario_nome(self, obj):
         u = obj.usuario
@@ -1,9 +1,13 @@
 from datetime import date
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
-from api.models import Preenchimento, MetaMensal, Indicador
+from api.models import Preenchimento, Indicador
+from api.services.imagens import url_variante
+from api.services.metas import MetaResolver
 from api.utils import normalize_number
 from api.utils.periodicidade import mes_alinhado
+from api.upload_handlers import limite_prova
 
 # =============================
 # 🔹 PREENCHIMENTOS
@@ -22,6 +26,8 @@ class PreenchimentoSerializer(serializers.ModelSerializer):
     meta = serializers.SerializerMethodField()
     setor_id = serializers.IntegerField(source='indicador.setor.id', read_only=True)
     confirmado = serializers.BooleanField(read_only=True)
+    arquivo_preview = serializers.SerializerMethodField()
+    arquivo_miniatura = serializers.SerializerMethodField()
 
     class Meta:
         model = Preenchimento
@@ -30,9 +36,10 @@ class PreenchimentoSerializer(serializers.ModelSerializer):
             'indicador_nome', 'setor_nome', 'setor_id', 'tipo_meta', 'tipo_valor',
             'indicador_mes_inicial', 'indicador_periodicidade',
             'meta', 'mes', 'ano',
-            'comentario', 'arquivo', 'origem', 'preenchido_por'
+            'comentario', 'arquivo', 'arquivo_status', 'arquivo_preview', 'arquivo_miniatura',
+            'origem', 'preenchido_por'
         ]
-        read_only_fields = ('id', 'data_preenchimento', 'preenchido_por', 'confirmado')
+        read_only_fields = ('id', 'data_preenchimento', 'preenchido_por', 'confirmado', 'arquivo_status')
         extra_kwargs = {
             # ✅ agora pode ser nulo
             'valor_realizado': {'required': False, 'allow_null': True},
@@ -40,6 +47,17 @@ class PreenchimentoSerializer(serializers.ModelSerializer):
         }
 
     # ---- validações ----
+    def to_internal_value(self, data):
+        # Upload interrompido pelo LimiteEHashUploadHandler: o arquivo nem chegou a ser lido
+        request = self.context.get('request')
+        if getattr(request, 'upload_excedido', False):
+            raise serializers.ValidationError({"arquivo": [self._msg_tamanho()]})
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def _msg_tamanho():
+        return f"O arquivo enviado é muito grande. Máx: {limite_prova() // (1024 * 1024)}MB."
+
     def validate_mes(self, v):
         try:
             v = int(v)
@@ -67,10 +85,9 @@ class PreenchimentoSerializer(serializers.ModelSerializer):
     def validate_arquivo(self, value):
         if not value:
             return value
-        max_size = 2 * 1024 * 1024  # 2MB
         try:
-            if value.size > max_size:
-                raise serializers.ValidationError("O arquivo enviado é muito grande. Máx: 2MB.")
+            if value.size > limite_prova():
+                raise serializers.ValidationError(self._msg_tamanho())
         except AttributeError:
             pass
         return value
@@ -97,16 +114,38 @@ class PreenchimentoSerializer(serializers.ModelSerializer):
 
         return attrs
 
+    def _meta_resolver(self, obj):
+        """
+        MetaResolver compartilhado pela requisição. Na 1ª chamada de uma
+        listagem, resolve as metas da página inteira numa consulta só.
+        """
+        resolver = self.context.get('meta_resolver')
+        if resolver is None:
+            resolver = self.context['meta_resolver'] = MetaResolver.da_requisicao(self.context.get('request'))
+            lote = self.root.instance if isinstance(self.root, serializers.ListSerializer) else [obj]
+            resolver.carregar(
+                (p.indicador_id, date(p.ano, p.mes, 1)) for p in lote if p.ano and p.mes
+            )
+        return resolver
+
     def get_meta(self, obj):
         try:
-            mes_data = date(obj.ano, obj.mes, 1)
-            meta_obj = MetaMensal.objects.filter(indicador=obj.indicador, mes=mes_data).first()
-            if meta_obj:
-                return float(meta_obj.valor_meta)
-            # fallback para meta padrão do indicador
-            return float(obj.indicador.valor_meta) if obj.indicador and obj.indicador.valor_meta is not None else None
-        except Exception:
-            return float(obj.indicador.valor_meta) if obj.indicador and obj.indicador.valor_meta is not None else None
+            meta = self._meta_resolver(obj).meta(obj.indicador_id, date(obj.ano, obj.mes, 1))
+        except (TypeError, ValueError):
+            # competência inválida: fica a meta padrão do indicador
+            meta = obj.indicador.valor_meta if obj.indicador else None
+        return float(meta) if meta is not None else None
+
+    def _url_variante(self, obj, campo):
+        # Variantes WebP da prova em imagem (None enquanto não geradas / não é imagem)
+        prova = getattr(obj, 'prova', None)
+        return url_variante(self.context.get('request'), getattr(prova, campo, '') if prova else '')
+
+    def get_arquivo_preview(self, obj):
+        return self._url_variante(obj, 'preview_url')
+
+    def get_arquivo_miniatura(self, obj):
+        return self._url_variante(obj, 'miniatura_url')
 
     def get_preenchido_por(self, obj):
         """
@@ -136,3 +175,42 @@ class PreenchimentoHistoricoSerializer(serializers.ModelSerializer):
             'arquivo', 'mes', 'ano', 'tipo_valor'
         ]
         read_only_fields = ('data_preenchimento',)
+
+
+# =============================
+# 🔹 LISTAGEM ENXUTA (values())
+# =============================
+class PreenchimentoSlimSerializer(serializers.Serializer):
+    """
+    Serializa dicts vindos de .values(SLIM_FIELDS): sem SerializerMethodField
+    nem consultas por linha (ex.: meta) — para listagens longas.
+    """
+    SLIM_FIELDS = (
+        'id', 'indicador_id', 'indicador__nome', 'indicador__setor_id', 'indicador__setor__nome',
+        'mes', 'ano', 'valor_realizado', 'confirmado', 'data_preenchimento',
+        'comentario', 'arquivo', 'arquivo_status', 'origem',
+    )
+
+    id = serializers.IntegerField()
+    indicador = serializers.IntegerField(source='indicador_id')
+    indicador_nome = serializers.CharField(source='indicador__nome')
+    setor_id = serializers.IntegerField(source='indicador__setor_id')
+    setor_nome = serializers.CharField(source='indicador__setor__nome')
+    mes = serializers.IntegerField()
+    ano = serializers.IntegerField()
+    valor_realizado = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    confirmado = serializers.BooleanField()
+    data_preenchimento = serializers.DateTimeField()
+    comentario = serializers.CharField(allow_null=True)
+    arquivo = serializers.SerializerMethodField()
+    arquivo_status = serializers.CharField(allow_null=True)
+    origem = serializers.CharField(allow_null=True)
+
+    def get_arquivo(self, row):
+        # 'arquivo' guarda a URL do backend (upload_arquivo) ou o nome relativo do FileField
+        nome = row.get('arquivo')
+        if not nome:
+            return None
+        if nome.startswith(('http://', 'https://', '/')):
+            return nome
+        return default_storage.url(nome)
@@ -1,8 +1,9 @@
-from .storage import upload_arquivo
+from .storage import upload_arquivo, enviar_arquivo
 from .reports import gerar_relatorio_pdf, gerar_relatorio_excel
 
 __all__ = [
     "upload_arquivo",
+    "enviar_arquivo",
     "gerar_relatorio_pdf",
     "gerar_relatorio_excel",
 ]
@@ -0,0 +1,255 @@
+import re
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from api.models import Indicador, LogDeAcao, Setor
+
+logger = logging.getLogger(__name__)
+
+# Por thread: 'lotes' (registros por savepoint da transação aberta) e
+# 'bloco' (registros já confirmados da requisição/job)
+_estado = threading.local()
+
+
+def _limite() -> int:
+    return max(1, int(getattr(settings, 'AUDITORIA_BUFFER_MAX', 500)))
+
+
+def _gravar(entradas) -> None:
+    """Um bulk_create. Falha na auditoria é logada, nunca propagada ao chamador."""
+    if not entradas:
+        return
+    try:
+        # Savepoint quando chamado dentro de transação: o erro não a invalida
+        with transaction.atomic():
+            LogDeAcao.objects.bulk_create(entradas, batch_size=_limite())
+    except Exception:
+        logger.exception("Falha ao gravar %d registro(s) de auditoria", len(entradas))
+
+
+def _acumular(entradas) -> None:
+    """Fora de transação: vai para o bloco aberto (requisição/job) ou direto ao banco."""
+    bloco = getattr(_estado, 'bloco', None)
+    if bloco is None:
+        _gravar(entradas)
+        return
+    bloco.extend(entradas)
+    if len(bloco) >= _limite():
+        # Fila limitada: job longo descarrega no caminho em vez de crescer sem fim
+        _gravar(bloco[:])
+        bloco.clear()
+
+
+def _lote_da_transacao():
+    """
+    Lista dos registros do savepoint corrente (chave: connection.savepoint_ids).
+    Cada savepoint tem seu lote e seu callback on_commit: se ele for desfeito,
+    o Django descarta o callback, e só os registros dele se perdem. Guardamos
+    apenas weakref do callback: descartado ou já executado, o lote é refeito.
+    """
+    lotes = getattr(_estado, 'lotes', None)
+    if lotes is None:
+        lotes = _estado.lotes = {}
+    chave = tuple(connection.savepoint_ids)
+    ref = lotes.get(chave)
+    gravar_lote = ref() if ref is not None else None
+    if gravar_lote is not None:
+        return gravar_lote.lote
+
+    # Callbacks mortos (commit ou rollback) não servem mais
+    for morta in [k for k, r in lotes.items() if r() is None]:
+        del lotes[morta]
+
+    lote = []
+
+    def gravar_lote():
+        lotes.pop(chave, None)
+        _acumular(lote)
+
+    gravar_lote.lote = lote
+    lotes[chave] = weakref.ref(gravar_lote)
+    transaction.on_commit(gravar_lote)
+    return lote
+
+
+def registrar(usuario, acao: str, *, tipo_acao: str = LogDeAcao.OUTRO, indicador=None, setor=None,
+              competencia=None, valor=None, indicador_nome: str = None) -> None:
+    """
+    Enfileira um LogDeAcao. Dentro de transação: só é gravado se ela (e o
+    savepoint em que foi registrado) for confirmada, junto com os demais
+    registros dela. Fora: entra no bloco da requisição/job (em_lote) ou,
+    sem bloco, é gravado na hora.
+    'indicador'/'setor' aceitam instância ou id; o setor (e o nome) vem do indicador se omitido.
+    """
+    indicador_id = getattr(indicador, 'pk', indicador)
+    setor_id = getattr(setor, 'pk', setor)
+    if setor_id is None and indicador is not None and hasattr(indicador, 'setor_id'):
+        setor_id = indicador.setor_id
+    if indicador_nome is None:
+        indicador_nome = getattr(indicador, 'nome', '')
+    entrada = LogDeAcao(
+        usuario=usuario, acao=acao, tipo_acao=tipo_acao, indicador_id=indicador_id,
+        indicador_nome=indicador_nome or '', setor_id=setor_id, competencia=competencia, valor=valor,
+    )
+    if not connection.in_atomic_block:
+        _acumular([entrada])
+        return
+
+    lote = _lote_da_transacao()
+    lote.append(entrada)
+    if len(lote) >= _limite():
+        # Transação muito longa: grava dentro dela mesma (segue o commit/rollback)
+        _gravar(lote[:])
+        lote.clear()
+
+
+@contextmanager
+def em_lote():
+    """
+    Agrupa a auditoria de uma requisição ou job: tudo o que for confirmado
+    dentro do bloco é gravado em um bulk_create ao sair (e a cada
+    AUDITORIA_BUFFER_MAX registros). Blocos aninhados usam o de fora.
+    """
+    if getattr(_estado, 'bloco', None) is not None:
+        yield
+        return
+    _estado.bloco = []
+    try:
+        yield
+    finally:
+        bloco, _estado.bloco = _estado.bloco, None
+        _gravar(bloco)
+
+
+# =========================
+#   ESTRUTURAÇÃO DE LOGS ANTIGOS
+# =========================
+_NOME = r"'(?P<nome>.+)'"
+_COMPETENCIA = r"(?P<mes>\d{1,2})/(?P<ano>\d{4})"
+
+# Mensagens gravadas pelas views antes das colunas estruturadas (ordem importa)
+PADROES = [
+    (LogDeAcao.INDICADOR_CRIADO, re.compile(rf"^Cadastrou o indicador {_NOME}$")),
+    (LogDeAcao.INDICADOR_EDITADO, re.compile(rf"^Editou o indicador {_NOME}$")),
+    (LogDeAcao.INDICADOR_EXCLUIDO, re.compile(rf"^Excluiu o indicador {_NOME}$")),
+    (LogDeAcao.PREENCHIMENTO_EXCLUIDO,
+     re.compile(rf"^Excluiu preenchimento do indicador {_NOME} do mês {_COMPETENCIA}\.?$")),
+    (LogDeAcao.PREENCHIMENTO_CRIADO,
+     re.compile(rf"^.+ preencheu o indicador {_NOME} com (?P<valor>.+) referente a {_COMPETENCIA}$")),
+    (LogDeAcao.PREENCHIMENTO_ATUALIZADO,
+     re.compile(rf"^.+ atualizou o indicador {_NOME} com (?P<valor>.+) referente a {_COMPETENCIA}$")),
+    (LogDeAcao.METAS_EM_LOTE, re.compile(r"^Definiu \d+ metas mensais em lote$")),
+    (LogDeAcao.SETOR_CRIADO, re.compile(rf"^Cadastrou o setor {_NOME}$")),
+    (LogDeAcao.SETOR_EDITADO, re.compile(rf"^Editou o setor {_NOME}$")),
+    (LogDeAcao.SETOR_EXCLUIDO, re.compile(rf"^Excluiu o setor {_NOME}$")),
+    (LogDeAcao.CONFIGURACAO, re.compile(r"configura[çc](ão|ões)", re.IGNORECASE)),
+    (LogDeAcao.SENHA_ALTERADA, re.compile(r"^Alterou a senha do usuário ")),
+]
+
+_TIPOS_SETOR = {LogDeAcao.SETOR_CRIADO, LogDeAcao.SETOR_EDITADO, LogDeAcao.SETOR_EXCLUIDO}
+_TIPOS_INDICADOR = {
+    LogDeAcao.INDICADOR_CRIADO, LogDeAcao.INDICADOR_EDITADO, LogDeAcao.INDICADOR_EXCLUIDO,
+    LogDeAcao.PREENCHIMENTO_CRIADO, LogDeAcao.PREENCHIMENTO_ATUALIZADO, LogDeAcao.PREENCHIMENTO_EXCLUIDO,
+}
+
+
+def _valor_da_mensagem(texto: str):
+    from api.utils.normalizers import normalize_number  # evita import circular (api.utils → auditoria)
+    try:
+        valor = normalize_number(texto.replace('%', '').strip(), 'valor')
+    except Exception:
+        return None
+    if valor is None or abs(valor) >= 10 ** 8:  # não cabe em valor (max_digits=10)
+        return None
+    return Decimal(str(valor)).quantize(Decimal('0.01'))
+
+
+def estruturar_mensagem(acao: str, indicadores: dict, setores: dict) -> dict:
+    """
+    Colunas estruturadas a partir do texto de um log antigo.
+    'indicadores': {nome: (id, setor_id)}; 'setores': {nome: id}.
+    Mensagem não reconhecida → tipo 'outro'.
+    """
+    for tipo, padrao in PADROES:
+        m = padrao.search(acao or '')
+        if not m:
+            continue
+        campos = {'tipo_acao': tipo}
+        grupos = m.groupdict()
+        if grupos.get('nome') is not None:
+            if tipo in _TIPOS_SETOR:
+                campos['setor_id'] = setores.get(grupos['nome'])
+            else:
+                campos['indicador_nome'] = grupos['nome'][:255]
+                campos['indicador_id'], campos['setor_id'] = indicadores.get(grupos['nome'], (None, None))
+        if grupos.get('ano'):
+            mes = int(grupos['mes'])
+            if 1 <= mes <= 12:
+                campos['competencia'] = date(int(grupos['ano']), mes, 1)
+        if grupos.get('valor'):
+            campos['valor'] = _valor_da_mensagem(grupos['valor'])
+        return campos
+    return {'tipo_acao': LogDeAcao.OUTRO}
+
+
+def _nomear_logs(nomes: dict, lote: int, progresso=None, total: int = 0) -> int:
+    """
+    Logs estruturados antes da coluna indicador_nome: nome tirado do texto ou,
+    se não houver, do indicador atual ('nomes': {id: nome}). Mesmo esquema em lotes (keyset).
+    """
+    ultimo = 0
+    while True:
+        logs = list(
+            LogDeAcao.objects.filter(indicador_nome='', tipo_acao__in=_TIPOS_INDICADOR, pk__gt=ultimo)
+            .order_by('pk').only('id', 'acao', 'indicador_id')[:lote]
+        )
+        if not logs:
+            return total
+        for log in logs:
+            m = re.search(_NOME, log.acao or '')
+            log.indicador_nome = (m.group('nome') if m else nomes.get(log.indicador_id, ''))[:255]
+        LogDeAcao.objects.bulk_update(logs, ['indicador_nome'])
+        ultimo = logs[-1].pk
+        total += len(logs)
+        if progresso:
+            progresso(total)
+
+
+def estruturar_logs(lote: int = 2000, progresso=None) -> int:
+    """
+    Preenche as colunas estruturadas dos logs antigos (tipo_acao vazio)
+    em lotes por id (keyset): um SELECT e um bulk_update por lote. Depois,
+    o indicador_nome dos que já estavam estruturados sem ele.
+    Retomável: o que já foi estruturado não volta a ser lido. Retorna o nº de logs.
+    """
+    # Nome repetido entre indicadores: fica o mais recente (mesma ambiguidade do filtro textual)
+    linhas = list(Indicador.objects.order_by('id').values_list('id', 'nome', 'setor_id'))
+    indicadores = {nome: (pk, setor_id) for pk, nome, setor_id in linhas}
+    setores = dict(Setor.objects.values_list('nome', 'id'))
+    campos = ['tipo_acao', 'indicador', 'indicador_nome', 'setor', 'competencia', 'valor']
+
+    total, ultimo = 0, 0
+    while True:
+        logs = list(
+            LogDeAcao.objects.filter(tipo_acao='', pk__gt=ultimo).order_by('pk').only('id', 'acao')[:lote]
+        )
+        if not logs:
+            return _nomear_logs({pk: nome for pk, nome, _ in linhas}, lote, progresso, total)
+        for log in logs:
+            estruturado = dict.fromkeys(('indicador_id', 'setor_id', 'competencia', 'valor'))
+            estruturado['indicador_nome'] = ''
+            estruturado.update(estruturar_mensagem(log.acao, indicadores, setores))
+            for campo, valor in estruturado.items():
+                setattr(log, campo, valor)
+        LogDeAcao.objects.bulk_update(logs, campos)
+        ultimo = logs[-1].pk
+        total += len(logs)
+        if progresso:
+            progresso(total)
@@ -0,0 +1,95 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from api.models import PermissaoIndicador
+
+CHAVE_VERSAO = 'relatorios:versao'
+
+
+# Backends que guardam só na memória do próprio processo (ou em lugar nenhum)
+_BACKENDS_LOCAIS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_compartilhado() -> bool:
+    """Cache de relatórios ativo e visível por todos os processos (Redis, memcached, banco...)."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    return getattr(settings, 'REPORT_CACHE_ATIVO', True) and backend not in _BACKENDS_LOCAIS
+
+
+def versao_dados() -> int:
+    """Contador global de versão dos dados de relatório (preenchimentos, metas, indicadores)."""
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        cache.add(CHAVE_VERSAO, 1, timeout=None)
+        versao = cache.get(CHAVE_VERSAO, 1)
+    return versao
+
+
+def _incrementar_versao() -> None:
+    try:
+        cache.incr(CHAVE_VERSAO)
+    except ValueError:  # chave expirada/inexistente
+        cache.add(CHAVE_VERSAO, 1, timeout=None)
+        cache.incr(CHAVE_VERSAO)
+
+
+def invalidar_relatorios() -> None:
+    """
+    Incrementa a versão DEPOIS do commit: entradas antigas deixam de ser lidas
+    (expiram pelo TTL). Registrado após o recálculo dos fatos, roda depois dele.
+    """
+    transaction.on_commit(_incrementar_versao)
+
+
+def hash_escopo(user) -> str:
+    """
+    Identifica o que o usuário enxerga nos relatórios: master vê tudo;
+    gestor depende dos seus setores e das permissões manuais.
+    """
+    if getattr(user, 'perfil', None) != 'gestor':
+        return 'todos'
+    setores = sorted(user.setores.values_list('id', flat=True))
+    permissoes = sorted(
+        PermissaoIndicador.objects.filter(usuario=user).values_list('indicador_id', flat=True)
+    )
+    bruto = json.dumps([setores, permissoes], separators=(',', ':'))
+    return hashlib.sha256(bruto.encode()).hexdigest()[:16]
+
+
+def _normalizar_params(params) -> str:
+    """Query params ordenados, sem vazios: '?ano=2025&setor=1' == '?setor=1&ano=2025&mes='."""
+    itens = []
+    for chave in sorted(params.keys()):
+        valores = params.getlist(chave) if hasattr(params, 'getlist') else [params.get(chave)]
+        valores = sorted(str(v).strip() for v in valores if v not in (None, ''))
+        if valores:
+            itens.append([chave, valores])
+    return json.dumps(itens, separators=(',', ':'))
+
+
+def chave_relatorio(prefixo: str, user, params) -> str:
+    bruto = f"{hash_escopo(user)}|{_normalizar_params(params)}"
+    digest = hashlib.sha256(bruto.encode()).hexdigest()
+    return f"relatorios:{prefixo}:v{versao_dados()}:{digest}"
+
+
+def obter_ou_calcular(prefixo: str, user, params, calcular):
+    """
+    Devolve o resultado em cache para (escopo, filtros, versão) ou calcula e guarda.
+    Sem cache compartilhado (REPORT_CACHE_ATIVO=False) sempre calcula.
+    """
+    if not getattr(settings, 'REPORT_CACHE_ATIVO', True):
+        return calcular()
+    chave = chave_relatorio(prefixo, user, params)
+    resultado = cache.get(chave)
+    if resultado is None:
+        resultado = calcular()
+        cache.set(chave, resultado, timeout=getattr(settings, 'REPORT_CACHE_TIMEOUT', 3600))
+    return resultado
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from django.conf import settings
+
+from api.models import Configuracao, ConfiguracaoArmazenamento
+
+# Cache em processo: {nome: (expira_em, valor)}. Invalidado por signals ao salvar
+# (api.signals); o TTL limita a defasagem entre processos/workers.
+_cache = {}
+_cache_lock = threading.Lock()
+_AUSENTE = object()
+
+
+def _ttl() -> float:
+    return float(getattr(settings, 'CONFIG_CACHE_TTL', 30))
+
+
+def _obter(nome, carregar):
+    agora = time.monotonic()
+    with _cache_lock:
+        expira_em, valor = _cache.get(nome, (0, _AUSENTE))
+    if valor is not _AUSENTE and expira_em > agora:
+        return valor
+    valor = carregar()
+    with _cache_lock:
+        _cache[nome] = (agora + _ttl(), valor)
+    return valor
+
+
+def invalidar_configuracoes() -> None:
+    with _cache_lock:
+        _cache.clear()
+
+
+def armazenamento_ativo():
+    """
+    ConfiguracaoArmazenamento ativa (ou None), sem ida ao banco dentro do TTL.
+    A instância é compartilhada: trate como somente leitura.
+    """
+    return _obter('armazenamento', lambda: ConfiguracaoArmazenamento.objects.filter(ativo=True).first())
+
+
+def _carregar_configuracao():
+    obj = Configuracao.objects.order_by('-id').first()
+    if obj is None:
+        # se nunca foi criado, cria um com defaults
+        obj = Configuracao.objects.create()
+    return obj
+
+
+def configuracao_sistema() -> Configuracao:
+    """Singleton de Configuracao (criado com defaults se faltar). Somente leitura."""
+    return _obter('sistema', _carregar_configuracao)
+
+
+def dia_limite_preenchimento() -> int:
+    return configuracao_sistema().dia_limite_preenchimento
+
+
+def permitir_editar_meta_gestor() -> bool:
+    return configuracao_sistema().permitir_editar_meta_gestor
@@ -0,0 +1,159 @@
+import os
+import re
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+MANIFESTO = 'manifest.json'
+
+# Assets que recebem hash no nome (os HTMLs são pontos de entrada: nome fixo)
+EXTENSOES_COM_HASH = ('.js', '.css')
+# Só vale a pena pré-comprimir texto
+EXTENSOES_COMPRIMIVEIS = ('.html', '.js', '.css', '.json', '.svg', '.txt', '.csv')
+TAMANHO_MINIMO_COMPRESSAO = 1024
+
+# 'index.3f2a9c0b1d4e.js' (front empacotado) ou '<sha256>…' (provas endereçadas por conteúdo)
+_NOME_IMUTAVEL = re.compile(r'^(?:[0-9a-f]{64}|.+\.[0-9a-f]{12})\.[^/]+$')
+
+# src="js/x.js" / href="style.css" (referências relativas nos HTMLs)
+_REFERENCIA = re.compile(r'''(?P<attr>\b(?:src|href)\s*=\s*)(?P<q>["'])(?P<url>[^"'#?:]+)(?P<resto>[^"']*)(?P=q)''')
+
+
+def nome_imutavel(caminho: str) -> bool:
+    """Nome muda quando o conteúdo muda → pode ir para cache 'immutable'."""
+    return bool(_NOME_IMUTAVEL.match(os.path.basename(caminho)))
+
+
+def delegar_ao_proxy(completo: str, relativo: str, prefixo_interno: str = None):
+    """
+    Delega a transferência ao proxy (ARQUIVOS_OFFLOAD = 'x-accel' | 'x-sendfile').
+    No nginx, range e gzip_static/brotli_static ficam a cargo da location interna.
+    """
+    modo = (getattr(settings, 'ARQUIVOS_OFFLOAD', '') or '').lower()
+    if modo == 'x-accel' and prefixo_interno:
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = prefixo_interno.rstrip('/') + '/' + relativo.lstrip('/')
+        return response
+    if modo == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = completo
+        return response
+    return None
+
+
+def _hash_conteudo(caminho: str) -> str:
+    with open(caminho, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()[:12]
+
+
+def _nome_com_hash(relativo: str, digest: str) -> str:
+    base, ext = os.path.splitext(relativo)
+    return f"{base}.{digest}{ext}"
+
+
+def comprimir(caminho: str) -> list:
+    """
+    Grava '<arquivo>.gz' (e '<arquivo>.br' se o pacote brotli estiver instalado)
+    ao lado do original, só quando a versão comprimida compensa.
+    Retorna a lista de variantes geradas.
+    """
+    with open(caminho, 'rb') as f:
+        dados = f.read()
+    if len(dados) < TAMANHO_MINIMO_COMPRESSAO:
+        return []
+
+    variantes = {'.gz': gzip.compress(dados, compresslevel=9, mtime=0)}
+    try:
+        import brotli  # lazy import (opcional)
+        variantes['.br'] = brotli.compress(dados, quality=11)
+    except ImportError:
+        pass
+
+    geradas = []
+    for sufixo, comprimido in variantes.items():
+        if len(comprimido) >= len(dados) * 0.95:
+            continue
+        with open(caminho + sufixo, 'wb') as f:
+            f.write(comprimido)
+        geradas.append(caminho + sufixo)
+    return geradas
+
+
+def empacotar_front(origem: str, destino: str, comprimir_arquivos: bool = True) -> dict:
+    """
+    Copia o front de 'origem' para 'destino':
+      - .js/.css ganham o hash do conteúdo no nome (style.css → style.<hash>.css)
+      - referências src/href relativas nos HTMLs são reescritas para os nomes com hash
+      - texto é pré-comprimido (gzip/brotli)
+      - grava 'manifest.json' {original: com_hash}
+    O destino é recriado do zero. Retorna o manifesto.
+    """
+    origem = os.path.abspath(origem)
+    destino = os.path.abspath(destino)
+    if os.path.commonpath([origem, destino]) == origem:
+        raise ValueError("O destino do empacotamento não pode ficar dentro da origem.")
+
+    temporario = destino + '.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    manifesto = {}
+    htmls = []
+
+    for raiz, _, arquivos in os.walk(origem):
+        for nome in arquivos:
+            absoluto = os.path.join(raiz, nome)
+            relativo = os.path.relpath(absoluto, origem).replace(os.sep, '/')
+            ext = os.path.splitext(nome)[1].lower()
+            if ext in EXTENSOES_COM_HASH:
+                alvo = _nome_com_hash(relativo, _hash_conteudo(absoluto))
+                manifesto[relativo] = alvo
+            else:
+                alvo = relativo
+            if ext == '.html':
+                htmls.append(alvo)
+            os.makedirs(os.path.dirname(os.path.join(temporario, alvo)), exist_ok=True)
+            shutil.copy2(absoluto, os.path.join(temporario, alvo))
+
+    for relativo in htmls:
+        _reescrever_referencias(os.path.join(temporario, relativo), relativo, manifesto)
+
+    with open(os.path.join(temporario, MANIFESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, sort_keys=True)
+
+    if comprimir_arquivos:
+        for raiz, _, arquivos in os.walk(temporario):
+            for nome in arquivos:
+                if os.path.splitext(nome)[1].lower() in EXTENSOES_COMPRIMIVEIS:
+                    comprimir(os.path.join(raiz, nome))
+
+    # Troca o diretório inteiro de uma vez: nunca serve um build pela metade
+    antigo = destino + '.old'
+    shutil.rmtree(antigo, ignore_errors=True)
+    if os.path.exists(destino):
+        os.rename(destino, antigo)
+    os.rename(temporario, destino)
+    shutil.rmtree(antigo, ignore_errors=True)
+    return manifesto
+
+
+def _reescrever_referencias(caminho: str, relativo: str, manifesto: dict) -> None:
+    pasta = os.path.dirname(relativo)
+
+    def trocar(m):
+        url = m.group('url')
+        alvo = os.path.normpath(os.path.join(pasta, url)).replace(os.sep, '/')
+        if alvo not in manifesto:
+            return m.group(0)
+        novo = os.path.relpath(manifesto[alvo], pasta or '.').replace(os.sep, '/')
+        return f"{m.group('attr')}{m.group('q')}{novo}{m.group('resto')}{m.group('q')}"
+
+    with open(caminho, encoding='utf-8') as f:
+        html = f.read()
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(_REFERENCIA.sub(trocar, html))
@@ -0,0 +1,71 @@
+import csv
+import json
+
+from django.db.models import Q, Case, When, Value, BooleanField
+
+from api.services.reports import _build_base_queryset, condicao_atingido
+
+# Linhas buscadas por ida ao cursor do servidor (memória constante no processo)
+EXPORT_STREAM_CHUNK_SIZE = 5000
+
+COLUNAS = (
+    'indicador_id', 'indicador', 'setor_id', 'setor', 'competencia',
+    'valor_realizado', 'valor_meta', 'atingido', 'confirmado', 'autor',
+)
+
+
+def linhas_preenchimentos(user, setor=None, desde=None, ate=None):
+    """
+    Tuplas (na ordem de COLUNAS) dos preenchimentos com valor, no escopo do usuário.
+    Lidas por cursor do servidor (.iterator) em lotes de EXPORT_STREAM_CHUNK_SIZE.
+    """
+    qs = _build_base_queryset(user=user, params={'setor': setor} if setor else None)
+    qs = qs.filter(valor_realizado__isnull=False)
+    if desde:
+        qs = qs.filter(Q(ano__gt=desde.year) | Q(ano=desde.year, mes__gte=desde.month))
+    if ate:
+        qs = qs.filter(Q(ano__lt=ate.year) | Q(ano=ate.year, mes__lte=ate.month))
+
+    qs = (
+        qs
+        .annotate(atingido=Case(
+            When(condicao_atingido(), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ))
+        .order_by('ano', 'mes', 'indicador_id', 'id')
+        .values_list(
+            'indicador_id', 'indicador__nome', 'indicador__setor_id', 'indicador__setor__nome',
+            'ano', 'mes', 'valor_realizado', 'valor_meta_ref', 'atingido', 'confirmado',
+            'preenchido_por__email',
+        )
+    )
+
+    for (ind_id, ind_nome, setor_id, setor_nome, ano, mes,
+         valor, meta, atingido, confirmado, autor) in qs.iterator(chunk_size=EXPORT_STREAM_CHUNK_SIZE):
+        yield (
+            ind_id, ind_nome, setor_id, setor_nome, f"{ano:04d}-{mes:02d}",
+            valor, meta, atingido, confirmado, autor,
+        )
+
+
+class _Eco:
+    """Pseudo-buffer: csv.writer devolve a linha formatada em vez de gravá-la."""
+    def write(self, valor):
+        return valor
+
+
+def stream_csv(linhas):
+    writer = csv.writer(_Eco())
+    yield writer.writerow(COLUNAS)
+    for linha in linhas:
+        yield writer.writerow(linha)
+
+
+def stream_ndjson(linhas):
+    for linha in linhas:
+        registro = dict(zip(COLUNAS, linha))
+        for campo in ('valor_realizado', 'valor_meta'):
+            if registro[campo] is not None:
+                registro[campo] = float(registro[campo])
+        yield json.dumps(registro, ensure_ascii=False) + "\n"
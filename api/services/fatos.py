@@ -0,0 +1,171 @@
+import threading
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Q
+
+from api.models import Indicador, Preenchimento, FatoMensal
+from api.services.cache_relatorios import invalidar_relatorios
+
+_pendentes = threading.local()
+
+CAMPOS_ATUALIZAVEIS = [
+    'setor', 'preenchimento', 'valor_realizado', 'valor_meta', 'atingido', 'variacao', 'atualizado_em',
+]
+
+
+def calcular_atingimento(tipo_meta, valor, meta):
+    """
+    (atingido, variacao%) com a mesma regra de api.services.reports.condicao_atingido.
+    Variação é None quando a meta é ausente ou zero.
+    """
+    if valor is None or meta is None:
+        return False, None
+    if tipo_meta == 'crescente':
+        atingido = valor >= meta
+    elif tipo_meta == 'decrescente':
+        atingido = valor <= meta
+    elif tipo_meta == 'monitoramento':
+        atingido = abs(valor - meta) <= 5
+    else:
+        atingido = False
+
+    variacao = None
+    if meta != 0:
+        variacao = ((valor - meta) / meta * 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        if abs(variacao) >= Decimal('1e10'):  # fora do DecimalField(12, 2)
+            variacao = None
+    return atingido, variacao
+
+
+def _recalcular(indicador_ids, competencias=None) -> int:
+    """
+    Recalcula os fatos dos 'indicador_ids'. Se 'competencias' vier
+    ({(indicador_id, date)}), limita-se a essas chaves. Retorna nº de fatos gravados.
+    """
+    indicador_ids = set(indicador_ids)
+    if not indicador_ids:
+        return 0
+
+    indicadores = {
+        i['id']: i for i in
+        Indicador.objects.filter(pk__in=indicador_ids).values('id', 'setor_id', 'tipo_meta', 'valor_meta')
+    }
+
+    preench_qs = Preenchimento.objects.filter(indicador_id__in=indicador_ids, valor_realizado__isnull=False)
+    fatos_qs = FatoMensal.objects.filter(indicador_id__in=indicador_ids)
+    if competencias is not None:
+        filtro_p, filtro_f = Q(), Q()
+        for ind_id, comp in competencias:
+            filtro_p |= Q(indicador_id=ind_id, ano=comp.year, mes=comp.month)
+            filtro_f |= Q(indicador_id=ind_id, competencia=comp)
+        preench_qs = preench_qs.filter(filtro_p)
+        fatos_qs = fatos_qs.filter(filtro_f)
+
+    # Preenchimento de referência por competência: confirmado primeiro, depois o mais recente
+    referencia = {}
+    for p in (preench_qs
+              .order_by('indicador_id', 'ano', 'mes', '-confirmado', '-id')
+              .values('id', 'indicador_id', 'ano', 'mes', 'valor_realizado')):
+        referencia.setdefault((p['indicador_id'], date(p['ano'], p['mes'], 1)), p)
+
+    from api.services.metas import MetaResolver  # evita import circular (metas → fatos)
+    metas = MetaResolver()
+    metas.carregar(referencia)
+
+    novos = []
+    for (ind_id, comp), p in referencia.items():
+        ind = indicadores.get(ind_id)
+        if ind is None:
+            continue
+        meta = metas.meta(ind_id, comp)
+        atingido, variacao = calcular_atingimento(ind['tipo_meta'], p['valor_realizado'], meta)
+        novos.append(FatoMensal(
+            indicador_id=ind_id,
+            setor_id=ind['setor_id'],
+            competencia=comp,
+            preenchimento_id=p['id'],
+            valor_realizado=p['valor_realizado'],
+            valor_meta=meta,
+            atingido=atingido,
+            variacao=variacao,
+        ))
+
+    with transaction.atomic():
+        obsoletos = [
+            pk for pk, ind_id, comp in fatos_qs.values_list('id', 'indicador_id', 'competencia')
+            if (ind_id, comp) not in referencia
+        ]
+        if obsoletos:
+            FatoMensal.objects.filter(pk__in=obsoletos).delete()
+        if novos:
+            FatoMensal.objects.bulk_create(
+                novos,
+                update_conflicts=True,
+                unique_fields=['indicador', 'competencia'],
+                update_fields=CAMPOS_ATUALIZAVEIS,
+            )
+    if obsoletos or novos:
+        # Todo caminho que muda fatos (signals, placeholders, backfill) invalida os relatórios
+        invalidar_relatorios()
+    return len(novos)
+
+
+def atualizar_fatos(chaves) -> int:
+    """
+    chaves: iterável de (indicador_id, competencia | None).
+    competencia=None → recalcula o indicador inteiro.
+    """
+    inteiros = {i for i, c in chaves if c is None}
+    pontuais = {(i, c) for i, c in chaves if c is not None and i not in inteiros}
+    total = 0
+    if inteiros:
+        total += _recalcular(inteiros)
+    if pontuais:
+        total += _recalcular({i for i, _ in pontuais}, competencias=pontuais)
+    return total
+
+
+def reconstruir_fatos(indicador_ids=None, chunk_size: int = 200, progresso=None) -> int:
+    """
+    Backfill completo em lotes de 'chunk_size' indicadores (memória limitada).
+    Remove também fatos de indicadores inexistentes no escopo.
+    """
+    ids_qs = Indicador.objects.order_by('id').values_list('id', flat=True)
+    if indicador_ids is not None:
+        ids_qs = ids_qs.filter(pk__in=indicador_ids)
+    ids = list(ids_qs)
+
+    total = 0
+    for i in range(0, len(ids), chunk_size):
+        lote = ids[i:i + chunk_size]
+        total += _recalcular(lote)
+        if progresso:
+            progresso(min(i + chunk_size, len(ids)), len(ids), total)
+    return total
+
+
+# -------------------------
+# Atualização incremental (signals)
+# -------------------------
+def agendar_atualizacao(indicador_id, competencia=None) -> None:
+    """
+    Acumula a chave e recalcula DEPOIS do commit. Vários saves na mesma
+    transação geram um único recálculo (o 1º callback esvazia o conjunto).
+    """
+    if indicador_id is None:
+        return
+    chaves = getattr(_pendentes, 'chaves', None)
+    if chaves is None:
+        chaves = _pendentes.chaves = set()
+    chaves.add((indicador_id, competencia))
+    transaction.on_commit(_descarregar)
+
+
+def _descarregar() -> None:
+    chaves = getattr(_pendentes, 'chaves', None)
+    if not chaves:
+        return
+    _pendentes.chaves = set()
+    atualizar_fatos(chaves)
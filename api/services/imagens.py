@@ -0,0 +1,70 @@
+import os
+import logging
+from io import BytesIO
+
+from django.conf import settings
+
+from api.models import ArquivoProva
+from api.services.storage import enviar_arquivo
+
+logger = logging.getLogger(__name__)
+
+# nome → (setting do lado máximo, padrão em px, qualidade WebP)
+VARIANTES = {
+    'preview': ('PROVA_PREVIEW_PX', 1280, 80),
+    'miniatura': ('PROVA_MINIATURA_PX', 320, 70),
+}
+
+
+def chaves_variantes(chave: str) -> dict:
+    """'provas/ab/<sha>.jpg' → {'preview': 'provas/ab/<sha>.preview.webp', ...} (ao lado do original)."""
+    base, _ = os.path.splitext(chave)
+    return {nome: f"{base}.{nome}.webp" for nome in VARIANTES}
+
+
+def url_variante(request, url):
+    """URL de preview/miniatura (relativa no armazenamento local) → absoluta; None se não houver."""
+    if not url:
+        return None
+    if request is not None and url.startswith('/'):
+        return request.build_absolute_uri(url)
+    return url
+
+
+def _renderizar(Image, ImageOps, caminho: str, lado: int, qualidade: int) -> BytesIO:
+    with Image.open(caminho) as img:
+        # JPEG: decodifica já reduzido (bem mais rápido e leve p/ fotos de celular)
+        img.draft('RGB', (lado, lado))
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        img.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+        saida = BytesIO()
+        img.save(saida, format='WEBP', quality=qualidade, method=4)
+    saida.seek(0)
+    return saida
+
+
+def gerar_variantes(prova: ArquivoProva, caminho: str) -> bool:
+    """
+    Gera preview e miniatura WebP a partir do arquivo local 'caminho' (o staging
+    do upload) e grava no mesmo backend do original. Não é imagem ou já tem → False.
+    """
+    if not prova.e_imagem or prova.miniatura_url:
+        return False
+    try:
+        from PIL import Image, ImageOps  # lazy import
+    except Exception as e:
+        raise RuntimeError("Dependência Pillow ausente. pip install pillow") from e
+
+    urls = {}
+    chaves = chaves_variantes(prova.chave)
+    for nome, (setting, padrao, qualidade) in VARIANTES.items():
+        lado = int(getattr(settings, setting, padrao))
+        conteudo = _renderizar(Image, ImageOps, caminho, lado, qualidade)
+        urls[f"{nome}_url"] = enviar_arquivo(conteudo, chaves[nome], prova.armazenamento, chave=chaves[nome]).url
+
+    ArquivoProva.objects.filter(pk=prova.pk).update(**urls)
+    for campo, url in urls.items():
+        setattr(prova, campo, url)
+    return True
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import secrets
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction, close_old_connections
+from django.db.models import Count, Max, Q
+from django.utils.timezone import now
+
+from api.models import ExportacaoRelatorio
+from api.services.cache_relatorios import hash_escopo, _normalizar_params
+from api.services.reports import _build_fatos_queryset, escrever_relatorio_pdf, escrever_relatorio_excel
+
+logger = logging.getLogger(__name__)
+
+ESCRITORES = {
+    # Só aqui (fora da requisição) o PDF grande pode ser renderizado em processos
+    ExportacaoRelatorio.FORMATO_PDF: partial(escrever_relatorio_pdf, paralelo=True),
+    ExportacaoRelatorio.FORMATO_XLSX: escrever_relatorio_excel,
+}
+
+# Parâmetro de controle (não entra na chave nem nos filtros)
+PARAM_ASSINCRONO = 'assincrono'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'REPORT_EXPORT_WORKERS', 2),
+                thread_name_prefix='exportacao-relatorios',
+            )
+        return _executor
+
+
+def storage_exportacoes() -> FileSystemStorage:
+    """Storage privado (REPORT_EXPORT_ROOT): nada aqui tem URL pública."""
+    return FileSystemStorage(location=settings.REPORT_EXPORT_ROOT)
+
+
+def _filtros(params) -> dict:
+    return {k: params.get(k) for k in (params or {}) if k != PARAM_ASSINCRONO and params.get(k) not in (None, '')}
+
+
+def exportacao_em_segundo_plano(user, params, formato):
+    """
+    Decide se o pedido vira job: ?assincrono=1 ou nº estimado de linhas
+    >= REPORT_EXPORT_ASYNC_MIN_LINHAS. Retorna o job (novo ou reaproveitado)
+    ou None para gerar na própria requisição.
+    """
+    filtros = _filtros(params)
+    forcar = str(params.get(PARAM_ASSINCRONO)).lower() in ('1', 'true', 't', 'yes', 'y')
+    if not forcar:
+        limite = getattr(settings, 'REPORT_EXPORT_ASYNC_MIN_LINHAS', 5000)
+        # Conta só até o limite: não varre a tabela inteira para decidir
+        estimadas = len(_build_fatos_queryset(user=user, params=filtros).order_by().values('id')[:limite])
+        if estimadas < limite:
+            return None
+    return obter_ou_criar_job(user, filtros, formato)
+
+
+def _versao_dados(user, filtros: dict) -> str:
+    """
+    Versão persistida do recorte exportado: último recálculo e nº de fatos.
+    Vem do banco (não do cache): sobrevive a reinícios e vale entre processos.
+    """
+    agregado = _build_fatos_queryset(user=user, params=filtros).order_by().aggregate(
+        ultimo=Max('atualizado_em'), total=Count('id'),
+    )
+    ultimo = agregado['ultimo'].isoformat() if agregado['ultimo'] else '-'
+    return f"{ultimo}:{agregado['total']}"
+
+
+def _expirado(job: ExportacaoRelatorio, agora) -> bool:
+    """Concluído além do TTL (ou sem arquivo) / na fila ou gerando além do timeout."""
+    if job.status == ExportacaoRelatorio.CONCLUIDO:
+        ttl = timedelta(hours=getattr(settings, 'REPORT_EXPORT_TTL_HORAS', 24))
+        return job.criado_em < agora - ttl or not storage_exportacoes().exists(job.arquivo)
+    timeout = timedelta(seconds=getattr(settings, 'REPORT_EXPORT_TIMEOUT', 1800))
+    return job.criado_em < agora - timeout
+
+
+def _descartar(jobs) -> int:
+    """
+    Tira os jobs da deduplicação: travados viram 'failed' (worker morreu no
+    meio); concluídos/falhos são apagados junto com o arquivo. Retorna o nº de jobs.
+    """
+    travados = [j.pk for j in jobs if j.status in (ExportacaoRelatorio.PENDENTE, ExportacaoRelatorio.PROCESSANDO)]
+    ExportacaoRelatorio.objects.filter(
+        pk__in=travados, status__in=(ExportacaoRelatorio.PENDENTE, ExportacaoRelatorio.PROCESSANDO)
+    ).update(status=ExportacaoRelatorio.FALHOU, erro="Tempo esgotado.", concluido_em=now())
+
+    storage = storage_exportacoes()
+    finalizados = [j for j in jobs if j.pk not in travados]
+    for job in finalizados:
+        if job.arquivo:
+            storage.delete(job.arquivo)
+    ExportacaoRelatorio.objects.filter(pk__in=[j.pk for j in finalizados]).delete()
+    return len(jobs)
+
+
+def limpar_exportacoes(agora=None) -> int:
+    """
+    Faxina periódica (comando limpar_exportacoes): marca os travados como
+    falhos e apaga jobs e arquivos com mais de REPORT_EXPORT_TTL_HORAS.
+    """
+    agora = agora or now()
+    ttl = timedelta(hours=getattr(settings, 'REPORT_EXPORT_TTL_HORAS', 24))
+    timeout = timedelta(seconds=getattr(settings, 'REPORT_EXPORT_TIMEOUT', 1800))
+    ativos = (ExportacaoRelatorio.PENDENTE, ExportacaoRelatorio.PROCESSANDO)
+    jobs = list(ExportacaoRelatorio.objects.filter(
+        Q(status__in=ativos, criado_em__lt=agora - timeout) |
+        (~Q(status__in=ativos) & Q(criado_em__lt=agora - ttl))
+    ))
+    return _descartar(jobs)
+
+
+def obter_ou_criar_job(user, filtros: dict, formato: str) -> ExportacaoRelatorio:
+    """
+    Pedidos idênticos (formato, escopo, filtros, versão dos dados) compartilham
+    o job: o índice único parcial em 'chave' resolve a corrida entre requisições.
+    Job travado ou expirado é descartado e o pedido é redespachado.
+    """
+    escopo = hash_escopo(user)
+    bruto = f"{formato}|{escopo}|{_normalizar_params(filtros)}|{_versao_dados(user, filtros)}"
+    chave = hashlib.sha256(bruto.encode()).hexdigest()
+
+    existente = ExportacaoRelatorio.objects.filter(
+        chave=chave, status__in=ExportacaoRelatorio.STATUS_ATIVOS
+    ).first()
+    if existente:
+        if not _expirado(existente, now()):
+            return existente
+        _descartar([existente])
+
+    try:
+        with transaction.atomic():
+            job = ExportacaoRelatorio.objects.create(
+                chave=chave, formato=formato, escopo=escopo, params=filtros, solicitado_por=user,
+            )
+    except IntegrityError:
+        return ExportacaoRelatorio.objects.get(chave=chave, status__in=ExportacaoRelatorio.STATUS_ATIVOS)
+
+    transaction.on_commit(lambda: _despachar(job.pk))
+    return job
+
+
+def _despachar(job_id: int) -> None:
+    if getattr(settings, 'REPORT_EXPORT_EAGER', False):
+        processar_exportacao(job_id)
+    else:
+        _get_executor().submit(_processar_em_thread, job_id)
+
+
+def _processar_em_thread(job_id: int) -> None:
+    close_old_connections()
+    try:
+        processar_exportacao(job_id)
+    finally:
+        close_old_connections()
+
+
+def processar_exportacao(job_id: int) -> bool:
+    """
+    Gera o arquivo num temporário e grava no storage privado de exportações,
+    com nome aleatório (não derivável do id nem da chave).
+    """
+    atualizados = ExportacaoRelatorio.objects.filter(
+        pk=job_id, status=ExportacaoRelatorio.PENDENTE
+    ).update(status=ExportacaoRelatorio.PROCESSANDO)
+    if not atualizados:
+        return False  # já processado (ou em processamento) por outro worker
+
+    job = ExportacaoRelatorio.objects.select_related('solicitado_por').get(pk=job_id)
+    try:
+        if job.solicitado_por is None:
+            # Sem o usuário não há como aplicar o escopo de visibilidade
+            raise RuntimeError("Usuário solicitante removido.")
+        total = _build_fatos_queryset(user=job.solicitado_por, params=job.params).count()
+        with tempfile.TemporaryFile() as tmp:
+            ESCRITORES[job.formato](tmp, user=job.solicitado_por, params=job.params)
+            tmp.seek(0)
+            nome = storage_exportacoes().save(f"{secrets.token_hex(16)}.{job.formato}", File(tmp))
+    except Exception as e:
+        logger.exception("Falha ao gerar exportação id=%s", job_id)
+        ExportacaoRelatorio.objects.filter(pk=job_id, status=ExportacaoRelatorio.PROCESSANDO).update(
+            status=ExportacaoRelatorio.FALHOU, erro=str(e)[:2000], concluido_em=now()
+        )
+        return False
+
+    concluidos = ExportacaoRelatorio.objects.filter(pk=job_id, status=ExportacaoRelatorio.PROCESSANDO).update(
+        status=ExportacaoRelatorio.CONCLUIDO, arquivo=nome, total_linhas=total, concluido_em=now()
+    )
+    if not concluidos:
+        # Dado como travado (timeout) enquanto gerava: outro job já assumiu a chave
+        storage_exportacoes().delete(nome)
+        return False
+    return True
@@ -1,9 +1,16 @@
 # services/metas.py
+from collections import defaultdict, namedtuple
 from datetime import date
+from decimal import Decimal
 from dateutil.relativedelta import relativedelta
+from django.db import connection, transaction
+from django.db.models import DateField, F, Func, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils.timezone import localdate
 
 from api.models import Indicador, MetaMensal
+from api.services.fatos import agendar_atualizacao
+from api.services.cache_relatorios import invalidar_relatorios
 
 
 def _first_of_month(d: date) -> date:
@@ -100,3 +107,231 @@ def ensure_metas_ate(indicador: Indicador, target_end: date, *, hard_cap: bool =
     step = _coerce_step(indicador.periodicidade)
     start = _first_of_month(indicador.mes_inicial)
     _ensure_range(indicador, start, _first_of_month(target_end), step, hard_cap=hard_cap)
+
+
+# =========================
+#   RECONCILIAÇÃO EM LOTE
+# =========================
+ResumoReconciliacao = namedtuple('ResumoReconciliacao', 'indicadores criadas removidas')
+
+
+def _ultimo_mes_fechado() -> date:
+    return _first_of_month(localdate()) - relativedelta(months=1)
+
+
+def _meses_alinhados(indicador, fim: date) -> set:
+    """
+    Mesma regra de api.utils.periodicidade.meses_permitidos, limitada a 'fim',
+    em aritmética de inteiros (sem relativedelta por mês: é o laço quente do lote).
+    """
+    step = _coerce_step(indicador.periodicidade)
+    if indicador.mes_inicial:
+        base = indicador.mes_inicial
+    elif indicador.criado_em:
+        base = localdate(indicador.criado_em)
+    else:
+        base = localdate()
+    inicio = base.year * 12 + base.month - 1
+    ultimo = fim.year * 12 + fim.month - 1
+    return {date(i // 12, i % 12 + 1, 1) for i in range(inicio, ultimo + 1, step)}
+
+
+def reconciliar_metas(indicadores=None, *, ate: date = None, hard_cap: bool = True, lote: int = 5000,
+                      aplicar: bool = True) -> ResumoReconciliacao:
+    """
+    Reconciliador em lote (mesmo resultado de IndicadorSerializer._ensure_metas_ate
+    com hard_cap, para N indicadores de uma vez):
+      - alvo de cada indicador: mes_final (se houver) limitado a 'ate' (padrão: mês passado)
+      - cria as metas alinhadas faltantes com o valor_meta do indicador
+      - remove metas desalinhadas a partir da âncora e (hard_cap) todas após o alvo
+    'indicadores': queryset (padrão: ativos). Uma consulta lê todas as metas
+    existentes; criações e remoções vão em lotes de 'lote'. aplicar=False só conta.
+    """
+    ate = _first_of_month(ate or _ultimo_mes_fechado())
+    if indicadores is None:
+        indicadores = Indicador.objects.filter(ativo=True)
+    indicadores = list(indicadores.only('id', 'periodicidade', 'mes_inicial', 'mes_final', 'criado_em', 'valor_meta'))
+    if not indicadores:
+        return ResumoReconciliacao(0, 0, 0)
+
+    existentes = defaultdict(dict)  # indicador_id → {mes: meta_id}
+    for pk, indicador_id, mes in (
+        MetaMensal.objects.filter(indicador_id__in=[i.pk for i in indicadores])
+        .values_list('id', 'indicador_id', 'mes').iterator(chunk_size=lote)
+    ):
+        existentes[indicador_id][mes] = pk
+
+    novas, remover, tocados = [], [], set()
+    for indicador in indicadores:
+        fim = min(_first_of_month(indicador.mes_final), ate) if indicador.mes_final else ate
+        permitidos = _meses_alinhados(indicador, fim)
+        atuais = existentes.get(indicador.pk, {})
+        base = min(permitidos) if permitidos else None
+
+        faltantes = permitidos.difference(atuais)
+        novas.extend((indicador.pk, mes, indicador.valor_meta) for mes in faltantes)
+        desalinhadas = [
+            meta_id for mes, meta_id in atuais.items()
+            # Antes da âncora fica como está (o update do indicador cuida disso)
+            if (mes > fim and hard_cap) or (mes <= fim and base is not None and mes >= base and mes not in permitidos)
+        ]
+        remover.extend(desalinhadas)
+        if faltantes or desalinhadas:
+            tocados.add(indicador.pk)
+
+    if aplicar and tocados:
+        tabela = connection.ops.quote_name(MetaMensal._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # SQL direto com arrays: um comando por lote, sem instanciar modelos.
+            # O post_save/post_delete por instância é substituído pelo agendamento abaixo
+            for i in range(0, len(remover), lote):
+                cursor.execute(f"DELETE FROM {tabela} WHERE id = ANY(%s)", [remover[i:i + lote]])
+            for i in range(0, len(novas), lote):
+                indicador_ids, meses, valores = zip(*novas[i:i + lote])
+                cursor.execute(
+                    f"INSERT INTO {tabela} (indicador_id, mes, valor_meta) "
+                    "SELECT * FROM unnest(%s::bigint[], %s::date[], %s::numeric[]) "
+                    "ON CONFLICT (indicador_id, mes) DO NOTHING",
+                    [list(indicador_ids), list(meses), list(valores)],
+                )
+            # Vários meses do mesmo indicador → um recálculo do indicador inteiro
+            for indicador_id in tocados:
+                agendar_atualizacao(indicador_id)
+            invalidar_relatorios()
+
+    return ResumoReconciliacao(len(indicadores), len(novas), len(remover))
+
+
+# =========================
+#   EDIÇÃO EM LOTE
+# =========================
+def propagar_valor_meta(indicador: Indicador, valor, desde: date, ate: date = None) -> int:
+    """
+    Aplica 'valor' às metas mensais já existentes do indicador com
+    mes em [desde, ate] ('ate' None → sem limite) em um único UPDATE.
+    Retorna o nº de metas alteradas.
+    """
+    qs = MetaMensal.objects.filter(indicador=indicador, mes__gte=_first_of_month(desde))
+    if ate:
+        qs = qs.filter(mes__lte=_first_of_month(ate))
+    alteradas = qs.update(valor_meta=valor)
+    if alteradas:
+        # queryset.update não dispara post_save: um recálculo do indicador inteiro
+        agendar_atualizacao(indicador.pk)
+        invalidar_relatorios()
+    return alteradas
+
+
+def definir_metas_em_lote(itens) -> list:
+    """
+    Upsert de (indicador_id, mes, valor_meta) em um único INSERT … ON CONFLICT.
+    Repetições do mesmo (indicador, mes) valem pela última ocorrência.
+    Retorna [(id, indicador_id, mes, valor_meta)] ordenado por indicador/mês.
+    """
+    unicos = {}
+    for indicador_id, mes, valor in itens:
+        unicos[(indicador_id, _first_of_month(mes))] = Decimal(str(valor))  # array homogêneo p/ o driver
+    if not unicos:
+        return []
+
+    indicador_ids, meses = zip(*unicos)
+    tabela = connection.ops.quote_name(MetaMensal._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabela} (indicador_id, mes, valor_meta) "
+            "SELECT * FROM unnest(%s::bigint[], %s::date[], %s::numeric[]) "
+            "ON CONFLICT (indicador_id, mes) DO UPDATE SET valor_meta = EXCLUDED.valor_meta "
+            "RETURNING id, indicador_id, mes, valor_meta",
+            [list(indicador_ids), list(meses), list(unicos.values())],
+        )
+        linhas = cursor.fetchall()
+        for indicador_id in set(indicador_ids):
+            agendar_atualizacao(indicador_id)
+        invalidar_relatorios()
+    return sorted(linhas, key=lambda linha: (linha[1], linha[2]))
+
+
+# =========================
+#   RESOLUÇÃO DE METAS
+# =========================
+class MetaResolver:
+    """
+    Meta vigente de (indicador_id, competência): a MetaMensal do mês ou,
+    na falta dela, Indicador.valor_meta. Chaves novas são resolvidas em uma
+    única consulta por chamada de carregar(); o resultado fica num dict
+    {(indicador_id, date): Decimal | None} reutilizável pela requisição
+    (ver da_requisicao) ou por um job em lote.
+    """
+    __slots__ = ('_metas',)
+
+    def __init__(self):
+        self._metas = {}
+
+    @classmethod
+    def da_requisicao(cls, request) -> 'MetaResolver':
+        """Uma instância por requisição (guardada no próprio request)."""
+        if request is None:
+            return cls()
+        resolver = getattr(request, '_meta_resolver', None)
+        if resolver is None:
+            resolver = cls()
+            setattr(request, '_meta_resolver', resolver)
+        return resolver
+
+    def __len__(self):
+        return len(self._metas)
+
+    def carregar(self, chaves) -> None:
+        """Resolve de uma vez as chaves (indicador_id, date) ainda não conhecidas."""
+        novas = {(int(ind), _first_of_month(comp)) for ind, comp in chaves} - self._metas.keys()
+        if not novas:
+            return
+        indicador_ids, meses = zip(*novas)
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT k.indicador_id, k.mes, COALESCE(mm.valor_meta, i.valor_meta) "
+                "FROM unnest(%s::bigint[], %s::date[]) AS k(indicador_id, mes) "
+                f"JOIN {quote(Indicador._meta.db_table)} i ON i.id = k.indicador_id "
+                f"LEFT JOIN {quote(MetaMensal._meta.db_table)} mm "
+                "ON mm.indicador_id = k.indicador_id AND mm.mes = k.mes",
+                [list(indicador_ids), list(meses)],
+            )
+            self._metas.update(((ind, mes), valor) for ind, mes, valor in cursor.fetchall())
+        # Indicador inexistente: None também fica em cache (não consulta de novo)
+        self._metas.update((chave, None) for chave in novas - self._metas.keys())
+
+    def resolver(self, chaves) -> dict:
+        chaves = [(int(ind), _first_of_month(comp)) for ind, comp in chaves]
+        self.carregar(chaves)
+        return {chave: self._metas[chave] for chave in chaves}
+
+    def meta(self, indicador_id, competencia: date):
+        chave = (int(indicador_id), _first_of_month(competencia))
+        if chave not in self._metas:
+            self.carregar([chave])
+        return self._metas[chave]
+
+    def esquecer(self, indicador_id=None) -> None:
+        """Descarta o cache (todo ou de um indicador) após alterar metas no meio do lote."""
+        if indicador_id is None:
+            self._metas.clear()
+        else:
+            for chave in [c for c in self._metas if c[0] == indicador_id]:
+                del self._metas[chave]
+
+
+def expressao_meta(indicador='indicador_id', ano='ano', mes='mes', padrao='indicador__valor_meta'):
+    """
+    A mesma regra do MetaResolver em SQL, para anotar querysets que filtram
+    ou agregam pela meta no banco (igualdade em (indicador_id, mes) → índice único).
+    """
+    meta_subq = (
+        MetaMensal.objects
+        .filter(
+            indicador_id=OuterRef(indicador),
+            mes=Func(OuterRef(ano), OuterRef(mes), Value(1), function='MAKE_DATE', output_field=DateField()),
+        )
+        .values('valor_meta')[:1]
+    )
+    return Coalesce(Subquery(meta_subq), F(padrao))
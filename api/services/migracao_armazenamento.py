@@ -0,0 +1,191 @@
+import os
+import shutil
+import logging
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import models, transaction, close_old_connections
+from django.db.models import Case, Exists, OuterRef, Q, Value, When
+from django.utils.timezone import now
+
+from api.models import ArquivoProva, MigracaoArmazenamentoItem, Preenchimento
+from api.services.imagens import gerar_variantes
+from api.services.provas import armazenar_prova
+from api.services.storage import abrir_arquivo, chave_da_url, tamanho_arquivo
+
+logger = logging.getLogger(__name__)
+
+# Um objeto no backend de origem e quem aponta para ele:
+# prova_id (ArquivoProva na origem) ou legados ((preenchimento_id, URL lida), sem prova)
+ItemMigracao = namedtuple('ItemMigracao', 'chave prova_id legados sha256 tamanho')
+
+ResumoMigracao = namedtuple('ResumoMigracao', 'migrados retomados falhas')
+
+
+def itens_a_migrar(origem) -> list:
+    """
+    Objetos da origem ainda referenciados por algum preenchimento:
+    provas endereçadas por conteúdo + URLs legadas (anteriores ao ArquivoProva).
+    """
+    referenciadas = Preenchimento.objects.filter(prova_id=OuterRef('pk'))
+    itens = [
+        ItemMigracao(chave, pk, None, sha256, tamanho)
+        for pk, chave, sha256, tamanho in (
+            ArquivoProva.objects.filter(armazenamento=origem).filter(Exists(referenciadas))
+            .order_by('id').values_list('id', 'chave', 'sha256', 'tamanho')
+        )
+    ]
+    legados = (
+        Preenchimento.objects.filter(prova__isnull=True).exclude(arquivo='').exclude(arquivo__isnull=True)
+        .exclude(arquivo_status=Preenchimento.ARQUIVO_PENDENTE)  # envio em andamento
+        .order_by('id').values_list('id', 'arquivo')
+    )
+    por_chave = {}
+    for pk, url in legados:
+        chave = chave_da_url(origem, url)
+        if chave:
+            por_chave.setdefault(chave, []).append((pk, url))
+    itens.extend(ItemMigracao(chave, None, tuple(refs), None, None) for chave, refs in por_chave.items())
+    return itens
+
+
+def estimar(origem, itens, workers: int = 16) -> dict:
+    """Dry-run: nº de objetos e bytes a copiar (legados sem tamanho conhecido → HEAD em paralelo)."""
+    desconhecidos = [it.chave for it in itens if it.tamanho is None]
+
+    def medir(chave):
+        try:
+            return tamanho_arquivo(origem, chave)
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='migracao-estimativa') as pool:
+        medidos = list(pool.map(medir, desconhecidos))
+    return {
+        'objetos': len(itens),
+        'bytes': sum(it.tamanho for it in itens if it.tamanho is not None) + sum(m for m in medidos if m),
+        'inacessiveis': sum(1 for m in medidos if m is None),
+    }
+
+
+def _copiar(item, origem, destino) -> ArquivoProva:
+    """Origem → temporário local → armazenar_prova no destino (deduplica por SHA-256)."""
+    if item.sha256:
+        existente = ArquivoProva.objects.filter(armazenamento=destino, sha256=item.sha256).first()
+        if existente:
+            return existente  # conteúdo já está no destino: nada a transferir
+
+    _, ext = os.path.splitext(item.chave.lower())
+    with tempfile.TemporaryDirectory(prefix='migracao-') as pasta:
+        caminho = os.path.join(pasta, f"objeto{ext}")
+        stream = abrir_arquivo(origem, item.chave)
+        try:
+            with open(caminho, 'wb') as saida:
+                shutil.copyfileobj(stream, saida, 1024 * 1024)
+        finally:
+            getattr(stream, 'close', lambda: None)()
+
+        prova = armazenar_prova(caminho, destino, item.sha256)
+        try:
+            gerar_variantes(prova, caminho)
+        except Exception:
+            logger.warning("Falha ao gerar variantes da prova id=%s", prova.pk, exc_info=True)
+        return prova
+
+
+def _checkpoint(origem, destino, chave, status, prova=None, erro='') -> None:
+    MigracaoArmazenamentoItem.objects.update_or_create(
+        origem=origem, destino=destino, chave_origem=chave,
+        defaults={'status': status, 'prova': prova, 'erro': erro[:2000], 'atualizado_em': now()},
+    )
+
+
+def _migrar_item(item, origem, destino):
+    """Roda no pool: copia e grava o checkpoint 'copiado'. Retorna (item, prova | None)."""
+    close_old_connections()
+    try:
+        prova = _copiar(item, origem, destino)
+        _checkpoint(origem, destino, item.chave, MigracaoArmazenamentoItem.COPIADO, prova)
+        return item, prova
+    except Exception as e:
+        logger.warning("Falha ao migrar %s", item.chave, exc_info=True)
+        _checkpoint(origem, destino, item.chave, MigracaoArmazenamentoItem.FALHOU, erro=str(e))
+        return item, None
+    finally:
+        close_old_connections()
+
+
+def _reescrever_urls(origem, destino, copiados) -> None:
+    """
+    Um UPDATE (CASE) por tipo de referência para o lote inteiro + checkpoints 'concluido'.
+    Só troca quem ainda aponta para o objeto copiado: um preenchimento que recebeu
+    prova nova durante a cópia fica como está.
+    """
+    por_prova = {it.prova_id: p for it, p in copiados if it.prova_id}
+    # legado: (id, URL lida em itens_a_migrar) → sem prova e com a mesma URL
+    por_legado = {ref: p for it, p in copiados for ref in (it.legados or ())}
+
+    with transaction.atomic():
+        if por_prova:
+            Preenchimento.objects.filter(prova_id__in=list(por_prova)).update(
+                prova_id=Case(*[When(prova_id=k, then=Value(p.pk)) for k, p in por_prova.items()],
+                              output_field=models.BigIntegerField()),
+                arquivo=Case(*[When(prova_id=k, then=Value(p.url)) for k, p in por_prova.items()],
+                             output_field=models.CharField()),
+            )
+        if por_legado:
+            filtro = Q()
+            for pk, url in por_legado:
+                filtro |= Q(id=pk, arquivo=url)
+            Preenchimento.objects.filter(filtro, prova__isnull=True).update(
+                prova_id=Case(*[When(id=pk, then=Value(p.pk)) for (pk, _), p in por_legado.items()],
+                              output_field=models.BigIntegerField()),
+                arquivo=Case(*[When(id=pk, then=Value(p.url)) for (pk, _), p in por_legado.items()],
+                             output_field=models.CharField()),
+            )
+        MigracaoArmazenamentoItem.objects.filter(
+            origem=origem, destino=destino, chave_origem__in=[it.chave for it, _ in copiados]
+        ).update(status=MigracaoArmazenamentoItem.CONCLUIDO, atualizado_em=now())
+
+
+def migrar_armazenamento(origem, destino, workers: int = 16, lote: int = 500, progresso=None) -> ResumoMigracao:
+    """
+    Copia para 'destino' todos os objetos da 'origem' referenciados por
+    preenchimentos e reescreve as URLs em lotes. Retomável: itens com
+    checkpoint 'copiado' não são baixados de novo. Os objetos na origem
+    ficam intactos (as provas antigas viram órfãs → coletar_provas_orfas).
+    """
+    if origem.pk == destino.pk:
+        raise ValueError("Origem e destino são a mesma configuração.")
+
+    lote = max(1, lote)
+    itens = itens_a_migrar(origem)
+    ja_copiados = {
+        c.chave_origem: c.prova
+        for c in MigracaoArmazenamentoItem.objects.filter(
+            origem=origem, destino=destino, status=MigracaoArmazenamentoItem.COPIADO, prova__isnull=False,
+        ).select_related('prova')
+    }
+
+    migrados = retomados = falhas = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='migracao-armazenamento') as pool:
+        for inicio in range(0, len(itens), lote):
+            bloco = itens[inicio:inicio + lote]
+            copiados = [(it, ja_copiados[it.chave]) for it in bloco if it.chave in ja_copiados]
+            retomados += len(copiados)
+            pendentes = [it for it in bloco if it.chave not in ja_copiados]
+
+            for item, prova in pool.map(lambda it: _migrar_item(it, origem, destino), pendentes):
+                if prova is None:
+                    falhas += 1
+                else:
+                    copiados.append((item, prova))
+
+            if copiados:
+                _reescrever_urls(origem, destino, copiados)
+            migrados += len(copiados)
+            if progresso:
+                progresso(migrados, falhas, len(itens))
+
+    return ResumoMigracao(migrados, retomados, falhas)
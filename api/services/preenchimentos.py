@@ -0,0 +1,133 @@
+from datetime import datetime
+from django.db import connection
+from django.db.models import Q, Exists, OuterRef
+from django.utils.timezone import make_aware
+
+from api.models import Indicador, Preenchimento, PermissaoIndicador
+from api.services.fatos import agendar_atualizacao
+from api.services.metas import _first_of_month, _meses_alinhados
+
+
+def indicadores_gravaveis(usuario, indicador_ids, incluir_publicos: bool = True) -> set:
+    """
+    Retorna, em UMA consulta, o subconjunto de 'indicador_ids' em que o usuário pode gravar:
+    master, visibilidade, mesmo setor ou permissão manual (mesma regra de _user_can_write_on).
+    incluir_publicos=False ignora a visibilidade (ex.: metas, só do próprio setor/permissão).
+    """
+    qs = Indicador.objects.filter(pk__in=set(indicador_ids))
+    if getattr(usuario, "perfil", None) != "master":
+        perm_subq = PermissaoIndicador.objects.filter(usuario=usuario, indicador=OuterRef('pk'))
+        filtro = Q(setor__in=usuario.setores.all()) | Exists(perm_subq)
+        if incluir_publicos:
+            filtro |= Q(visibilidade=True)
+        qs = qs.filter(filtro)
+    return set(qs.values_list('id', flat=True))
+
+
+def resolver_ids_em_lote(usuario, chaves, origem: str = 'manual') -> dict:
+    """
+    Resolve (ou cria como pendente) os Preenchimentos do usuário para uma lista de
+    competências (indicador_id, ano, mes).
+
+    - 1 INSERT ... ON CONFLICT DO NOTHING RETURNING para os que não existem
+    - 1 SELECT para os que já existiam (conflitaram no INSERT)
+
+    Retorna {(indicador_id, ano, mes): preenchimento_id}.
+    Não checa permissão: use indicadores_gravaveis() antes.
+    """
+    chaves = list(dict.fromkeys((int(i), int(a), int(m)) for i, a, m in chaves))
+    if not chaves:
+        return {}
+
+    tabela = connection.ops.quote_name(Preenchimento._meta.db_table)
+    valores = []
+    params = []
+    for indicador_id, ano, mes in chaves:
+        valores.append("(%s, %s, %s, %s, %s, %s, %s)")
+        params.extend([
+            indicador_id, ano, mes, usuario.pk,
+            False,
+            make_aware(datetime(ano, mes, 1, 0, 0, 0)),
+            origem,
+        ])
+
+    sql = (
+        f"INSERT INTO {tabela} "
+        "(indicador_id, ano, mes, preenchido_por_id, confirmado, data_preenchimento, origem) "
+        f"VALUES {', '.join(valores)} "
+        "ON CONFLICT (indicador_id, mes, ano, preenchido_por_id) DO NOTHING "
+        "RETURNING id, indicador_id, ano, mes"
+    )
+
+    resolvidos = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for pk, indicador_id, ano, mes in cursor.fetchall():
+            resolvidos[(indicador_id, ano, mes)] = pk
+
+    # Os que conflitaram já existiam: uma única consulta para buscá-los
+    faltantes = [k for k in chaves if k not in resolvidos]
+    if faltantes:
+        filtro = Q()
+        for indicador_id, ano, mes in faltantes:
+            filtro |= Q(indicador_id=indicador_id, ano=ano, mes=mes)
+        existentes = (
+            Preenchimento.objects
+            .filter(preenchido_por=usuario)
+            .filter(filtro)
+            .values_list('id', 'indicador_id', 'ano', 'mes')
+        )
+        for pk, indicador_id, ano, mes in existentes:
+            resolvidos[(indicador_id, ano, mes)] = pk
+
+    return resolvidos
+
+
+def criar_placeholders(indicadores, autor, ate, lote: int = 5000) -> int:
+    """
+    Preenchimento(valor_realizado=0, origem='backfill-auto') nos meses alinhados
+    à periodicidade/âncora, do mes_inicial até 'ate', que ainda não têm NENHUM
+    preenchimento (de qualquer usuário). Idempotente; assina com 'autor'.
+    1 SELECT das competências existentes + 1 INSERT (unnest) por lote.
+    Retorna o nº de preenchimentos criados.
+    """
+    ate = _first_of_month(ate)
+    indicadores = list(
+        indicadores.exclude(mes_inicial__isnull=True)
+        .only('id', 'periodicidade', 'mes_inicial', 'mes_final', 'criado_em')
+    )
+    if not indicadores:
+        return 0
+
+    existentes = set(
+        Preenchimento.objects.filter(indicador_id__in=[i.pk for i in indicadores])
+        .values_list('indicador_id', 'ano', 'mes').iterator(chunk_size=lote)
+    )
+    novos = []
+    for indicador in indicadores:
+        fim = min(_first_of_month(indicador.mes_final), ate) if indicador.mes_final else ate
+        for d in sorted(_meses_alinhados(indicador, fim)):
+            if (indicador.pk, d.year, d.month) not in existentes:
+                novos.append((indicador.pk, d.year, d.month, make_aware(datetime(d.year, d.month, 1, 0, 0, 0))))
+    if not novos:
+        return 0
+
+    tabela = connection.ops.quote_name(Preenchimento._meta.db_table)
+    criados = 0
+    with connection.cursor() as cursor:
+        for i in range(0, len(novos), lote):
+            indicador_ids, anos, meses, datas = zip(*novos[i:i + lote])
+            cursor.execute(
+                f"INSERT INTO {tabela} "
+                "(indicador_id, ano, mes, data_preenchimento, preenchido_por_id, confirmado, origem, valor_realizado) "
+                "SELECT i, a, m, d, %s, FALSE, 'backfill-auto', 0 "
+                "FROM unnest(%s::bigint[], %s::int[], %s::int[], %s::timestamptz[]) AS t(i, a, m, d) "
+                "ON CONFLICT (indicador_id, mes, ano, preenchido_por_id) DO NOTHING",
+                [autor.pk, list(indicador_ids), list(anos), list(meses), list(datas)],
+            )
+            criados += cursor.rowcount
+
+    # INSERT direto não dispara signals: atualiza os fatos mensais explicitamente
+    for indicador_id in {n[0] for n in novos}:
+        agendar_atualizacao(indicador_id)
+    return criados
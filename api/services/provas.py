@@ -0,0 +1,126 @@
+import os
+import zlib
+import hashlib
+import logging
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import now
+
+from api.models import ArquivoProva, Preenchimento
+from api.services.storage import enviar_arquivo, remover_arquivo
+from api.services.imagens import chaves_variantes
+
+logger = logging.getLogger(__name__)
+
+
+def sha256_do_arquivo(caminho: str) -> str:
+    with open(caminho, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def chave_por_conteudo(sha256: str, nome_arquivo: str) -> str:
+    """'provas/ab/abcdef…<ext>': mesmo conteúdo → mesma chave no backend."""
+    _, ext = os.path.splitext((nome_arquivo or "").lower())
+    return f"provas/{sha256[:2]}/{sha256}{ext}"
+
+
+@contextmanager
+def _trava_conteudo(cfg, sha256: str):
+    """
+    pg_advisory_lock de sessão por (armazenamento, SHA-256), com espera:
+    envio e coleta do mesmo conteúdo (mesma chave no backend) não se intercalam.
+    """
+    chave = zlib.crc32(f"prova:{cfg.pk}:{sha256}".encode())
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", [chave])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [chave])
+
+
+def armazenar_prova(caminho: str, cfg, sha256: str = None) -> ArquivoProva:
+    """
+    Devolve o ArquivoProva do conteúdo em 'caminho' no armazenamento 'cfg'.
+    Conteúdo já conhecido → sem transferência; novo → envio em partes com
+    chave endereçada por conteúdo. SHA-256 divergente → ValueError.
+    """
+    sha256 = sha256 or sha256_do_arquivo(caminho)
+    with _trava_conteudo(cfg, sha256):
+        return _armazenar(caminho, cfg, sha256)
+
+
+def _armazenar(caminho: str, cfg, sha256: str) -> ArquivoProva:
+    existente = ArquivoProva.objects.filter(armazenamento=cfg, sha256=sha256).first()
+    if existente:
+        return existente
+
+    nome = os.path.basename(caminho)
+    with open(caminho, 'rb') as f:
+        enviado = enviar_arquivo(f, nome, cfg, chave=chave_por_conteudo(sha256, nome))
+    if enviado.sha256 != sha256:
+        raise ValueError(f"SHA-256 divergente: esperado {sha256}, enviado {enviado.sha256}.")
+
+    try:
+        with transaction.atomic():
+            return ArquivoProva.objects.create(
+                armazenamento=cfg, sha256=sha256, chave=enviado.chave, url=enviado.url,
+                tamanho=enviado.tamanho, content_type=enviado.content_type,
+            )
+    except IntegrityError:
+        # Outro worker registrou o mesmo conteúdo em paralelo (mesma chave no backend)
+        return ArquivoProva.objects.get(armazenamento=cfg, sha256=sha256)
+
+
+def provas_orfas(idade_minima: timedelta):
+    """Objetos sem preenchimento que os referencie, criados há mais de 'idade_minima'."""
+    referenciados = Preenchimento.objects.filter(prova_id=OuterRef('pk'))
+    return (
+        ArquivoProva.objects
+        .filter(criado_em__lt=now() - idade_minima)
+        .filter(~Exists(referenciados))
+        .select_related('armazenamento')
+        .order_by('id')
+    )
+
+
+def coletar_orfas(lote: int = 200, idade_minima: timedelta = timedelta(hours=24), progresso=None) -> int:
+    """
+    Remove objetos órfãos do banco e do backend, 'lote' por vez.
+    A idade mínima protege envios em andamento (registro criado, vínculo ainda não gravado).
+    Retorna o nº de objetos removidos.
+    """
+    removidos = 0
+    ultimo_id = 0
+    while True:
+        ids = list(provas_orfas(idade_minima).filter(id__gt=ultimo_id).values_list('id', flat=True)[:lote])
+        if not ids:
+            break
+        ultimo_id = ids[-1]
+
+        # Apaga o registro antes do objeto, revalidando a orfandade: um vínculo
+        # feito depois disso falha na FK e o upload refaz o envio
+        with transaction.atomic():
+            confirmadas = list(provas_orfas(timedelta(0)).filter(pk__in=ids))
+            ArquivoProva.objects.filter(pk__in=[p.pk for p in confirmadas]).delete()
+
+        for prova in confirmadas:
+            try:
+                with _trava_conteudo(prova.armazenamento, prova.sha256):
+                    # Reenvio do mesmo conteúdo entre as fases: a chave voltou a ter dono
+                    if ArquivoProva.objects.filter(armazenamento=prova.armazenamento, chave=prova.chave).exists():
+                        continue
+                    remover_arquivo(prova.armazenamento, prova.chave)
+                    if prova.miniatura_url:
+                        for chave in chaves_variantes(prova.chave).values():
+                            remover_arquivo(prova.armazenamento, chave)
+            except Exception:
+                logger.warning("Falha ao remover objeto órfão %s (prova id=%s)", prova.chave, prova.pk, exc_info=True)
+        removidos += len(confirmadas)
+        if progresso:
+            progresso(removidos)
+    return removidos
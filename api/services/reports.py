@@ -1,11 +1,24 @@
-from django.http import HttpResponse
-from django.db.models import F, Q, Exists, OuterRef, Subquery, IntegerField
-from django.db.models.functions import ExtractMonth, ExtractYear, Coalesce
+import os
+import tempfile
+from datetime import date
+
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse
+from django.db.models import F, Q, Exists, OuterRef
 
 from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+from api.models import Preenchimento, PermissaoIndicador, FatoMensal
+from api.services.metas import expressao_meta
 
-from api.models import Preenchimento, Indicador, PermissaoIndicador, MetaMensal
+# Exportações: linhas lidas do banco por lote e limite em memória do arquivo temporário
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_SPOOL_MAX_MEMORIA = 8 * 1024 * 1024
 
 
 def _build_base_queryset(user=None, params=None):
@@ -53,93 +66,314 @@ def _build_base_queryset(user=None, params=None):
                 pass
 
     # MetaMensal do mês/ano (se existir) com fallback para Indicador.valor_meta
-    meta_subq = (
-        MetaMensal.objects
-        .filter(indicador_id=OuterRef('indicador_id'))
-        .annotate(y=ExtractYear('mes'), m=ExtractMonth('mes'))
-        .filter(y=OuterRef('ano'), m=OuterRef('mes'))
-        .values('valor_meta')[:1]
-    )
-    qs = qs.annotate(
-        valor_meta_ref=Coalesce(Subquery(meta_subq), F('indicador__valor_meta'))
-    )
+    qs = qs.annotate(valor_meta_ref=expressao_meta())
 
     return qs.order_by('indicador__nome', 'ano', 'mes')
 
 
-def gerar_relatorio_pdf(user=None, params=None, qs=None):
+def _build_fatos_queryset(user=None, params=None):
     """
-    Gera relatório PDF dos preenchimentos.
-    - Se 'qs' for fornecido, usa o queryset pronto (preferível para garantir mesmíssima filtragem da View).
-    - Caso contrário, usa 'user' e 'params' para montar o queryset.
-    - Se nada for passado, mantém compat e exporta tudo (com metas corretas).
+    Queryset de FatoMensal (uma linha por indicador/competência) com a mesma
+    regra de visibilidade e os mesmos filtros (setor, mes, ano, indicador)
+    de _build_base_queryset. É a fonte dos relatórios e exportações.
     """
-    queryset = qs if qs is not None else _build_base_queryset(user=user, params=params)
+    qs = FatoMensal.objects.select_related('indicador', 'setor', 'preenchimento')
 
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="relatorio.pdf"'
+    if user is not None and getattr(user, 'perfil', None) == 'gestor':
+        perm_subq = PermissaoIndicador.objects.filter(usuario=user, indicador=OuterRef('indicador_id'))
+        qs = qs.filter(
+            Q(indicador__visibilidade=True) |
+            Q(indicador__setor__in=user.setores.all()) |
+            Exists(perm_subq)
+        )
 
-    pdf = canvas.Canvas(response)
-    pdf.setFont("Helvetica", 14)
-    pdf.drawString(100, 800, "Relatório de Indicadores")
+    if params:
+        setor = params.get('setor')
+        mes = params.get('mes')
+        ano = params.get('ano')
+        indicador_id = params.get('indicador')
 
-    y = 780
-    pdf.setFont("Helvetica", 10)
+        if setor:
+            qs = qs.filter(setor_id=setor)
+        if indicador_id:
+            qs = qs.filter(indicador_id=indicador_id)
+        try:
+            mes = int(mes) if mes else None
+        except (TypeError, ValueError):
+            mes = None
+        try:
+            ano = int(ano) if ano else None
+        except (TypeError, ValueError):
+            ano = None
+        if mes and ano and 1 <= mes <= 12:
+            qs = qs.filter(competencia=date(ano, mes, 1))
+        elif ano:
+            qs = qs.filter(competencia__gte=date(ano, 1, 1), competencia__lte=date(ano, 12, 1))
+        elif mes:
+            qs = qs.filter(competencia__month=mes)
 
-    for pch in queryset:
-        # valor_meta_ref vem anotado; se por algum motivo faltar, cai para indicador.valor_meta
-        meta = pch.valor_meta_ref if getattr(pch, 'valor_meta_ref', None) is not None else pch.indicador.valor_meta
-        val_str = "" if pch.valor_realizado is None else f"{float(pch.valor_realizado):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        meta_str = "" if meta is None else f"{float(meta):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        texto = (
-            f"{pch.indicador.nome} - {str(pch.mes).zfill(2)}/{pch.ano} "
-            f"- Valor: {val_str} - Meta: {meta_str}"
-        )
-        pdf.drawString(100, y, texto)
-        y -= 18
-        if y < 50:
-            pdf.showPage()
-            pdf.setFont("Helvetica", 10)
-            y = 800
+    return qs.order_by('indicador__nome', 'competencia')
 
-    pdf.showPage()
-    pdf.save()
-    return response
 
+def condicao_atingido(valor='valor_realizado', meta='valor_meta_ref', tipo_meta='indicador__tipo_meta') -> Q:
+    """
+    Critério de atingimento conforme tipo_meta (mesma regra dos cards):
+      - crescente     → valor >= meta
+      - decrescente   → valor <= meta
+      - monitoramento → |valor - meta| <= 5
+    Linhas sem valor_realizado nunca atendem.
+    """
+    return (
+        Q(**{tipo_meta: 'crescente', f'{valor}__gte': F(meta)}) |
+        Q(**{tipo_meta: 'decrescente', f'{valor}__lte': F(meta)}) |
+        Q(**{tipo_meta: 'monitoramento', f'{valor}__gte': F(meta) - 5, f'{valor}__lte': F(meta) + 5})
+    )
 
-def gerar_relatorio_excel(user=None, params=None, qs=None):
+
+def _fmt_br(v):
+    if v is None:
+        return ""
+    return f"{float(v):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+class _TabelaPDF:
     """
-    Gera relatório XLSX dos preenchimentos.
-    - Se 'qs' for fornecido, usa o queryset pronto (preferível para garantir mesmíssima filtragem da View).
-    - Caso contrário, usa 'user' e 'params' para montar o queryset.
-    - Se nada for passado, mantém compat e exporta tudo (com metas corretas).
+    Renderizador paginado: acumula até LINHAS_POR_PAGINA linhas e desenha
+    cada página como uma Table do reportlab (cabeçalho repetido), com seções
+    por setor e sub-blocos por indicador. Memória limitada a uma página.
     """
-    queryset = qs if qs is not None else _build_base_queryset(user=user, params=params)
+    COLUNAS = ["Mês/Ano", "Valor", "Meta", "Atingido", "Variação %"]
+    LARGURAS = [90, 110, 110, 80, 90]
+    LINHAS_POR_PAGINA = 42
+    MARGEM = 40
 
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    def __init__(self, destino, titulo="Relatório de Indicadores"):
+        self.pdf = canvas.Canvas(destino, pagesize=A4)
+        self.largura, self.altura = A4
+        self.titulo = titulo
+        self.setor_atual = None
+        self.indicador_atual = None
+        self.linhas = []
+        self.agrupadoras = []
+        self.pagina = 0
+
+    def _cabecalho(self):
+        self.pagina += 1
+        self.pdf.setFont("Helvetica-Bold", 14)
+        self.pdf.drawString(self.MARGEM, self.altura - self.MARGEM, self.titulo)
+        self.pdf.setFont("Helvetica", 10)
+        if self.setor_atual:
+            self.pdf.drawString(self.MARGEM, self.altura - self.MARGEM - 18, f"Setor: {self.setor_atual}")
+        self.pdf.drawRightString(self.largura - self.MARGEM, self.MARGEM / 2, f"Página {self.pagina}")
+
+    def _desenhar_pagina(self):
+        if not self.linhas:
+            return
+        self._cabecalho()
+        estilo = [
+            ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 9),
+            ('FONT', (0, 1), (-1, -1), 'Helvetica', 9),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+        ]
+        for idx in self.agrupadoras:
+            linha = idx + 1  # +1 pelo cabeçalho
+            estilo += [
+                ('SPAN', (0, linha), (-1, linha)),
+                ('FONT', (0, linha), (-1, linha), 'Helvetica-Bold', 9),
+                ('ALIGN', (0, linha), (-1, linha), 'LEFT'),
+                ('BACKGROUND', (0, linha), (-1, linha), colors.whitesmoke),
+            ]
+        tabela = Table([self.COLUNAS] + self.linhas, colWidths=self.LARGURAS)
+        tabela.setStyle(TableStyle(estilo))
+        _, h = tabela.wrapOn(self.pdf, self.largura, self.altura)
+        tabela.drawOn(self.pdf, self.MARGEM, self.altura - self.MARGEM - 30 - h)
+        self.pdf.showPage()
+        self.linhas, self.agrupadoras = [], []
+
+    def _adicionar(self, linha, agrupadora=False):
+        if len(self.linhas) >= self.LINHAS_POR_PAGINA:
+            self._desenhar_pagina()
+            # repete o nome do indicador no topo da nova página
+            if not agrupadora and self.indicador_atual:
+                self.agrupadoras.append(0)
+                self.linhas.append([f"{self.indicador_atual} (cont.)", "", "", "", ""])
+        if agrupadora:
+            self.agrupadoras.append(len(self.linhas))
+        self.linhas.append(linha)
+
+    def adicionar(self, setor, indicador, competencia, valor, meta, atingido, variacao):
+        if setor != self.setor_atual:
+            self._desenhar_pagina()  # cada setor começa em página nova
+            self.setor_atual, self.indicador_atual = setor, None
+        if indicador != self.indicador_atual:
+            self.indicador_atual = indicador
+            self._adicionar([indicador, "", "", "", ""], agrupadora=True)
+        self._adicionar([
+            competencia.strftime('%m/%Y'),
+            _fmt_br(valor),
+            _fmt_br(meta),
+            "Sim" if atingido else "Não",
+            _fmt_br(variacao),
+        ])
+
+    def finalizar(self):
+        self._desenhar_pagina()
+        if self.pagina == 0:
+            self._cabecalho()
+            self.pdf.drawString(self.MARGEM, self.altura - self.MARGEM - 40, "Nenhum registro para os filtros informados.")
+            self.pdf.showPage()
+        self.pdf.save()
+
+
+def _linhas_pdf(queryset):
+    return (
+        queryset
+        .order_by('setor__nome', 'setor_id', 'indicador__nome', 'indicador_id', 'competencia')
+        .values_list('setor__nome', 'indicador__nome', 'competencia', 'valor_realizado',
+                     'valor_meta', 'atingido', 'variacao')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
     )
-    response['Content-Disposition'] = 'attachment; filename=relatorio.xlsx'
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Relatório"
+
+def _renderizar_pdf(queryset, destino):
+    tabela = _TabelaPDF(destino)
+    for linha in _linhas_pdf(queryset):
+        tabela.adicionar(*linha)
+    tabela.finalizar()
+
+
+def _renderizar_secao_pdf(user_id, params, setor_id, destino):
+    """Executado em processo separado: renderiza a seção de UM setor em 'destino'."""
+    from django.contrib.auth import get_user_model
+    user = get_user_model().objects.filter(pk=user_id).first() if user_id else None
+    qs = _build_fatos_queryset(user=user, params=params).filter(setor_id=setor_id)
+    _renderizar_pdf(qs, destino)
+    return destino
+
+
+def _renderizar_pdf_paralelo(user, params, setor_ids, destino):
+    """
+    Renderiza cada setor num processo e concatena os PDFs na ordem dos setores.
+    Processos via 'spawn' (nada de fork de um worker com threads/conexões abertas).
+    Retorna False se a concatenação não estiver disponível (pypdf ausente).
+    """
+    try:
+        from pypdf import PdfWriter  # lazy import
+    except Exception:
+        return False
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from api.processos import inicializar_django
+
+    params = dict(params.items()) if params else {}
+    workers = min(len(setor_ids), getattr(settings, 'REPORT_PDF_WORKERS', 4))
+    with tempfile.TemporaryDirectory(prefix='relatorio-pdf-') as pasta:
+        caminhos = [os.path.join(pasta, f"{i:05d}.pdf") for i in range(len(setor_ids))]
+        banco = {'NAME': connection.settings_dict['NAME']}
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=inicializar_django, initargs=(banco,)) as pool:
+            list(pool.map(
+                _renderizar_secao_pdf,
+                [getattr(user, 'pk', None)] * len(setor_ids),
+                [params] * len(setor_ids),
+                setor_ids,
+                caminhos,
+            ))
+
+        writer = PdfWriter()
+        for caminho in caminhos:
+            writer.append(caminho)
+        writer.write(destino)
+    return True
+
+
+def escrever_relatorio_pdf(destino, user=None, params=None, qs=None, paralelo=False):
+    """
+    Renderiza o relatório PDF em 'destino' (arquivo binário aberto).
+    Com 'paralelo' (só o job de exportação em segundo plano) e acima de
+    REPORT_PDF_PARALELO_MIN_LINHAS, cada setor é renderizado num processo e
+    os PDFs são concatenados. Dentro de transação fica sempre em série: os
+    processos não enxergariam os dados ainda não confirmados.
+    """
+    queryset = qs if qs is not None else _build_fatos_queryset(user=user, params=params)
+
+    if paralelo and (qs is not None or connection.in_atomic_block):
+        paralelo = False
+    if paralelo:
+        limite = getattr(settings, 'REPORT_PDF_PARALELO_MIN_LINHAS', 20000)
+        setor_ids = list(queryset.order_by('setor__nome', 'setor_id').values_list('setor_id', flat=True).distinct())
+        paralelo = len(setor_ids) > 1 and queryset.count() >= limite
+        if paralelo:
+            paralelo = _renderizar_pdf_paralelo(user, params, setor_ids, destino)
+
+    if not paralelo:
+        _renderizar_pdf(queryset, destino)
+
+
+def gerar_relatorio_pdf(user=None, params=None, qs=None):
+    """
+    Gera relatório PDF a partir dos fatos mensais, em tabelas paginadas
+    agrupadas por setor e indicador.
+    - Se 'qs' for fornecido (queryset de FatoMensal), usa o queryset pronto.
+    - Caso contrário, usa 'user' e 'params' para montar o queryset (escopo do usuário).
+    - Se nada for passado, mantém compat e exporta tudo.
+
+    Linhas lidas por lote (.iterator) e saída em arquivo temporário.
+    """
+    destino = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_MEMORIA)
+    escrever_relatorio_pdf(destino, user=user, params=params, qs=qs)
+    destino.seek(0)
+    return FileResponse(destino, as_attachment=True, filename='relatorio.pdf', content_type='application/pdf')
+
+
+def escrever_relatorio_excel(destino, user=None, params=None, qs=None):
+    """
+    Grava o relatório XLSX em 'destino' (arquivo binário aberto).
+    Memória constante: openpyxl em modo write_only e linhas lidas com .iterator(chunk_size).
+    """
+    queryset = qs if qs is not None else _build_fatos_queryset(user=user, params=params)
+
+    linhas = queryset.values_list(
+        'indicador__nome', 'competencia', 'valor_realizado', 'valor_meta', 'preenchimento__comentario'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Relatório")
 
     # Mantém o mesmo contrato de colunas
     ws.append(["Indicador", "Mês/Ano", "Valor", "Meta", "Comentário"])
 
-    for pch in queryset:
-        meta = pch.valor_meta_ref if getattr(pch, 'valor_meta_ref', None) is not None else pch.indicador.valor_meta
-        valor = "" if pch.valor_realizado is None else float(pch.valor_realizado)
-        meta_v = "" if meta is None else float(meta)
-
+    for nome, competencia, valor, meta, comentario in linhas:
         ws.append([
-            pch.indicador.nome,
-            f"{str(pch.mes).zfill(2)}/{pch.ano}",
-            valor,
-            meta_v,
-            pch.comentario or ""
+            nome,
+            competencia.strftime('%m/%Y'),
+            "" if valor is None else float(valor),
+            "" if meta is None else float(meta),
+            comentario or ""
         ])
 
-    wb.save(response)
-    return response
+    wb.save(destino)
+
+
+def gerar_relatorio_excel(user=None, params=None, qs=None):
+    """
+    Gera relatório XLSX a partir dos fatos mensais (uma linha por indicador/competência).
+    - Se 'qs' for fornecido (queryset de FatoMensal), usa o queryset pronto.
+    - Caso contrário, usa 'user' e 'params' para montar o queryset (escopo do usuário).
+    - Se nada for passado, mantém compat e exporta tudo.
+
+    Saída num SpooledTemporaryFile (vai p/ disco se crescer).
+    """
+    arquivo = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_MEMORIA)
+    escrever_relatorio_excel(arquivo, user=user, params=params, qs=qs)
+    arquivo.seek(0)
+
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename='relatorio.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
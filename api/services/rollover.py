@@ -0,0 +1,144 @@
+import zlib
+import logging
+from contextlib import contextmanager
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F, Func, Q, Value, DateField
+from django.utils.timezone import localdate, now
+
+from api.models import Indicador, MetaMensal, Preenchimento, RolloverMensal
+from api.services.cache_relatorios import cache_compartilhado, hash_escopo, invalidar_relatorios, obter_ou_calcular
+from api.services.metas import reconciliar_metas
+from api.services.preenchimentos import criar_placeholders
+from api.services.reports import _build_fatos_queryset
+from api.services.series import montar_series
+
+logger = logging.getLogger(__name__)
+
+
+def _first_of_month(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+@contextmanager
+def lock_consultivo(nome: str):
+    """
+    pg_try_advisory_lock de sessão: entre processos/servidores só um obtém.
+    Não espera: rende False se outro já detém o lock.
+    """
+    chave = zlib.crc32(nome.encode())
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [chave])
+        obtido = cursor.fetchone()[0]
+    try:
+        yield obtido
+    finally:
+        if obtido:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [chave])
+
+
+def competencias_futuras(hoje: date = None):
+    """(MetaMensal, Preenchimento pendente) em competências >= início do mês atual."""
+    hoje0 = _first_of_month(hoje or localdate())
+    competencia = Func(F('ano'), F('mes'), Value(1), function='MAKE_DATE', output_field=DateField())
+    metas = MetaMensal.objects.filter(mes__gte=hoje0)
+    preenchimentos = (
+        Preenchimento.objects.annotate(competencia=competencia)
+        .filter(competencia__gte=hoje0, confirmado=False)
+    )
+    return metas, preenchimentos
+
+
+def _autor_placeholders():
+    """Quem assina os placeholders: ROLLOVER_AUTOR_EMAIL ou o master ativo mais antigo."""
+    User = get_user_model()
+    email = getattr(settings, 'ROLLOVER_AUTOR_EMAIL', '')
+    qs = User.objects.filter(is_active=True)
+    return (qs.filter(email=email) if email else qs.filter(perfil='master').order_by('id')).first()
+
+
+def aquecer_caches() -> int:
+    """
+    Calcula o resumo e as séries padrão (sem filtros) do dashboard uma vez por
+    escopo de visibilidade distinto. Retorna o nº de escopos aquecidos.
+    Sem cache compartilhado não aquece: o resultado ficaria só na memória
+    deste processo (o cron), longe dos workers web.
+    """
+    if not cache_compartilhado():
+        logger.info("Aquecimento dos caches ignorado: cache de relatórios não é compartilhado entre processos.")
+        return 0
+
+    from api.views.relatorios import RelatorioView  # evita import circular (views → services)
+
+    User = get_user_model()
+    representantes = {}
+    for user in User.objects.filter(is_active=True).filter(Q(perfil='master') | Q(perfil='gestor')).order_by('id'):
+        representantes.setdefault(hash_escopo(user), user)
+
+    for user in representantes.values():
+        obter_ou_calcular('resumo', user, {}, lambda: RelatorioView._calcular(user, {}))
+        obter_ou_calcular('series', user, {}, lambda: montar_series(
+            _build_fatos_queryset(user=user, params={}),
+            nivel='setor', periodo='mes', agregacao='soma', media_movel=None, yoy=False,
+        ))
+    return len(representantes)
+
+
+def executar_rollover(hoje: date = None, forcar: bool = False):
+    """
+    Virada de mês, uma vez por competência e por implantação:
+      1) lock consultivo (outra instância rodando → None)
+      2) watermark: competência já concluída → None (a não ser com 'forcar')
+      3) remove metas/pendências em competências futuras
+      4) reconcilia metas de todos os indicadores ativos até o mês passado (em lote)
+      5) placeholders zerados (ROLLOVER_PLACEHOLDERS), em lote
+      6) aquece os caches do dashboard e grava o watermark
+    'hoje' precisa cair no mês corrente: competência passada apagaria metas e
+    pendências legítimas como se fossem futuras (ValueError).
+    Retorna o resumo (dict) ou None se nada foi feito.
+    """
+    atual = _first_of_month(localdate())
+    competencia = _first_of_month(hoje or atual)
+    if competencia != atual:
+        raise ValueError(f"A virada só roda para o mês corrente ({atual:%Y-%m}).")
+    mes_passado = competencia - relativedelta(months=1)
+
+    with lock_consultivo('api.rollover_mensal') as obtido:
+        if not obtido:
+            logger.info("Virada de %s já em execução em outra instância.", competencia)
+            return None
+        marca, _ = RolloverMensal.objects.get_or_create(competencia=competencia, defaults={'iniciado_em': now()})
+        if marca.concluido_em and not forcar:
+            return None
+        RolloverMensal.objects.filter(pk=marca.pk).update(iniciado_em=now(), concluido_em=None)
+
+        resumo = {}
+        with transaction.atomic():
+            metas, preenchimentos = competencias_futuras(competencia)
+            resumo['metas_futuras_removidas'], _ = metas.delete()
+            resumo['pendencias_futuras_removidas'], _ = preenchimentos.delete()
+
+            reconciliacao = reconciliar_metas(ate=mes_passado)
+            resumo.update(metas_criadas=reconciliacao.criadas, metas_removidas=reconciliacao.removidas)
+
+            resumo['placeholders'] = 0
+            if getattr(settings, 'ROLLOVER_PLACEHOLDERS', False):
+                autor = _autor_placeholders()
+                if autor is None:
+                    logger.warning("Virada de %s: sem autor para os placeholders; etapa ignorada.", competencia)
+                else:
+                    resumo['placeholders'] = criar_placeholders(
+                        Indicador.objects.filter(ativo=True), autor, ate=mes_passado
+                    )
+            invalidar_relatorios()
+
+        # Depois do commit: fatos recalculados e versão do cache incrementada
+        resumo['escopos_aquecidos'] = aquecer_caches()
+        RolloverMensal.objects.filter(pk=marca.pk).update(concluido_em=now(), resumo=resumo)
+        logger.info("Virada de %s concluída: %s", competencia, resumo)
+        return resumo
@@ -0,0 +1,137 @@
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from django.db.models import Sum, Avg, Count, Q
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncYear
+
+# passo (em meses) e truncamento por granularidade
+PERIODOS = {
+    'mes': (1, TruncMonth),
+    'trimestre': (3, TruncQuarter),
+    'ano': (12, TruncYear),
+}
+
+NIVEIS = {
+    'setor': ('setor_id', 'setor__nome'),
+    'indicador': ('indicador_id', 'indicador__nome'),
+}
+
+AGREGACOES = {
+    'soma': Sum,
+    'media': Avg,
+}
+
+
+def _rotulo(d: date, periodo: str) -> str:
+    if periodo == 'ano':
+        return f"{d.year}"
+    if periodo == 'trimestre':
+        return f"{d.year}-T{(d.month - 1) // 3 + 1}"
+    return d.strftime("%Y-%m")
+
+
+def _to_float(v):
+    return None if v is None else float(v)
+
+
+def _media_movel(np, valores, janela: int):
+    """Média móvel simples; posições sem janela completa (ou com lacunas) → NaN."""
+    saida = np.full(valores.shape, np.nan)
+    if janela < 1 or valores.size < janela:
+        return saida
+    soma = np.convolve(valores, np.ones(janela), mode='valid')  # NaN se houver lacuna
+    saida[janela - 1:] = soma / janela
+    return saida
+
+
+def _variacao_yoy(np, valores, lag: int):
+    """(v - v[t-lag]) / |v[t-lag]| * 100; NaN quando não há base ou a base é 0."""
+    saida = np.full(valores.shape, np.nan)
+    if valores.size <= lag:
+        return saida
+    atual, base = valores[lag:], valores[:-lag]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = (atual - base) / np.abs(base) * 100
+    delta[~np.isfinite(delta)] = np.nan
+    saida[lag:] = delta
+    return saida
+
+
+def montar_series(fatos_qs, *, nivel='setor', periodo='mes', agregacao='soma',
+                  media_movel=None, yoy=False):
+    """
+    Séries temporais a partir de um queryset de FatoMensal:
+      - GROUP BY (nivel, periodo) no Postgres → poucas centenas de pontos
+      - média móvel / variação ano-a-ano calculadas com NumPy sobre a série densa
+    """
+    try:
+        import numpy as np  # lazy import
+    except Exception as e:
+        raise RuntimeError("Dependência numpy ausente. pip install numpy") from e
+
+    passo, trunc = PERIODOS[periodo]
+    chave_id, chave_nome = NIVEIS[nivel]
+    agg = AGREGACOES[agregacao]
+
+    linhas = (
+        fatos_qs
+        .order_by()
+        .annotate(periodo=trunc('competencia'))
+        .values(chave_id, chave_nome, 'periodo')
+        .annotate(
+            valor_realizado=agg('valor_realizado'),
+            valor_meta=agg('valor_meta'),
+            total=Count('id'),
+            atingidos=Count('id', filter=Q(atingido=True)),
+        )
+        .order_by(chave_nome, chave_id, 'periodo')
+    )
+
+    series = {}
+    for r in linhas:
+        s = series.setdefault(r[chave_id], {"id": r[chave_id], "nome": r[chave_nome], "_linhas": {}})
+        s["_linhas"][r['periodo']] = r
+
+    lag = 12 // passo
+    resultado = []
+    for s in series.values():
+        por_periodo = s.pop("_linhas")
+        inicio, fim = min(por_periodo), max(por_periodo)
+
+        # Série densa (períodos sem dado viram NaN) para janelas/lag corretos
+        eixo = []
+        cur = inicio
+        while cur <= fim:
+            eixo.append(cur)
+            cur = cur + relativedelta(months=+passo)
+
+        realizados = np.array(
+            [_to_float(por_periodo[p]['valor_realizado']) if p in por_periodo else np.nan for p in eixo],
+            dtype=float,
+        )
+        mm = _media_movel(np, realizados, media_movel) if media_movel else None
+        var = _variacao_yoy(np, realizados, lag) if yoy else None
+
+        pontos = []
+        for idx, p in enumerate(eixo):
+            r = por_periodo.get(p)
+            if r is None:
+                continue
+            ponto = {
+                "periodo": _rotulo(p, periodo),
+                "inicio": p.strftime("%Y-%m-%d"),
+                "valor_realizado": _to_float(r['valor_realizado']),
+                "valor_meta": _to_float(r['valor_meta']),
+                "total": r['total'],
+                "atingidos": r['atingidos'],
+                "taxa_atingimento": round(r['atingidos'] / r['total'], 4) if r['total'] else None,
+            }
+            if mm is not None:
+                ponto["media_movel"] = None if np.isnan(mm[idx]) else round(float(mm[idx]), 4)
+            if var is not None:
+                ponto["variacao_yoy"] = None if np.isnan(var[idx]) else round(float(var[idx]), 2)
+            pontos.append(ponto)
+
+        s["pontos"] = pontos
+        resultado.append(s)
+
+    return resultado
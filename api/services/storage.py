@@ -1,8 +1,14 @@
 import os
 import json
+import base64
+import hashlib
+import itertools
 import mimetypes
+import threading
+from collections import namedtuple
 from uuid import uuid4
 from django.conf import settings
+from django.core.files import File
 from django.core.files.storage import default_storage
 
 
@@ -33,116 +39,348 @@ def _reset_stream(fobj):
             inner.seek(0)
 
 
-def upload_arquivo(file, nome_arquivo, config) -> str:
+# =======================
+# 🔹 Registro de clientes por configuração
+# =======================
+# Um cliente por (config.id, hash das credenciais) por processo: evita refazer
+# parsing de credenciais, handshake TLS e pool de conexões a cada upload.
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+CAMPOS_CREDENCIAIS = {
+    'aws': ('aws_access_key', 'aws_secret_key', 'aws_region'),
+    'azure': ('azure_connection_string',),
+    'gcp': ('gcp_credentials_json',),
+}
+
+
+def _hash_credenciais(config) -> str:
+    valores = [config.tipo] + [getattr(config, c, None) or "" for c in CAMPOS_CREDENCIAIS.get(config.tipo, ())]
+    return hashlib.sha256("\x1f".join(valores).encode()).hexdigest()
+
+
+def _max_pool() -> int:
+    return getattr(settings, 'STORAGE_MAX_POOL_CONNECTIONS', 10)
+
+
+def _criar_cliente_aws(config):
+    try:
+        import boto3  # lazy import
+        from botocore.config import Config as BotoConfig
+    except Exception as e:
+        raise RuntimeError("Dependência boto3 ausente. Instale com: pip install boto3") from e
+
+    # Clientes boto3 são thread-safe; o pool do urllib3 é dimensionado p/ os workers de upload
+    return boto3.session.Session().client(
+        's3',
+        aws_access_key_id=config.aws_access_key,
+        aws_secret_access_key=config.aws_secret_key,
+        region_name=config.aws_region,
+        config=BotoConfig(max_pool_connections=_max_pool(), retries={'mode': 'standard'}),
+    )
+
+
+def _criar_cliente_azure(config):
+    try:
+        from azure.storage.blob import BlobServiceClient  # lazy import
+    except Exception as e:
+        raise RuntimeError("Dependência azure-storage-blob ausente. pip install azure-storage-blob") from e
+
+    # BlobServiceClient é thread-safe e reaproveita a sessão HTTP (keep-alive)
+    return BlobServiceClient.from_connection_string(config.azure_connection_string)
+
+
+def _criar_cliente_gcp(config):
+    try:
+        from google.cloud import storage  # lazy import
+    except Exception as e:
+        raise RuntimeError("Dependência google-cloud-storage ausente. pip install google-cloud-storage") from e
+
+    creds = json.loads(config.gcp_credentials_json or "{}")
+    return storage.Client.from_service_account_info(creds) if creds else storage.Client()
+
+
+FABRICAS_CLIENTE = {
+    'aws': _criar_cliente_aws,
+    'azure': _criar_cliente_azure,
+    'gcp': _criar_cliente_gcp,
+}
+
+
+def obter_cliente(config):
     """
-    Upload dinâmico baseado na configuração de armazenamento (local, AWS, Azure ou GCP).
-    Retorna URL pública do arquivo.
+    Cliente do backend da configuração, criado uma vez por processo.
+    Credenciais alteradas mudam o hash → novo cliente (vale também entre processos).
+    O cliente GCS não é thread-safe (sessão requests): fica um por thread.
+    """
+    chave = (config.pk, _hash_credenciais(config))
+    with _clientes_lock:
+        entrada = _clientes.get(chave)
+        if entrada is None:
+            entrada = threading.local() if config.tipo == 'gcp' else FABRICAS_CLIENTE[config.tipo](config)
+            _clientes[chave] = entrada
+
+    if config.tipo != 'gcp':
+        return entrada
+    cliente = getattr(entrada, 'cliente', None)
+    if cliente is None:
+        cliente = entrada.cliente = _criar_cliente_gcp(config)
+    return cliente
+
+
+def descartar_clientes(config_id=None) -> None:
+    """Remove os clientes da configuração (ou todos). Chamado ao editar/remover a configuração."""
+    with _clientes_lock:
+        for chave in [k for k in _clientes if config_id is None or k[0] == config_id]:
+            _clientes.pop(chave, None)
+
+
+# =======================
+# 🔹 Envio em partes (memória limitada + SHA-256)
+# =======================
+ArquivoEnviado = namedtuple('ArquivoEnviado', 'url chave sha256 tamanho content_type')
+
+EXTENSOES_PERMITIDAS = {'.pdf', '.jpg', '.jpeg', '.png', '.xlsx', '.webp'}
+
+
+def _tamanho_parte() -> int:
+    # S3 exige partes >= 5MB (exceto a última); GCS exige múltiplos de 256KB
+    return max(5 * 1024 * 1024, int(getattr(settings, 'STORAGE_PARTE_BYTES', 8 * 1024 * 1024)))
+
+
+class _LeitorComHash:
+    """Embrulha o stream: calcula SHA-256 e conta bytes enquanto o backend lê."""
+
+    def __init__(self, stream, limite=None):
+        self._stream = stream
+        self._limite = limite
+        self._hash = hashlib.sha256()
+        self.tamanho = 0
+
+    def read(self, n=-1):
+        bloco = self._stream.read(n)
+        if bloco:
+            self.tamanho += len(bloco)
+            if self._limite is not None and self.tamanho > self._limite:
+                raise ValueError("Arquivo excede o tamanho máximo permitido.")
+            self._hash.update(bloco)
+        return bloco
+
+    def seek(self, pos, whence=0):
+        # Só permite voltar ao início (recomeça o hash); o envio nunca relê o stream
+        if (pos, whence) != (0, 0):
+            raise OSError("Stream de upload não suporta seek arbitrário.")
+        _reset_stream(self._stream)
+        self._hash = hashlib.sha256()
+        self.tamanho = 0
+        return 0
+
+    def tell(self):
+        return self.tamanho
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def partes(self, tamanho):
+        while True:
+            bloco = self.read(tamanho)
+            if not bloco:
+                break
+            yield bloco
+
+
+def _enviar_s3(cliente, bucket, key_path, leitor, content_type):
+    """Arquivo menor que uma parte → 1 PUT; maior → multipart (uma parte em memória por vez)."""
+    tamanho = _tamanho_parte()
+    partes = leitor.partes(tamanho)
+    primeira = next(partes, b"")
+    extra = {'ACL': 'public-read', 'ContentType': content_type}
+
+    if len(primeira) < tamanho:
+        cliente.put_object(Bucket=bucket, Key=key_path, Body=primeira, **extra)
+        return
+
+    upload_id = cliente.create_multipart_upload(Bucket=bucket, Key=key_path, **extra)['UploadId']
+    enviadas = []
+    try:
+        for numero, bloco in enumerate(itertools.chain([primeira], partes), start=1):
+            resp = cliente.upload_part(
+                Bucket=bucket, Key=key_path, UploadId=upload_id, PartNumber=numero, Body=bloco
+            )
+            enviadas.append({'ETag': resp['ETag'], 'PartNumber': numero})
+        cliente.complete_multipart_upload(
+            Bucket=bucket, Key=key_path, UploadId=upload_id, MultipartUpload={'Parts': enviadas}
+        )
+    except Exception:
+        cliente.abort_multipart_upload(Bucket=bucket, Key=key_path, UploadId=upload_id)
+        raise
+
+
+def _enviar_azure(blob_client, leitor, content_type):
+    """Block blob: stage_block por parte e commit da lista ao final."""
+    from azure.storage.blob import BlobBlock, ContentSettings  # já importado ao criar o cliente
+
+    blocos = []
+    for numero, bloco in enumerate(leitor.partes(_tamanho_parte())):
+        block_id = base64.b64encode(f"{numero:08d}".encode()).decode()
+        blob_client.stage_block(block_id=block_id, data=bloco)
+        blocos.append(BlobBlock(block_id=block_id))
+    blob_client.commit_block_list(blocos, content_settings=ContentSettings(content_type=content_type))
+
+
+def _enviar_gcp(blob, leitor, content_type):
+    """Upload resumível: o writer envia um chunk por vez."""
+    with blob.open('wb', content_type=content_type, chunk_size=_tamanho_parte(), ignore_flush=True) as destino:
+        for bloco in leitor.partes(_tamanho_parte()):
+            destino.write(bloco)
+
+
+def enviar_arquivo(file, nome_arquivo, config, limite=None, chave=None) -> ArquivoEnviado:
+    """
+    Upload em partes para o backend da configuração (local, AWS, Azure ou GCP),
+    lendo o stream uma única vez: calcula SHA-256 e tamanho no caminho e, se
+    'limite' (bytes) for excedido, interrompe o envio com ValueError.
+    'chave' fixa o caminho no backend (ex.: endereçado por conteúdo); sem ela,
+    usa 'provas/<uuid><ext>'.
     """
     # 🔒 Extensões permitidas — unificada com a view
-    extensoes_permitidas = {'.pdf', '.jpg', '.jpeg', '.png', '.xlsx', '.webp'}
     _, ext = os.path.splitext((nome_arquivo or "").lower())
-    if ext not in extensoes_permitidas:
+    if ext not in EXTENSOES_PERMITIDAS:
         raise ValueError("Extensão de arquivo não permitida.")
 
     # Pastas organizadas por tipo
     pasta = "provas"
 
-    # Gera nome único e seguro
-    unique_name = _safe_unique_name(nome_arquivo)
+    # Gera nome único e seguro (ou usa a chave informada)
+    if chave:
+        pasta, unique_name = os.path.split(chave)
+    else:
+        unique_name = _safe_unique_name(nome_arquivo)
     key_path = f"{pasta}/{unique_name}"
 
     # Content-Type
     content_type = _guess_content_type(nome_arquivo)
 
-    # Reposiciona o stream antes de cada upload
     _reset_stream(file)
+    leitor = _LeitorComHash(file, limite=limite)
 
     # =======================
     # 🔹 AWS S3
     # =======================
     if config.tipo == 'aws':
-        try:
-            import boto3  # lazy import
-        except Exception as e:
-            raise RuntimeError("Dependência boto3 ausente. Instale com: pip install boto3") from e
-
-        s3 = boto3.client(
-            's3',
-            aws_access_key_id=config.aws_access_key,
-            aws_secret_access_key=config.aws_secret_key,
-            region_name=config.aws_region
-        )
-
-        extra = {
-            'ACL': 'public-read',
-            'ContentType': content_type,
-            # 'CacheControl': 'public, max-age=31536000',  # opcional
-            # 'ContentDisposition': f'inline; filename="{os.path.basename(nome_arquivo)}"',
-        }
-
-        _reset_stream(file)
-        s3.upload_fileobj(file, config.aws_bucket_name, key_path, ExtraArgs=extra)
-
+        _enviar_s3(obter_cliente(config), config.aws_bucket_name, key_path, leitor, content_type)
         # URL virtual-hosted style (funciona na maioria das regiões):
-        return f"https://{config.aws_bucket_name}.s3.{config.aws_region}.amazonaws.com/{key_path}"
+        url = f"https://{config.aws_bucket_name}.s3.{config.aws_region}.amazonaws.com/{key_path}"
 
     # =======================
     # 🔹 Azure Blob Storage
     # =======================
     elif config.tipo == 'azure':
-        try:
-            from azure.storage.blob import BlobServiceClient, ContentSettings  # lazy import
-        except Exception as e:
-            raise RuntimeError("Dependência azure-storage-blob ausente. pip install azure-storage-blob") from e
-
-        blob_service_client = BlobServiceClient.from_connection_string(
-            config.azure_connection_string
-        )
-        blob_client = blob_service_client.get_blob_client(
-            container=config.azure_container,
-            blob=key_path
-        )
-
-        _reset_stream(file)
-        blob_client.upload_blob(
-            data=file,
-            overwrite=True,
-            content_settings=ContentSettings(content_type=content_type)
-        )
-
-        return f"https://{blob_service_client.account_name}.blob.core.windows.net/{config.azure_container}/{key_path}"
+        blob_service_client = obter_cliente(config)
+        blob_client = blob_service_client.get_blob_client(container=config.azure_container, blob=key_path)
+        _enviar_azure(blob_client, leitor, content_type)
+        url = f"https://{blob_service_client.account_name}.blob.core.windows.net/{config.azure_container}/{key_path}"
 
     # =======================
     # 🔹 Google Cloud Storage
     # =======================
     elif config.tipo == 'gcp':
-        try:
-            from google.cloud import storage  # lazy import
-        except Exception as e:
-            raise RuntimeError("Dependência google-cloud-storage ausente. pip install google-cloud-storage") from e
-
-        creds = json.loads(config.gcp_credentials_json or "{}")
-        client = storage.Client.from_service_account_info(creds) if creds else storage.Client()
-        bucket = client.bucket(config.gcp_bucket_name)
-        blob = bucket.blob(key_path)
-
-        _reset_stream(file)
-        # Nota: upload_from_file exige um file-like; funciona com InMemoryUploadedFile/TemporaryUploadedFile.
-        blob.upload_from_file(file, content_type=content_type)
+        blob = obter_cliente(config).bucket(config.gcp_bucket_name).blob(key_path)
+        _enviar_gcp(blob, leitor, content_type)
         # Torna público (se o bucket permitir políticas públicas)
         try:
             blob.make_public()
         except Exception:
             # Caso a política de IAM do bucket bloqueie, ao menos retorna a URL assinável
-            return blob.public_url  # pode ser None dependendo das políticas
-        return blob.public_url
+            pass
+        url = blob.public_url  # pode ser None dependendo das políticas
 
     # =======================
     # 🔹 Local (servidor local)
     # =======================
     else:
         caminho = os.path.join(pasta, unique_name)
-        file_path = default_storage.save(caminho, file)
+        key_path = default_storage.save(caminho, File(leitor, name=unique_name))
         # MEDIA_URL pode ser relativo; o front costuma montar absoluto com request.build_absolute_uri
         base = settings.MEDIA_URL.rstrip('/')
-        return f"{base}/{file_path}"
+        url = f"{base}/{key_path}"
+
+    return ArquivoEnviado(url, key_path, leitor.sha256, leitor.tamanho, content_type)
+
+
+def remover_arquivo(config, chave) -> None:
+    """Apaga o objeto 'chave' do backend da configuração (ausente = sucesso)."""
+    if config.tipo == 'aws':
+        obter_cliente(config).delete_object(Bucket=config.aws_bucket_name, Key=chave)
+    elif config.tipo == 'azure':
+        from azure.core.exceptions import ResourceNotFoundError  # já importado ao criar o cliente
+        try:
+            obter_cliente(config).get_blob_client(container=config.azure_container, blob=chave).delete_blob()
+        except ResourceNotFoundError:
+            pass
+    elif config.tipo == 'gcp':
+        from google.api_core.exceptions import NotFound  # já importado ao criar o cliente
+        try:
+            obter_cliente(config).bucket(config.gcp_bucket_name).blob(chave).delete()
+        except NotFound:
+            pass
+    else:
+        default_storage.delete(chave)
+
+
+def abrir_arquivo(config, chave):
+    """Stream de leitura (read(n)) do objeto 'chave' no backend da configuração."""
+    if config.tipo == 'aws':
+        return obter_cliente(config).get_object(Bucket=config.aws_bucket_name, Key=chave)['Body']
+    if config.tipo == 'azure':
+        return obter_cliente(config).get_blob_client(container=config.azure_container, blob=chave).download_blob()
+    if config.tipo == 'gcp':
+        return obter_cliente(config).bucket(config.gcp_bucket_name).blob(chave).open('rb', chunk_size=_tamanho_parte())
+    return default_storage.open(chave, 'rb')
+
+
+def tamanho_arquivo(config, chave) -> int:
+    """Tamanho em bytes do objeto (HEAD/propriedades; não baixa o conteúdo)."""
+    if config.tipo == 'aws':
+        return obter_cliente(config).head_object(Bucket=config.aws_bucket_name, Key=chave)['ContentLength']
+    if config.tipo == 'azure':
+        cliente = obter_cliente(config).get_blob_client(container=config.azure_container, blob=chave)
+        return cliente.get_blob_properties().size
+    if config.tipo == 'gcp':
+        blob = obter_cliente(config).bucket(config.gcp_bucket_name).get_blob(chave)
+        if blob is None:
+            raise FileNotFoundError(chave)
+        return blob.size
+    return default_storage.size(chave)
+
+
+def chave_da_url(config, url):
+    """
+    Inverso das URLs montadas em enviar_arquivo: devolve a chave do objeto se
+    'url' aponta para o backend da configuração, ou None.
+    """
+    from urllib.parse import unquote
+
+    url = str(url or "")
+    if config.tipo == 'aws':
+        prefixo = f"https://{config.aws_bucket_name}.s3.{config.aws_region}.amazonaws.com/"
+    elif config.tipo == 'azure':
+        prefixo = f"https://{obter_cliente(config).account_name}.blob.core.windows.net/{config.azure_container}/"
+    elif config.tipo == 'gcp':
+        prefixo = f"https://storage.googleapis.com/{config.gcp_bucket_name}/"
+    else:
+        prefixo = settings.MEDIA_URL.rstrip('/') + '/'
+        if url and '://' not in url and not url.startswith('/'):
+            return url  # FileField gravado como nome relativo ao MEDIA_ROOT
+    if not url.startswith(prefixo) or len(url) == len(prefixo):
+        return None
+    return unquote(url[len(prefixo):])
+
+
+def upload_arquivo(file, nome_arquivo, config) -> str:
+    """
+    Upload dinâmico baseado na configuração de armazenamento (local, AWS, Azure ou GCP).
+    Retorna URL pública do arquivo.
+    """
+    return enviar_arquivo(file, nome_arquivo, config).url
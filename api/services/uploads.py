@@ -0,0 +1,193 @@
+import os
+import time
+import hashlib
+import shutil
+import logging
+import threading
+from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction, close_old_connections
+
+from api.models import Preenchimento, ConfiguracaoArmazenamento
+from api.services.provas import armazenar_prova
+from api.services.imagens import gerar_variantes
+from api.services.configuracoes import armazenamento_ativo
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _staging_dir() -> str:
+    pasta = getattr(settings, 'UPLOAD_STAGING_DIR', None) or os.path.join(settings.MEDIA_ROOT, '_staging')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'UPLOAD_WORKERS', 2),
+                thread_name_prefix='upload-provas',
+            )
+        return _executor
+
+
+def _staged_name(preenchimento_id: int, nome_original: str) -> str:
+    """
+    '<preenchimento_id>__<uuid><ext>': o ID no nome permite reprocessar
+    arquivos órfãos do staging após um restart (ver reprocessar_uploads).
+    """
+    _, ext = os.path.splitext(os.path.basename(nome_original or "").lower())
+    return f"{preenchimento_id}__{uuid4().hex}{ext}"
+
+
+def preenchimento_id_do_staging(nome_staging: str):
+    try:
+        return int(os.path.basename(nome_staging).split('__', 1)[0])
+    except (TypeError, ValueError):
+        return None
+
+
+def enfileirar_upload(preenchimento: Preenchimento, arquivo, storage_cfg, sha256=None) -> str:
+    """
+    Grava o arquivo no staging local, marca o preenchimento como 'pending'
+    e agenda o envio ao backend configurado para DEPOIS do commit.
+    'sha256' (calculado pelo upload handler) é conferido no envio; sem ele,
+    é calculado aqui durante a cópia. Retorna o caminho do arquivo em staging.
+    """
+    destino = os.path.join(_staging_dir(), _staged_name(preenchimento.pk, arquivo.name))
+    digest = None if sha256 else hashlib.sha256()
+    with open(destino, 'wb') as out:
+        for chunk in arquivo.chunks():
+            out.write(chunk)
+            if digest is not None:
+                digest.update(chunk)
+    sha256 = sha256 or digest.hexdigest()
+
+    preenchimento.arquivo_status = Preenchimento.ARQUIVO_PENDENTE
+    Preenchimento.objects.filter(pk=preenchimento.pk).update(arquivo_status=Preenchimento.ARQUIVO_PENDENTE)
+
+    cfg_id = storage_cfg.pk
+    transaction.on_commit(lambda: _despachar(preenchimento.pk, destino, cfg_id, sha256))
+    return destino
+
+
+def _despachar(preenchimento_id: int, caminho: str, cfg_id: int, sha256=None) -> None:
+    if getattr(settings, 'UPLOAD_PIPELINE_EAGER', False):
+        processar_upload(preenchimento_id, caminho, cfg_id, sha256)
+    else:
+        _get_executor().submit(_processar_em_thread, preenchimento_id, caminho, cfg_id, sha256)
+
+
+def _processar_em_thread(preenchimento_id: int, caminho: str, cfg_id: int, sha256=None) -> None:
+    close_old_connections()
+    try:
+        processar_upload(preenchimento_id, caminho, cfg_id, sha256)
+    finally:
+        close_old_connections()
+
+
+def processar_upload(preenchimento_id: int, caminho: str, cfg_id=None, sha256=None) -> bool:
+    """
+    Envia o arquivo em staging ao backend (em partes), com retentativas e backoff exponencial.
+    Conteúdo já armazenado (mesmo SHA-256) é só referenciado, sem nova transferência.
+    Se 'sha256' vier, o hash calculado durante o envio precisa bater (staging íntegro).
+    Sucesso → grava a URL final em 'arquivo', status 'done' e remove o staging.
+    Falha definitiva → status 'failed' (o arquivo fica no staging para reprocessar).
+    """
+    cfg = armazenamento_ativo()
+    if cfg_id is not None and getattr(cfg, 'pk', None) != cfg_id:
+        cfg = ConfiguracaoArmazenamento.objects.filter(pk=cfg_id).first() or cfg
+    if cfg is None or not os.path.exists(caminho):
+        Preenchimento.objects.filter(pk=preenchimento_id).update(arquivo_status=Preenchimento.ARQUIVO_FALHOU)
+        return False
+
+    tentativas = max(1, int(getattr(settings, 'UPLOAD_MAX_TENTATIVAS', 3)))
+    backoff = float(getattr(settings, 'UPLOAD_BACKOFF_SEGUNDOS', 2))
+
+    for tentativa in range(1, tentativas + 1):
+        try:
+            prova = armazenar_prova(caminho, cfg, sha256)
+            # A prova pode ter sido coletada como órfã no meio do caminho: a FK falha e tenta de novo
+            Preenchimento.objects.filter(pk=preenchimento_id).update(
+                arquivo=prova.url, prova=prova, arquivo_status=Preenchimento.ARQUIVO_CONCLUIDO
+            )
+        except ValueError:
+            # Extensão inválida / staging corrompido não melhoram com retentativa
+            logger.exception("Upload rejeitado (preenchimento id=%s)", preenchimento_id)
+            break
+        except Exception:
+            logger.warning(
+                "Falha no upload (preenchimento id=%s, tentativa %s/%s)",
+                preenchimento_id, tentativa, tentativas, exc_info=True
+            )
+            if tentativa < tentativas:
+                time.sleep(backoff * (2 ** (tentativa - 1)))
+            continue
+
+        # Preview/miniatura WebP a partir do staging (ainda local); falha aqui não invalida o upload
+        try:
+            gerar_variantes(prova, caminho)
+        except Exception:
+            logger.warning("Falha ao gerar variantes da prova id=%s", prova.pk, exc_info=True)
+
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+        return True
+
+    Preenchimento.objects.filter(pk=preenchimento_id).update(arquivo_status=Preenchimento.ARQUIVO_FALHOU)
+    return False
+
+
+def arquivos_em_staging():
+    pasta = _staging_dir()
+    return sorted(
+        os.path.join(pasta, nome) for nome in os.listdir(pasta)
+        if os.path.isfile(os.path.join(pasta, nome))
+    )
+
+
+def triagem_staging(idade_minima_segundos: int) -> tuple:
+    """
+    Separa o staging para o reprocessamento, ignorando arquivos mais novos que
+    'idade_minima_segundos' (transação do upload ainda aberta ou envio em curso):
+      - reenviar: [(preenchimento_id, caminho)], só o arquivo mais recente de
+        cada preenchimento em 'failed' ou ainda 'pending' (envio travado)
+      - descartar: sem preenchimento, upload já concluído ou substituído por outro mais novo
+    """
+    limite = time.time() - idade_minima_segundos
+    por_preenchimento, descartar = {}, []
+    for caminho in arquivos_em_staging():
+        if os.path.getmtime(caminho) > limite:
+            continue
+        pk = preenchimento_id_do_staging(caminho)
+        if pk is None:
+            descartar.append(caminho)
+        else:
+            por_preenchimento.setdefault(pk, []).append(caminho)
+
+    status = dict(
+        Preenchimento.objects.filter(pk__in=list(por_preenchimento)).values_list('id', 'arquivo_status')
+    )
+    reenviar = []
+    for pk, caminhos in por_preenchimento.items():
+        caminhos.sort(key=os.path.getmtime)
+        if status.get(pk) in (Preenchimento.ARQUIVO_FALHOU, Preenchimento.ARQUIVO_PENDENTE):
+            reenviar.append((pk, caminhos.pop()))
+        descartar.extend(caminhos)
+    return reenviar, descartar
+
+
+def descartar_staging(caminho: str) -> None:
+    """Move um arquivo que não será reenviado para '<staging>/descartados'."""
+    destino = os.path.join(_staging_dir(), 'descartados')
+    os.makedirs(destino, exist_ok=True)
+    shutil.move(caminho, os.path.join(destino, os.path.basename(caminho)))
@@ -0,0 +1,53 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from api.models import Indicador, MetaMensal, Preenchimento, Setor, Configuracao, ConfiguracaoArmazenamento
+from api.services.fatos import agendar_atualizacao
+from api.services.cache_relatorios import invalidar_relatorios
+from api.services.configuracoes import invalidar_configuracoes
+
+
+# =========================
+#  FATOS MENSAIS (incremental)
+# =========================
+@receiver([post_save, post_delete], sender=Preenchimento, dispatch_uid='fatos_preenchimento')
+def _fatos_preenchimento(sender, instance, **kwargs):
+    agendar_atualizacao(instance.indicador_id, instance.competencia_primeiro_dia)
+    invalidar_relatorios()
+
+
+@receiver([post_save, post_delete], sender=MetaMensal, dispatch_uid='fatos_meta_mensal')
+def _fatos_meta_mensal(sender, instance, **kwargs):
+    # 'mes' pode chegar como string ('2025-02-01') quando a instância é criada direto
+    mes = MetaMensal._meta.get_field('mes').to_python(instance.mes)
+    agendar_atualizacao(instance.indicador_id, mes)
+    invalidar_relatorios()
+
+
+@receiver(post_save, sender=Indicador, dispatch_uid='fatos_indicador')
+def _fatos_indicador(sender, instance, created, **kwargs):
+    # valor_meta / tipo_meta / setor afetam todos os meses do indicador
+    if not created:
+        agendar_atualizacao(instance.pk)
+        invalidar_relatorios()
+
+
+@receiver(post_delete, sender=Indicador, dispatch_uid='cache_relatorios_indicador')
+def _cache_indicador_removido(sender, instance, **kwargs):
+    # Fatos saem em cascata; só o cache dos relatórios precisa ser invalidado
+    invalidar_relatorios()
+
+
+@receiver([post_save, post_delete], sender=Setor, dispatch_uid='cache_relatorios_setor')
+def _cache_setor(sender, instance, **kwargs):
+    # Nome do setor aparece nos relatórios/séries; os fatos guardam só o id
+    invalidar_relatorios()
+
+
+# =========================
+#  CONFIGURAÇÕES (cache em processo)
+# =========================
+@receiver([post_save, post_delete], sender=Configuracao, dispatch_uid='cache_configuracao')
+@receiver([post_save, post_delete], sender=ConfiguracaoArmazenamento, dispatch_uid='cache_configuracao_arm')
+def _cache_configuracoes(sender, instance, **kwargs):
+    invalidar_configuracoes()
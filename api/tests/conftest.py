@@ -0,0 +1,13 @@
+import pytest
+from django.core.cache import cache
+from api.services.configuracoes import invalidar_configuracoes
+
+
+@pytest.fixture(autouse=True)
+def _limpar_cache():
+    # Os caches em processo sobrevivem entre testes (o rollback não dispara signals)
+    cache.clear()
+    invalidar_configuracoes()
+    yield
+    cache.clear()
+    invalidar_configuracoes()
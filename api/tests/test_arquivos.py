@@ -0,0 +1,75 @@
+import gzip
+
+import pytest
+from django.test import RequestFactory
+
+from api.services.estaticos import empacotar_front
+from api.views.arquivos import servir_arquivo
+
+
+def _conteudo(response):
+    return b"".join(response.streaming_content) if response.streaming else response.content
+
+
+def test_empacotar_front_hash_nos_assets_e_html_reescrito(tmp_path):
+    origem = tmp_path / "front"
+    (origem / "js").mkdir(parents=True)
+    (origem / "js" / "app.js").write_text("console.log('ok');\n" * 200)
+    (origem / "index.html").write_text(
+        '<script src="js/app.js"></script><script src="https://cdn.exemplo.com/lib.js"></script>'
+    )
+
+    manifesto = empacotar_front(str(origem), str(tmp_path / "build"))
+
+    com_hash = manifesto["js/app.js"]
+    assert com_hash.startswith("js/app.") and com_hash != "js/app.js"
+    html = (tmp_path / "build" / "index.html").read_text()
+    assert f'src="{com_hash}"' in html and "https://cdn.exemplo.com/lib.js" in html
+    assert gzip.decompress((tmp_path / "build" / (com_hash + ".gz")).read_bytes()).startswith(b"console.log")
+
+    rf = RequestFactory()
+    response = servir_arquivo(rf.get("/", HTTP_ACCEPT_ENCODING="gzip, deflate"), com_hash, str(tmp_path / "build"))
+    assert response["Content-Encoding"] == "gzip"
+    assert "immutable" in response["Cache-Control"]
+    assert "Accept-Encoding" in response["Vary"]
+
+    # HTML é ponto de entrada: sem hash, sempre revalida
+    response = servir_arquivo(rf.get("/"), "index.html", str(tmp_path / "build"))
+    assert response["Cache-Control"] == "no-cache"
+
+
+def test_servir_arquivo_condicional_range_e_offload(tmp_path, settings):
+    (tmp_path / "prova.pdf").write_bytes(bytes(range(256)) * 4)
+    rf = RequestFactory()
+
+    primeira = servir_arquivo(rf.get("/"), "prova.pdf", str(tmp_path))
+    assert primeira.status_code == 200 and len(_conteudo(primeira)) == 1024
+    etag = primeira["ETag"]
+
+    assert servir_arquivo(rf.get("/", HTTP_IF_NONE_MATCH=etag), "prova.pdf", str(tmp_path)).status_code == 304
+
+    parcial = servir_arquivo(rf.get("/", HTTP_RANGE="bytes=10-19"), "prova.pdf", str(tmp_path))
+    assert parcial.status_code == 206
+    assert parcial["Content-Range"] == "bytes 10-19/1024"
+    assert _conteudo(parcial) == bytes(range(10, 20))
+
+    fora = servir_arquivo(rf.get("/", HTTP_RANGE="bytes=5000-"), "prova.pdf", str(tmp_path))
+    assert fora.status_code == 416
+
+    # If-Range com validador antigo → arquivo inteiro
+    antigo = servir_arquivo(rf.get("/", HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"velho"'), "prova.pdf", str(tmp_path))
+    assert antigo.status_code == 200
+
+    settings.ARQUIVOS_OFFLOAD = "x-accel"
+    delegado = servir_arquivo(rf.get("/"), "prova.pdf", str(tmp_path), prefixo_interno="/_interno/media/")
+    assert delegado["X-Accel-Redirect"] == "/_interno/media/prova.pdf"
+    assert delegado.content == b""
+
+
+def test_servir_arquivo_nao_sai_do_diretorio(tmp_path):
+    from django.http import Http404
+
+    (tmp_path / "pub").mkdir()
+    (tmp_path / "segredo.txt").write_text("x")
+    with pytest.raises(Http404):
+        servir_arquivo(RequestFactory().get("/"), "../segredo.txt", str(tmp_path / "pub"))
@@ -0,0 +1,176 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.models import LogDeAcao
+from api.services.auditoria import em_lote
+from api.utils import registrar_log
+
+User = get_user_model()
+
+
+def _inserts(capturadas):
+    return [q for q in capturadas if q['sql'].startswith('INSERT INTO "api_logdeacao"')]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_auditoria_gravada_em_lote_apos_commit():
+    user = User.objects.create_user(email="a@empresa.com", password="123", perfil="master")
+
+    with CaptureQueriesContext(connection) as capturadas, em_lote():
+        with transaction.atomic():
+            registrar_log(user, "A")
+            registrar_log(user, "B")
+        with pytest.raises(RuntimeError), transaction.atomic():
+            registrar_log(user, "desfeita")
+            raise RuntimeError
+        registrar_log(user, "C")
+        assert LogDeAcao.objects.count() == 0  # nada gravado antes do fim do bloco
+
+    assert len(_inserts(capturadas.captured_queries)) == 1
+    assert sorted(LogDeAcao.objects.values_list("acao", flat=True)) == ["A", "B", "C"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_auditoria_descarta_savepoint_desfeito(settings):
+    user = User.objects.create_user(email="s@empresa.com", password="123", perfil="master")
+
+    with em_lote():
+        with transaction.atomic():
+            registrar_log(user, "A")
+            with pytest.raises(RuntimeError), transaction.atomic():
+                registrar_log(user, "savepoint desfeito")
+                raise RuntimeError
+            with transaction.atomic():
+                registrar_log(user, "B")  # savepoint confirmado: segue a transação
+            registrar_log(user, "C")
+        with pytest.raises(RuntimeError), transaction.atomic():
+            registrar_log(user, "transação desfeita")
+            raise RuntimeError
+        with transaction.atomic():
+            registrar_log(user, "D")  # nova transação não herda o lote descartado
+    assert sorted(LogDeAcao.objects.values_list("acao", flat=True)) == ["A", "B", "C", "D"]
+
+    # Descarga dentro de um savepoint desfeito volta junto com ele
+    settings.AUDITORIA_BUFFER_MAX = 2
+    with transaction.atomic():
+        with pytest.raises(RuntimeError), transaction.atomic():
+            for i in range(3):
+                registrar_log(user, f"interno {i}")
+            raise RuntimeError
+        registrar_log(user, "E")
+    assert LogDeAcao.objects.filter(acao__startswith="interno").count() == 0
+    assert LogDeAcao.objects.filter(acao="E").exists()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_auditoria_fila_limitada_em_jobs_longos(settings):
+    settings.AUDITORIA_BUFFER_MAX = 2
+    user = User.objects.create_user(email="b@empresa.com", password="123", perfil="master")
+
+    with em_lote():
+        for i in range(5):
+            registrar_log(user, f"passo {i}")
+        assert LogDeAcao.objects.count() == 4  # descarregado a cada 2
+    assert LogDeAcao.objects.count() == 5
+
+    # Transação longa: grava dentro dela mesma e respeita o rollback
+    with pytest.raises(RuntimeError), transaction.atomic():
+        for i in range(3):
+            registrar_log(user, f"tx {i}")
+        raise RuntimeError
+    assert LogDeAcao.objects.count() == 5
+
+
+@pytest.mark.django_db
+def test_estruturar_logs_antigos_e_filtro_por_indicador(django_assert_max_num_queries):
+    from datetime import date
+    from decimal import Decimal
+    from rest_framework.test import APIClient
+    from api.models import Indicador, Setor
+
+    user = User.objects.create_user(email="c@empresa.com", password="123", perfil="master")
+    setor = Setor.objects.create(nome="Comercial")
+    indicador = Indicador.objects.create(nome="Vendas", setor=setor, valor_meta=10, tipo_meta="crescente")
+    antigos = [
+        "Ana preencheu o indicador 'Vendas' com R$ 1.234,56 referente a 03/2025",
+        "Excluiu preenchimento do indicador 'Vendas' do mês 04/2025.",
+        "Cadastrou o setor 'Comercial'",
+        "Mensagem livre",
+    ]
+    LogDeAcao.objects.bulk_create([LogDeAcao(usuario=user, acao=a) for a in antigos])
+
+    # Antes do backfill o filtro por nome ainda acha os logs antigos (pelo texto)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    r = client.get("/api/logs/", {"indicador_nome": "vend"})
+    assert r.status_code == 200 and len(r.json()["results"]) == 2
+
+    with django_assert_max_num_queries(8):
+        from api.services.auditoria import estruturar_logs
+        assert estruturar_logs(lote=3) == 4
+    assert estruturar_logs() == 0  # retomável: nada pendente
+
+    preench = LogDeAcao.objects.get(acao__startswith="Ana")
+    assert (preench.tipo_acao, preench.indicador_id, preench.setor_id, preench.competencia, preench.valor) == (
+        LogDeAcao.PREENCHIMENTO_CRIADO, indicador.pk, setor.pk, date(2025, 3, 1), Decimal("1234.56"))
+    assert LogDeAcao.objects.get(acao__startswith="Cadastrou").setor_id == setor.pk
+    assert LogDeAcao.objects.get(acao="Mensagem livre").tipo_acao == LogDeAcao.OUTRO
+
+    r = client.get("/api/logs/", {"indicador_nome": "vend"})
+    assert len(r.json()["results"]) == 2
+    r = client.get("/api/logs/", {"indicador": indicador.pk, "competencia": "2025-04"})
+    assert [l["tipo_acao"] for l in r.json()["results"]] == [LogDeAcao.PREENCHIMENTO_EXCLUIDO]
+
+
+@pytest.mark.django_db
+def test_filtro_por_nome_acha_indicador_excluido_ou_renomeado(django_capture_on_commit_callbacks):
+    from rest_framework.test import APIClient
+    from api.models import Indicador, Setor
+    from api.services.auditoria import estruturar_logs
+
+    user = User.objects.create_user(email="d@empresa.com", password="123", perfil="master")
+    setor = Setor.objects.create(nome="Comercial")
+    vendas = Indicador.objects.create(nome="Vendas", setor=setor, valor_meta=10, tipo_meta="crescente")
+    with django_capture_on_commit_callbacks(execute=True):
+        registrar_log(user, "Editou o indicador 'Vendas'", tipo_acao=LogDeAcao.INDICADOR_EDITADO, indicador=vendas)
+    LogDeAcao.objects.bulk_create([
+        LogDeAcao(usuario=user, acao="Cadastrou o indicador 'Churn'"),  # indicador já excluído
+        # Estruturado antes da coluna indicador_nome
+        LogDeAcao(usuario=user, acao="Excluiu o indicador 'Leads'", tipo_acao=LogDeAcao.INDICADOR_EXCLUIDO),
+    ])
+    assert LogDeAcao.objects.get(acao__startswith="Editou").indicador_nome == "Vendas"
+
+    assert estruturar_logs() == 2
+    assert dict(LogDeAcao.objects.values_list("acao", "indicador_nome")) == {
+        "Editou o indicador 'Vendas'": "Vendas",
+        "Cadastrou o indicador 'Churn'": "Churn",
+        "Excluiu o indicador 'Leads'": "Leads",
+    }
+
+    Indicador.objects.filter(pk=vendas.pk).update(nome="Receita")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    buscar = lambda nome: [l["acao"] for l in client.get("/api/logs/", {"indicador_nome": nome}).json()["results"]]
+    assert buscar("churn") == ["Cadastrou o indicador 'Churn'"]
+    assert buscar("vend") == buscar("receita") == ["Editou o indicador 'Vendas'"]
+
+
+@pytest.mark.django_db
+def test_filtro_por_setor_usa_o_setor_do_registro():
+    from rest_framework.test import APIClient
+    from api.models import Setor
+
+    comercial, financeiro = Setor.objects.create(nome="Comercial"), Setor.objects.create(nome="Financeiro")
+    user = User.objects.create_user(email="s@empresa.com", password="123", perfil="master")
+    user.setores.add(comercial)
+    LogDeAcao.objects.bulk_create([
+        LogDeAcao(usuario=user, acao="Editou o setor 'Financeiro'", setor=financeiro),
+        LogDeAcao(usuario=user, acao="Editou o setor 'Comercial'", setor=comercial),
+    ])
+    client = APIClient()
+    client.force_authenticate(user=user)
+    buscar = lambda setor: [l["acao"] for l in client.get("/api/logs/", {"setor": setor}).json()["results"]]
+    assert buscar(financeiro.pk) == ["Editou o setor 'Financeiro'"]
+    assert buscar(comercial.pk) == ["Editou o setor 'Comercial'"]
@@ -0,0 +1,43 @@
+import json
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from api.models import Indicador, Setor, MetaMensal, Preenchimento
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_exportacao_csv_e_ndjson_filtra_escopo_e_competencia():
+    client = APIClient()
+    gestor = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client.force_authenticate(user=gestor)
+
+    meu = Setor.objects.create(nome="Financeiro")
+    outro = Setor.objects.create(nome="Marketing")
+    gestor.setores.add(meu)
+    receita = Indicador.objects.create(nome="Receita", setor=meu, valor_meta=10, tipo_meta="crescente",
+                                       visibilidade=False, mes_inicial="2025-01-01")
+    leads = Indicador.objects.create(nome="Leads", setor=outro, valor_meta=10, tipo_meta="crescente",
+                                     visibilidade=False, mes_inicial="2025-01-01")
+    MetaMensal.objects.create(indicador=receita, mes="2025-02-01", valor_meta=20)
+    for mes in (1, 2, 3):
+        Preenchimento.objects.create(indicador=receita, ano=2025, mes=mes, preenchido_por=gestor, valor_realizado=15)
+        Preenchimento.objects.create(indicador=leads, ano=2025, mes=mes, preenchido_por=gestor, valor_realizado=15)
+
+    params = {"desde": "2025-01", "ate": "2025-02"}
+    response = client.get(reverse("exportar-preenchimentos-csv"), params)
+    assert response.status_code == 200
+    linhas = b"".join(response.streaming_content).decode().splitlines()
+    assert linhas[0].startswith("indicador_id,indicador,setor_id,setor,competencia")
+    assert len(linhas) == 3  # cabeçalho + jan/fev do setor do gestor
+
+    response = client.get(reverse("exportar-preenchimentos-ndjson"), params)
+    registros = [json.loads(l) for l in b"".join(response.streaming_content).decode().splitlines()]
+    assert [(r["competencia"], r["valor_meta"], r["atingido"], r["autor"]) for r in registros] == [
+        ("2025-01", 10.0, True, "gestor@empresa.com"),
+        ("2025-02", 20.0, False, "gestor@empresa.com"),
+    ]
+
+    assert client.get(reverse("exportar-preenchimentos-csv"), {"desde": "jan"}).status_code == 400
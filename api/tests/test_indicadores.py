@@ -35,3 +35,257 @@ def test_criar_indicador_como_master():
 
     assert response.status_code == 201
     assert Indicador.objects.filter(nome="Taxa de Conversão").exists()
+
+
+def _indicadores_em_massa(setor, n, **extra):
+    from datetime import date
+    return Indicador.objects.bulk_create([
+        Indicador(nome=f"KPI {i}", setor=setor, valor_meta=i, tipo_meta="crescente",
+                  periodicidade=(i % 3) + 1, mes_inicial=date(2024, (i % 12) + 1, 1), **extra)
+        for i in range(n)
+    ])
+
+
+@pytest.mark.django_db
+def test_reconciliar_metas_em_lote_com_consultas_constantes(django_assert_max_num_queries):
+    from datetime import date
+    from api.models import MetaMensal
+    from api.services.metas import reconciliar_metas
+
+    setor = Setor.objects.create(nome="Operações")
+    trimestral, mensal = _indicadores_em_massa(setor, 2)
+    trimestral.periodicidade, trimestral.mes_inicial = 3, date(2025, 1, 1)
+    mensal.periodicidade, mensal.mes_inicial, mensal.mes_final = 1, date(2025, 1, 1), date(2025, 3, 1)
+    Indicador.objects.bulk_update([trimestral, mensal], ["periodicidade", "mes_inicial", "mes_final"])
+    MetaMensal.objects.bulk_create([
+        MetaMensal(indicador=trimestral, mes=date(2025, 2, 1), valor_meta=1),  # desalinhada
+        MetaMensal(indicador=mensal, mes=date(2025, 5, 1), valor_meta=1),      # após mes_final
+    ])
+    _indicadores_em_massa(setor, 40)
+
+    with django_assert_max_num_queries(8):
+        resumo = reconciliar_metas(ate=date(2025, 6, 1))
+
+    assert resumo.indicadores == 42 and resumo.removidas == 2
+    meses = lambda ind: list(MetaMensal.objects.filter(indicador=ind).values_list("mes", flat=True))
+    assert meses(trimestral) == [date(2025, 1, 1), date(2025, 4, 1)]
+    assert meses(mensal) == [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)]
+
+    # Idempotente
+    assert reconciliar_metas(ate=date(2025, 6, 1)) == (42, 0, 0)
+
+
+@pytest.mark.skipif(not __import__("os").environ.get("BENCH_METAS"),
+                    reason="benchmark: BENCH_METAS=<nº de indicadores> pytest -s -k benchmark")
+@pytest.mark.django_db
+def test_benchmark_reconciliar_metas():
+    import os
+    import time
+    from datetime import date
+    from api.models import MetaMensal
+    from api.services.metas import ensure_metas_ate, reconciliar_metas
+
+    n = int(os.environ["BENCH_METAS"])
+    setor = Setor.objects.create(nome="Benchmark")
+    indicadores = _indicadores_em_massa(setor, n)
+    ate = date(2025, 12, 1)
+
+    inicio = time.perf_counter()
+    for indicador in indicadores:
+        ensure_metas_ate(indicador, ate, hard_cap=True)
+    por_indicador = time.perf_counter() - inicio
+    total = MetaMensal.objects.count()
+
+    MetaMensal.objects.all().delete()
+    inicio = time.perf_counter()
+    resumo = reconciliar_metas(ate=ate)
+    em_lote = time.perf_counter() - inicio
+
+    print(f"\n{n} indicadores, {total} metas: por indicador {por_indicador:.2f}s | em lote {em_lote:.2f}s "
+          f"({por_indicador / em_lote:.1f}x)")
+    assert resumo.criadas == total
+    assert em_lote < por_indicador
+
+
+@pytest.mark.django_db(transaction=True)  # commits reais: fatos e versão do cache antes do aquecimento
+def test_rollover_mensal_materializa_uma_vez_e_aquece_cache(settings, monkeypatch):
+    from datetime import date
+    from django.core.cache import cache
+    from django.core.management import call_command, CommandError
+    from api.models import MetaMensal, Preenchimento, RolloverMensal
+    from api.services import rollover
+    from api.services.cache_relatorios import chave_relatorio
+    from api.services.rollover import executar_rollover
+
+    monkeypatch.setattr(rollover, "localdate", lambda: date(2025, 4, 15))
+    settings.ROLLOVER_PLACEHOLDERS = True
+    settings.REPORT_CACHE_ATIVO = True
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    setor = Setor.objects.create(nome="Financeiro")
+    indicador = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                         periodicidade=1, mes_inicial=date(2025, 1, 1))
+    MetaMensal.objects.filter(indicador=indicador).delete()
+    MetaMensal.objects.create(indicador=indicador, mes=date(2025, 5, 1), valor_meta=10)  # futura
+
+    resumo = executar_rollover(hoje=date(2025, 4, 15))
+
+    assert resumo["metas_criadas"] == 3 and resumo["placeholders"] == 3
+    assert list(MetaMensal.objects.filter(indicador=indicador).values_list("mes", flat=True)) == [
+        date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)
+    ]
+    assert Preenchimento.objects.filter(indicador=indicador, origem="backfill-auto", preenchido_por=master).count() == 3
+    # LocMem dos testes não é compartilhado: o cron não aquece o que ninguém leria
+    assert resumo["escopos_aquecidos"] == 0
+    assert cache.get(chave_relatorio("resumo", master, {})) is None
+    monkeypatch.setattr(rollover, "cache_compartilhado", lambda: True)
+    assert rollover.aquecer_caches() == 1
+    assert cache.get(chave_relatorio("resumo", master, {})) is not None
+    assert RolloverMensal.objects.get(competencia=date(2025, 4, 1)).concluido_em is not None
+
+    # Watermark: reexecução é no-op
+    assert executar_rollover(hoje=date(2025, 4, 20)) is None
+
+    # Competência passada apagaria metas já vigentes como "futuras": recusada
+    with pytest.raises(CommandError):
+        call_command("rollover_mensal", competencia="2025-02", forcar=True)
+    assert MetaMensal.objects.filter(indicador=indicador).count() == 3
+
+
+@pytest.mark.django_db
+def test_propagar_valor_meta_e_metas_mensais_em_lote():
+    from datetime import date
+    from decimal import Decimal
+    from api.models import MetaMensal
+
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(email="m@empresa.com", password="123", perfil="master"))
+    setor = Setor.objects.create(nome="Financeiro")
+    indicador = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                         periodicidade=1, mes_inicial=date(2025, 1, 1), mes_final=date(2025, 6, 1))
+    MetaMensal.objects.bulk_create([MetaMensal(indicador=indicador, mes=date(2025, m, 1), valor_meta=10)
+                                    for m in range(1, 7)])
+    valores = lambda: dict(MetaMensal.objects.filter(indicador=indicador).values_list("mes__month", "valor_meta"))
+
+    # Propagação: só a faixa pedida recebe o novo valor
+    url = reverse("indicador-detail", args=[indicador.pk])
+    r = client.patch(url, {"valor_meta": 20, "propagar_meta_desde": "2025-03", "propagar_meta_ate": "2025-05"},
+                     format="json")
+    assert r.status_code == 200, r.content
+    assert valores() == {1: 10, 2: 10, 3: 20, 4: 20, 5: 20, 6: 10}
+
+    r = client.patch(url, {"propagar_meta_desde": "2025-03"}, format="json")
+    assert r.status_code == 400
+
+    # Lote: atualiza existentes e ignora repetições (vale a última)
+    bulk = reverse("meta-mensal-bulk")
+    r = client.post(bulk, {"metas": [
+        {"indicador": indicador.pk, "mes": "2025-01", "valor_meta": "7,5"},
+        {"indicador": indicador.pk, "mes": "2025-02-01", "valor_meta": 8},
+        {"indicador": indicador.pk, "mes": "2025-02", "valor_meta": 9},
+    ]}, format="json")
+    assert r.status_code == 200, r.content
+    assert r.json()["atualizadas"] == 2
+    assert valores()[1] == Decimal("7.50") and valores()[2] == 9
+
+    # Faixa: todos os meses do calendário entre desde e ate
+    r = client.post(bulk, {"indicador": indicador.pk, "valor_meta": 30, "desde": "2025-04", "ate": "2025-06"},
+                    format="json")
+    assert r.status_code == 200 and r.json()["atualizadas"] == 3
+    assert valores()[4] == valores()[6] == 30
+
+    # Faixa que passa de mes_final → só os meses até ele
+    r = client.post(bulk, {"indicador": indicador.pk, "valor_meta": 40, "desde": "2025-05", "ate": "2025-09"},
+                    format="json")
+    assert r.status_code == 200 and r.json()["atualizadas"] == 2, r.content
+    assert valores() == {1: Decimal("7.50"), 2: 9, 3: 20, 4: 30, 5: 40, 6: 40}
+
+    # Mês fora do calendário (após mes_final)
+    r = client.post(bulk, {"metas": [{"indicador": indicador.pk, "mes": "2025-09", "valor_meta": 1}]},
+                    format="json")
+    assert r.status_code == 400
+
+
+@pytest.mark.django_db
+def test_metas_em_lote_do_gestor_restritas_ao_seu_escopo(monkeypatch):
+    from datetime import date
+    from api.models import MetaMensal, PermissaoIndicador
+    from api.views import indicadores as views_indicadores
+
+    monkeypatch.setattr(views_indicadores, "permitir_editar_meta_gestor", lambda: True)
+    gestor = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client = APIClient()
+    client.force_authenticate(user=gestor)
+    meu, outro = Setor.objects.create(nome="Financeiro"), Setor.objects.create(nome="Marketing")
+    gestor.setores.add(meu)
+    criar = lambda nome, setor: Indicador.objects.create(
+        nome=nome, setor=setor, valor_meta=10, tipo_meta="crescente", visibilidade=True,
+        periodicidade=1, mes_inicial=date(2025, 1, 1),
+    )
+    receita, leads, visitas = criar("Receita", meu), criar("Leads", outro), criar("Visitas", outro)
+    PermissaoIndicador.objects.create(usuario=gestor, indicador=visitas)
+
+    bulk = reverse("meta-mensal-bulk")
+    r = client.post(bulk, {"metas": [
+        {"indicador": receita.pk, "mes": "2025-01", "valor_meta": 5},
+        {"indicador": leads.pk, "mes": "2025-01", "valor_meta": 5},  # público, mas de outro setor
+    ]}, format="json")
+    assert r.status_code == 403
+    assert not MetaMensal.objects.filter(valor_meta=5).exists()
+
+    r = client.post(bulk, {"metas": [
+        {"indicador": receita.pk, "mes": "2025-01", "valor_meta": 5},
+        {"indicador": visitas.pk, "mes": "2025-01", "valor_meta": 5},
+    ]}, format="json")
+    assert r.status_code == 200 and r.json()["atualizadas"] == 2
+
+
+@pytest.mark.django_db
+def test_meta_resolver_em_lote_com_fallback(django_assert_num_queries):
+    from datetime import date
+    from decimal import Decimal
+    from api.models import MetaMensal
+    from api.services.metas import MetaResolver
+
+    setor = Setor.objects.create(nome="Vendas")
+    a, b = _indicadores_em_massa(setor, 2)
+    MetaMensal.objects.create(indicador=a, mes=date(2025, 1, 1), valor_meta=42)
+
+    resolver = MetaResolver()
+    chaves = [(a.pk, date(2025, 1, 15)), (a.pk, date(2025, 2, 1)), (b.pk, date(2025, 1, 1)), (999999, date(2025, 1, 1))]
+    with django_assert_num_queries(1):
+        metas = resolver.resolver(chaves)
+    assert metas == {
+        (a.pk, date(2025, 1, 1)): Decimal("42"),
+        (a.pk, date(2025, 2, 1)): a.valor_meta,  # sem MetaMensal → valor_meta do indicador
+        (b.pk, date(2025, 1, 1)): b.valor_meta,
+        (999999, date(2025, 1, 1)): None,
+    }
+
+    # Chaves já conhecidas (inclusive ausentes) saem do cache
+    with django_assert_num_queries(0):
+        assert resolver.meta(a.pk, date(2025, 1, 1)) == 42
+        assert resolver.meta(999999, date(2025, 1, 1)) is None
+
+
+@pytest.mark.django_db
+def test_consolidado_ignora_meta_mensal_fora_do_calendario():
+    from datetime import date
+    from dateutil.relativedelta import relativedelta
+    from api.models import MetaMensal, Preenchimento
+
+    user = User.objects.create_user(email="m@empresa.com", password="123", perfil="master")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    setor = Setor.objects.create(nome="Financeiro")
+    indicador = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                         visibilidade=True, periodicidade=1, mes_inicial=date(2025, 1, 1))
+    futuro = date.today().replace(day=1) + relativedelta(months=2)
+    for mes in (date(2025, 3, 1), futuro):
+        MetaMensal.objects.create(indicador=indicador, mes=mes, valor_meta=50)
+        Preenchimento.objects.create(indicador=indicador, ano=mes.year, mes=mes.month, preenchido_por=user,
+                                     valor_realizado=20)
+
+    historico = client.get(reverse("indicadores-consolidados")).json()[0]["historico"]
+    metas = {(h["ano"], h["mes"]): h["meta"] for h in historico}
+    # Competência futura (ainda fora dos meses permitidos) fica com valor_meta
+    assert metas == {(2025, 3): 50, (futuro.year, futuro.month): 10}
@@ -0,0 +1,41 @@
+import pytest
+from datetime import date
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from api.models import Indicador, Setor, MetaMensal, Preenchimento
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_pendentes_lista_resumo_e_contagem():
+    client = APIClient()
+    user = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client.force_authenticate(user=user)
+
+    setor = Setor.objects.create(nome="Financeiro")
+    user.setores.add(setor)
+    indicador = Indicador.objects.create(
+        nome="Receita Mensal", setor=setor, valor_meta=100,
+        tipo_meta="crescente", tipo_valor="monetario",
+        visibilidade=False, mes_inicial="2025-01-01",
+    )
+    for mes in (1, 2, 3):
+        MetaMensal.objects.create(indicador=indicador, mes=date(2025, mes, 1), valor_meta=100)
+
+    # Fevereiro confirmado; março só com placeholder (não confirmado) → continua pendente
+    Preenchimento.objects.create(indicador=indicador, ano=2025, mes=2, preenchido_por=user,
+                                 valor_realizado=120, confirmado=True)
+    Preenchimento.objects.create(indicador=indicador, ano=2025, mes=3, preenchido_por=user)
+
+    lista = client.get(reverse("indicadores-pendentes")).json()
+    assert [(p["ano"], p["mes"]) for p in lista] == [(2025, 1), (2025, 3)]
+    assert lista[0]["setor_nome"] == "Financeiro"
+
+    resumo = client.get(reverse("indicadores-pendentes"), {"resumo": 1}).json()
+    assert resumo["total"] == 2
+    assert resumo["por_setor"] == [{"setor": setor.id, "setor_nome": "Financeiro", "total": 2}]
+    assert [(m["ano"], m["mes"], m["total"]) for m in resumo["por_mes"]] == [(2025, 1, 1), (2025, 3, 1)]
+
+    assert client.get(reverse("indicadores-pendentes-contagem")).json() == {"total": 2}
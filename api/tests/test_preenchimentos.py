@@ -1,9 +1,10 @@
 import pytest
 from decimal import Decimal
 from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
-from api.models import Indicador, Setor
+from api.models import Indicador, Setor, Preenchimento, ConfiguracaoArmazenamento
 
 User = get_user_model()
 
@@ -53,3 +54,299 @@ def test_preenchimento_retroativo():
     # (opcional) garante que salvou a competência corretamente
     assert data["mes"] == 8
     assert data["ano"] == 2025
+
+
+@pytest.mark.django_db
+def test_resolve_id_em_lote():
+    client = APIClient()
+    user = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client.force_authenticate(user=user)
+
+    setor = Setor.objects.create(nome="Financeiro")
+    user.setores.add(setor)
+    indicador = Indicador.objects.create(
+        nome="Receita Mensal", setor=setor, valor_meta=10000,
+        tipo_meta="crescente", tipo_valor="monetario",
+        visibilidade=False, periodicidade=1, mes_inicial="2025-01-01", ativo=True,
+    )
+    existente = Preenchimento.objects.create(
+        indicador=indicador, ano=2025, mes=1, preenchido_por=user, valor_realizado=5,
+    )
+
+    url = reverse("preenchimento-resolve-id")
+    itens = [{"indicador": indicador.id, "ano": 2025, "mes": m} for m in (1, 2, 3)]
+    response = client.post(url, {"itens": itens}, format="json")
+
+    assert response.status_code == 200
+    ids = {(i["ano"], i["mes"]): i["id"] for i in response.json()["itens"]}
+    assert ids[(2025, 1)] == existente.id
+    assert Preenchimento.objects.filter(indicador=indicador, preenchido_por=user).count() == 3
+
+    # Idempotente: a segunda chamada devolve os mesmos IDs sem criar nada
+    response = client.post(url, {"itens": itens}, format="json")
+    assert {(i["ano"], i["mes"]): i["id"] for i in response.json()["itens"]} == ids
+    assert Preenchimento.objects.filter(indicador=indicador, preenchido_por=user).count() == 3
+
+
+@pytest.mark.django_db
+def test_upload_de_prova_assincrono(settings, tmp_path, django_capture_on_commit_callbacks):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.UPLOAD_STAGING_DIR = str(tmp_path / "staging")
+    settings.UPLOAD_PIPELINE_EAGER = True
+
+    client = APIClient()
+    user = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client.force_authenticate(user=user)
+
+    setor = Setor.objects.create(nome="Financeiro")
+    user.setores.add(setor)
+    indicador = Indicador.objects.create(
+        nome="Receita Mensal", setor=setor, valor_meta=10000,
+        tipo_meta="crescente", tipo_valor="monetario",
+        visibilidade=True, periodicidade=1, mes_inicial="2025-01-01", ativo=True,
+    )
+    ConfiguracaoArmazenamento.objects.create(tipo="local", ativo=True)
+
+    payload = {
+        "indicador": indicador.id, "valor_realizado": "100", "ano": 2025, "mes": 8,
+        "arquivo": SimpleUploadedFile("prova.pdf", b"%PDF-1.4 teste", content_type="application/pdf"),
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(reverse("preenchimento-list"), payload, format="multipart")
+
+    assert response.status_code == 201
+    assert response.json()["arquivo_status"] == "pending"
+
+    p = Preenchimento.objects.get(pk=response.json()["id"])
+    assert p.arquivo_status == "done"
+    assert p.arquivo.name.startswith("/media/provas/")
+    assert list((tmp_path / "staging").iterdir()) == []
+
+
+@pytest.mark.django_db
+def test_upload_acima_do_limite_recusado_sem_ler_o_corpo(settings):
+    settings.PROVA_MAX_BYTES = 1024
+
+    client = APIClient()
+    user = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client.force_authenticate(user=user)
+    setor = Setor.objects.create(nome="Financeiro")
+    user.setores.add(setor)
+    indicador = Indicador.objects.create(
+        nome="Receita Mensal", setor=setor, valor_meta=10000, tipo_meta="crescente",
+        visibilidade=True, periodicidade=1, mes_inicial="2025-01-01", ativo=True,
+    )
+
+    payload = {
+        "indicador": indicador.id, "valor_realizado": "100", "ano": 2025, "mes": 8,
+        "arquivo": SimpleUploadedFile("prova.pdf", b"x" * 200 * 1024, content_type="application/pdf"),
+    }
+    response = client.post(reverse("preenchimento-list"), payload, format="multipart")
+
+    assert response.status_code == 400
+    assert "arquivo" in response.json()
+    assert not Preenchimento.objects.exists()
+
+    # Estouro no meio do streaming (Content-Length dentro da margem): 400, sem reset de conexão
+    payload["arquivo"] = SimpleUploadedFile("prova.pdf", b"x" * 8 * 1024, content_type="application/pdf")
+    response = client.post(reverse("preenchimento-list"), payload, format="multipart")
+    assert response.status_code == 400
+    assert "arquivo" in response.json()
+
+    # O limite vale só nas views de prova: outros multipart chegam inteiros
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    client.force_authenticate(user=master)
+    response = client.post(reverse("setor-list"), {
+        "nome": "Marketing", "anexo": SimpleUploadedFile("a.bin", b"x" * 200 * 1024),
+    }, format="multipart")
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+def test_meus_preenchimentos_paginado_por_competencia():
+    client = APIClient()
+    user = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client.force_authenticate(user=user)
+
+    setor = Setor.objects.create(nome="Financeiro")
+    indicador = Indicador.objects.create(
+        nome="Receita Mensal", setor=setor, valor_meta=10000,
+        tipo_meta="crescente", tipo_valor="monetario", mes_inicial="2024-01-01",
+    )
+    for ano, mes in [(2024, 11), (2024, 12), (2025, 1), (2025, 2)]:
+        Preenchimento.objects.create(indicador=indicador, ano=ano, mes=mes, preenchido_por=user, valor_realizado=1)
+
+    url = reverse("meus-preenchimentos")
+    vistos = []
+    proxima = f"{url}?limite=2&desde=2024-12"
+    while proxima:
+        data = client.get(proxima).json()
+        vistos += [(r["ano"], r["mes"]) for r in data["results"]]
+        proxima = data["next"]
+
+    assert vistos == [(2025, 2), (2025, 1), (2024, 12)]
+
+
+@pytest.mark.django_db
+def test_prova_repetida_reaproveita_objeto_e_coleta_orfas(settings, tmp_path, django_capture_on_commit_callbacks):
+    from io import StringIO
+    from django.core.management import call_command
+    from api.models import ArquivoProva
+
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.UPLOAD_STAGING_DIR = str(tmp_path / "staging")
+    settings.UPLOAD_PIPELINE_EAGER = True
+
+    client = APIClient()
+    user = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client.force_authenticate(user=user)
+    setor = Setor.objects.create(nome="Financeiro")
+    user.setores.add(setor)
+    ConfiguracaoArmazenamento.objects.create(tipo="local", ativo=True)
+
+    ids = []
+    for nome in ("Receita", "Custo"):
+        indicador = Indicador.objects.create(nome=nome, setor=setor, valor_meta=10, tipo_meta="crescente",
+                                             visibilidade=True, periodicidade=1, mes_inicial="2025-01-01")
+        payload = {
+            "indicador": indicador.id, "valor_realizado": "100", "ano": 2025, "mes": 8,
+            "arquivo": SimpleUploadedFile("fechamento.pdf", b"%PDF-1.4 mesmo", content_type="application/pdf"),
+        }
+        with django_capture_on_commit_callbacks(execute=True):
+            ids.append(client.post(reverse("preenchimento-list"), payload, format="multipart").json()["id"])
+
+    prova = ArquivoProva.objects.get()
+    assert set(Preenchimento.objects.filter(pk__in=ids).values_list("prova_id", "arquivo")) == {(prova.id, prova.url)}
+    arquivo = tmp_path / "media" / prova.chave
+    assert arquivo.exists()
+
+    Preenchimento.objects.filter(pk__in=ids).delete()
+    call_command("coletar_provas_orfas", "--idade-minima-horas", "0", stdout=StringIO())
+    assert not ArquivoProva.objects.exists()
+    assert not arquivo.exists()
+
+
+@pytest.mark.django_db(transaction=True)  # o reenvio roda entre as duas transações da coleta
+def test_coleta_nao_apaga_objeto_reenviado_entre_as_fases(settings, tmp_path, monkeypatch):
+    from datetime import timedelta
+    from django.utils.timezone import now
+    from api.models import ArquivoProva
+    from api.services import provas
+
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    cfg = ConfiguracaoArmazenamento.objects.create(tipo="local", ativo=True)
+    origem = tmp_path / "fechamento.pdf"
+    origem.write_bytes(b"%PDF-1.4 mesmo")
+    antiga = provas.armazenar_prova(str(origem), cfg)
+    ArquivoProva.objects.filter(pk=antiga.pk).update(criado_em=now() - timedelta(hours=2))
+    arquivo = tmp_path / "media" / antiga.chave
+
+    trava_original = provas._trava_conteudo
+    reenviadas = []
+
+    def reenvio_antes_da_remocao(cfg_, sha256):
+        # Registro órfão já apagado; o mesmo conteúdo chega de novo antes do objeto sair
+        if not reenviadas:
+            reenviadas.append(sha256)
+            provas.armazenar_prova(str(origem), cfg)
+        return trava_original(cfg_, sha256)
+
+    enviar_original = provas.enviar_arquivo
+
+    def enviar_sobrescrevendo(f, nome, cfg_, chave=None, **kwargs):
+        # Como S3/Azure/GCS: a mesma chave é sobrescrita (o local criaria outro nome)
+        (tmp_path / "media" / chave).unlink(missing_ok=True)
+        return enviar_original(f, nome, cfg_, chave=chave, **kwargs)
+
+    monkeypatch.setattr(provas, "enviar_arquivo", enviar_sobrescrevendo)
+    monkeypatch.setattr(provas, "_trava_conteudo", reenvio_antes_da_remocao)
+    assert provas.coletar_orfas(idade_minima=timedelta(hours=1)) == 1
+
+    nova = ArquivoProva.objects.get()
+    assert nova.pk != antiga.pk and nova.chave == antiga.chave
+    assert arquivo.exists()
+
+
+@pytest.mark.django_db
+def test_prova_em_imagem_gera_preview_e_miniatura_webp(settings, tmp_path, django_capture_on_commit_callbacks):
+    from io import BytesIO
+    from PIL import Image
+
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.UPLOAD_STAGING_DIR = str(tmp_path / "staging")
+    settings.UPLOAD_PIPELINE_EAGER = True
+
+    client = APIClient()
+    user = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client.force_authenticate(user=user)
+    setor = Setor.objects.create(nome="Financeiro")
+    user.setores.add(setor)
+    indicador = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                         visibilidade=True, periodicidade=1, mes_inicial="2025-01-01")
+    ConfiguracaoArmazenamento.objects.create(tipo="local", ativo=True)
+
+    foto = BytesIO()
+    Image.new("RGB", (1600, 1200), "red").save(foto, format="JPEG")
+    payload = {
+        "indicador": indicador.id, "valor_realizado": "100", "ano": 2025, "mes": 8,
+        "arquivo": SimpleUploadedFile("foto.jpg", foto.getvalue(), content_type="image/jpeg"),
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        pk = client.post(reverse("preenchimento-list"), payload, format="multipart").json()["id"]
+
+    data = client.get(reverse("preenchimento-detail", args=[pk])).json()
+    assert data["arquivo_miniatura"].endswith(".miniatura.webp")
+    prova = Preenchimento.objects.get(pk=pk).prova
+    with Image.open(tmp_path / "media" / prova.chave.replace(".jpg", ".miniatura.webp")) as mini:
+        assert (mini.format, max(mini.size)) == ("WEBP", 320)
+
+    historico = client.get(reverse("indicadores-consolidados")).json()[0]["historico"]
+    assert historico[0]["preview"].endswith(".preview.webp")
+
+
+@pytest.mark.django_db
+def test_reprocessar_uploads_so_reenvia_falhos_antigos(settings, tmp_path):
+    import hashlib
+    import os
+    import time
+    from io import StringIO
+    from django.core.management import call_command
+
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.UPLOAD_STAGING_DIR = str(tmp_path / "staging")
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    ConfiguracaoArmazenamento.objects.create(tipo="local", ativo=True)
+    user = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    setor = Setor.objects.create(nome="Financeiro")
+    indicador = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                         periodicidade=1, mes_inicial="2025-01-01")
+    criar = lambda mes, status: Preenchimento.objects.create(
+        indicador=indicador, ano=2025, mes=mes, preenchido_por=user, valor_realizado=1, arquivo_status=status)
+    falho, concluido, em_curso = criar(1, "failed"), criar(2, "done"), criar(3, "pending")
+
+    def staged(nome, minutos_atras, conteudo=b"%PDF-1.4"):
+        caminho = staging / nome
+        caminho.write_bytes(conteudo)
+        antes = time.time() - minutos_atras * 60
+        os.utime(caminho, (antes, antes))
+        return caminho
+
+    substituido = staged(f"{falho.pk}__a.pdf", 120, b"%PDF-1.4 antigo")
+    recente = staged(f"{falho.pk}__b.pdf", 60, b"%PDF-1.4 novo")
+    sobra = staged(f"{concluido.pk}__c.pdf", 60)
+    enviando = staged(f"{em_curso.pk}__d.pdf", 1)
+    sem_commit = staged("999999__e.pdf", 1)  # transação do upload ainda aberta
+    orfao = staged("999998__f.pdf", 60)
+
+    call_command("reprocessar_uploads", stdout=StringIO())
+
+    falho.refresh_from_db()
+    assert falho.arquivo_status == "done"
+    assert falho.prova.sha256 == hashlib.sha256(b"%PDF-1.4 novo").hexdigest()
+    assert not recente.exists()
+    assert enviando.exists() and sem_commit.exists()
+    descartados = staging / "descartados"
+    assert sorted(p.name for p in descartados.iterdir()) == sorted([substituido.name, sobra.name, orfao.name])
+    em_curso.refresh_from_db()
+    assert em_curso.arquivo_status == "pending"
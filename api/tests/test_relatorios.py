@@ -0,0 +1,362 @@
+import re
+import pytest
+from datetime import date
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from api.models import Indicador, Setor, MetaMensal, Preenchimento, FatoMensal, ExportacaoRelatorio
+from api.services.fatos import reconstruir_fatos
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_relatorio_respeita_tipo_meta_e_meta_mensal(django_capture_on_commit_callbacks):
+    client = APIClient()
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    client.force_authenticate(user=master)
+
+    setor = Setor.objects.create(nome="Operações")
+    custo = Indicador.objects.create(nome="Custo", setor=setor, valor_meta=100,
+                                     tipo_meta="decrescente", mes_inicial="2025-01-01")
+    receita = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=100,
+                                       tipo_meta="crescente", mes_inicial="2025-01-01")
+    # Os fatos mensais são atualizados no on_commit
+    with django_capture_on_commit_callbacks(execute=True):
+        MetaMensal.objects.create(indicador=receita, mes=date(2025, 2, 1), valor_meta=200)
+        Preenchimento.objects.create(indicador=custo, ano=2025, mes=1, preenchido_por=master, valor_realizado=80)
+        Preenchimento.objects.create(indicador=custo, ano=2025, mes=2, preenchido_por=master, valor_realizado=120)
+        Preenchimento.objects.create(indicador=receita, ano=2025, mes=1, preenchido_por=master, valor_realizado=150)
+        Preenchimento.objects.create(indicador=receita, ano=2025, mes=2, preenchido_por=master, valor_realizado=150)
+
+    data = client.get(reverse("relatorios")).json()
+
+    assert data["total_registros"] == 4
+    assert data["atingidos"] == 2
+    assert data["nao_atingidos"] == 2
+    por_nome = {d["indicador__nome"]: d for d in data["detalhes_por_indicador"]}
+    assert (por_nome["Custo"]["atingidos"], por_nome["Custo"]["nao_atingidos"]) == (1, 1)
+    # Fevereiro usa a MetaMensal (200), não o valor_meta do indicador
+    assert (por_nome["Receita"]["atingidos"], por_nome["Receita"]["nao_atingidos"]) == (1, 1)
+
+
+@pytest.mark.django_db
+def test_fatos_mensais_incrementais_e_backfill(django_capture_on_commit_callbacks):
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    setor = Setor.objects.create(nome="Operações")
+    ind = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=100,
+                                   tipo_meta="crescente", mes_inicial="2025-01-01")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Preenchimento.objects.create(indicador=ind, ano=2025, mes=3, preenchido_por=master, valor_realizado=90)
+        # placeholder sem valor não gera fato
+        Preenchimento.objects.create(indicador=ind, ano=2025, mes=4, preenchido_por=master)
+
+    fato = FatoMensal.objects.get(indicador=ind)
+    assert (fato.competencia, fato.atingido, fato.variacao) == (date(2025, 3, 1), False, -10)
+
+    # Mudança na meta mensal recalcula apenas a competência afetada
+    with django_capture_on_commit_callbacks(execute=True):
+        MetaMensal.objects.create(indicador=ind, mes=date(2025, 3, 1), valor_meta=80)
+    fato.refresh_from_db()
+    assert (fato.valor_meta, fato.atingido) == (80, True)
+
+    FatoMensal.objects.all().delete()
+    assert reconstruir_fatos(chunk_size=1) == 1
+    assert FatoMensal.objects.get(indicador=ind).atingido is True
+
+    # 'mes' como string (instância criada direto, sem passar por serializer)
+    with django_capture_on_commit_callbacks(execute=True):
+        MetaMensal.objects.filter(indicador=ind).delete()
+        MetaMensal.objects.create(indicador=ind, mes="2025-03-01", valor_meta=95)
+    fato = FatoMensal.objects.get(indicador=ind)
+    assert (fato.valor_meta, fato.atingido) == (95, False)
+
+
+@pytest.mark.django_db
+def test_series_por_indicador_com_media_movel_e_yoy(django_capture_on_commit_callbacks):
+    client = APIClient()
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    client.force_authenticate(user=master)
+    setor = Setor.objects.create(nome="Operações")
+    ind = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=100,
+                                   tipo_meta="crescente", mes_inicial="2024-01-01")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for ano, mes, valor in [(2024, 1, 100), (2024, 2, 50), (2025, 1, 150), (2025, 2, 150)]:
+            Preenchimento.objects.create(indicador=ind, ano=ano, mes=mes, preenchido_por=master,
+                                         valor_realizado=valor)
+
+    data = client.get(reverse("relatorios-series"),
+                      {"nivel": "indicador", "periodo": "mes", "media_movel": 2, "yoy": 1}).json()
+    pontos = {p["periodo"]: p for p in data["series"][0]["pontos"]}
+
+    assert list(pontos) == ["2024-01", "2024-02", "2025-01", "2025-02"]
+    assert pontos["2024-02"]["media_movel"] == 75.0
+    assert pontos["2025-01"]["media_movel"] is None  # 2024-12 sem dado
+    assert pontos["2025-02"]["variacao_yoy"] == 200.0
+    assert pontos["2024-01"]["taxa_atingimento"] == 1.0
+
+    anual = client.get(reverse("relatorios-series"), {"nivel": "setor", "periodo": "ano"}).json()
+    assert [(p["periodo"], p["valor_realizado"]) for p in anual["series"][0]["pontos"]] == [("2024", 150.0), ("2025", 300.0)]
+
+
+@pytest.mark.django_db
+def test_excel_respeita_escopo_do_gestor(django_capture_on_commit_callbacks):
+    from io import BytesIO
+    from openpyxl import load_workbook
+
+    client = APIClient()
+    gestor = User.objects.create_user(email="gestor@empresa.com", password="123", perfil="gestor")
+    client.force_authenticate(user=gestor)
+
+    meu = Setor.objects.create(nome="Financeiro")
+    outro = Setor.objects.create(nome="Marketing")
+    gestor.setores.add(meu)
+    visivel = Indicador.objects.create(nome="Receita", setor=meu, valor_meta=10, tipo_meta="crescente",
+                                       visibilidade=False, mes_inicial="2025-01-01")
+    oculto = Indicador.objects.create(nome="Leads", setor=outro, valor_meta=10, tipo_meta="crescente",
+                                      visibilidade=False, mes_inicial="2025-01-01")
+    with django_capture_on_commit_callbacks(execute=True):
+        for ind in (visivel, oculto):
+            Preenchimento.objects.create(indicador=ind, ano=2025, mes=1, preenchido_por=gestor, valor_realizado=12)
+
+    response = client.get(reverse("relatorio-excel"))
+    assert response.status_code == 200
+    ws = load_workbook(BytesIO(b"".join(response.streaming_content))).active
+    assert [row[0] for row in ws.iter_rows(min_row=2, values_only=True)] == ["Receita"]
+
+
+@pytest.mark.django_db
+def test_pdf_pagina_tabela_longa(django_capture_on_commit_callbacks):
+    from io import BytesIO
+    pypdf = pytest.importorskip("pypdf")
+
+    client = APIClient()
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    client.force_authenticate(user=master)
+
+    setor = Setor.objects.create(nome="Operações")
+    ind = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                   mes_inicial="2020-01-01")
+    with django_capture_on_commit_callbacks(execute=True):
+        for k in range(60):
+            Preenchimento.objects.create(indicador=ind, ano=2020 + k // 12, mes=k % 12 + 1,
+                                         preenchido_por=master, valor_realizado=k)
+
+    response = client.get(reverse("relatorio-pdf"))
+    assert response.status_code == 200
+    # 60 linhas não cabem numa página só
+    paginas = pypdf.PdfReader(BytesIO(b"".join(response.streaming_content))).pages
+    assert len(paginas) == 2
+    assert "Receita (cont.)" in paginas[1].extract_text()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pdf_paralelo_por_setor_so_fora_de_transacao(settings, monkeypatch):
+    from io import BytesIO
+    from django.db import transaction
+    from api.services import reports
+    pypdf = pytest.importorskip("pypdf")
+    settings.REPORT_PDF_PARALELO_MIN_LINHAS = 1
+    settings.REPORT_PDF_WORKERS = 2
+
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    for nome in ("Comercial", "Operações"):
+        setor = Setor.objects.create(nome=nome)
+        ind = Indicador.objects.create(nome=f"KPI {nome}", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                       mes_inicial="2025-01-01")
+        Preenchimento.objects.create(indicador=ind, ano=2025, mes=1, preenchido_por=master, valor_realizado=12)
+
+    # Um processo ('spawn') por setor, concatenados na ordem dos setores
+    destino = BytesIO()
+    reports.escrever_relatorio_pdf(destino, user=master, params={}, paralelo=True)
+    paginas = pypdf.PdfReader(BytesIO(destino.getvalue())).pages
+    assert len(paginas) == 2
+    assert "KPI Comercial" in paginas[0].extract_text() and "KPI Operações" in paginas[1].extract_text()
+
+    # Dentro de transação: em série, sem processos
+    def nao_chamar(*args, **kwargs):
+        raise AssertionError("renderização paralela dentro de transação")
+    monkeypatch.setattr(reports, "_renderizar_pdf_paralelo", nao_chamar)
+    with transaction.atomic():
+        destino = BytesIO()
+        reports.escrever_relatorio_pdf(destino, user=master, params={}, paralelo=True)
+    assert len(pypdf.PdfReader(BytesIO(destino.getvalue())).pages) == 2
+
+
+@pytest.mark.django_db
+def test_relatorio_em_cache_invalida_com_novo_preenchimento(settings, django_capture_on_commit_callbacks,
+                                                            django_assert_num_queries):
+    settings.REPORT_CACHE_ATIVO = True
+    client = APIClient()
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    client.force_authenticate(user=master)
+
+    setor = Setor.objects.create(nome="Operações")
+    ind = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                   mes_inicial="2025-01-01")
+    with django_capture_on_commit_callbacks(execute=True):
+        Preenchimento.objects.create(indicador=ind, ano=2025, mes=1, preenchido_por=master, valor_realizado=12)
+
+    assert client.get(reverse("relatorios"), {"ano": 2025, "mes": ""}).json()["total_registros"] == 1
+    # Mesmos filtros (normalizados) → nenhuma consulta de relatório
+    with django_assert_num_queries(0):
+        assert client.get(reverse("relatorios"), {"ano": "2025"}).json()["total_registros"] == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Preenchimento.objects.create(indicador=ind, ano=2025, mes=2, preenchido_por=master, valor_realizado=8)
+    assert client.get(reverse("relatorios"), {"ano": 2025}).json()["total_registros"] == 2
+
+
+@pytest.mark.django_db
+def test_relatorio_sem_cache_compartilhado_sempre_calcula(settings):
+    from django.core.cache import cache
+    from api.services.cache_relatorios import chave_relatorio
+
+    client = APIClient()
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    client.force_authenticate(user=master)
+
+    settings.REPORT_CACHE_ATIVO = False
+    assert client.get(reverse("relatorios"), {"ano": 2025}).status_code == 200
+    assert cache.get(chave_relatorio("resumo", master, {"ano": "2025"})) is None
+
+    settings.REPORT_CACHE_ATIVO = True
+    client.get(reverse("relatorios"), {"ano": 2025})
+    assert cache.get(chave_relatorio("resumo", master, {"ano": "2025"})) is not None
+
+
+@pytest.mark.django_db
+def test_exportacao_grande_vira_job_compartilhado(settings, tmp_path, django_capture_on_commit_callbacks):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    settings.REPORT_EXPORT_ROOT = str(tmp_path / "exportacoes")
+    settings.REPORT_EXPORT_ASYNC_MIN_LINHAS = 2
+    settings.REPORT_EXPORT_EAGER = True
+
+    client = APIClient()
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    outro_master = User.objects.create_user(email="master2@empresa.com", password="123", perfil="master")
+    setor = Setor.objects.create(nome="Operações")
+    ind = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                   mes_inicial="2025-01-01")
+    with django_capture_on_commit_callbacks(execute=True):
+        for mes in (1, 2, 3):
+            Preenchimento.objects.create(indicador=ind, ano=2025, mes=mes, preenchido_por=master, valor_realizado=12)
+
+    client.force_authenticate(user=master)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.get(reverse("relatorio-excel"), {"ano": 2025})
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "pending"
+
+    # Mesmo escopo e filtros → mesmo job, já concluído
+    client.force_authenticate(user=outro_master)
+    response = client.get(reverse("relatorio-excel"), {"ano": "2025"})
+    assert response.status_code == 202
+    assert response.json()["id"] == job["id"]
+    assert response.json()["status"] == "done"
+    assert response.json()["total_linhas"] == 3
+
+    download = client.get(reverse("relatorio-exportacao-download", args=[job["id"]]))
+    assert download.status_code == 200
+    assert b"".join(download.streaming_content).startswith(b"PK")
+
+    # Fora do MEDIA_ROOT, com nome aleatório; com offload o nginx entrega a location interna
+    arquivo = ExportacaoRelatorio.objects.get(pk=job["id"]).arquivo
+    assert (tmp_path / "exportacoes" / arquivo).is_file() and not (tmp_path / "media").exists()
+    assert re.fullmatch(r"[0-9a-f]{32}\.xlsx", arquivo)
+    settings.ARQUIVOS_OFFLOAD = "x-accel"
+    download = client.get(reverse("relatorio-exportacao-download", args=[job["id"]]))
+    assert download["X-Accel-Redirect"] == f"/_interno/exportacoes/{arquivo}"
+    assert download["Content-Disposition"] == 'attachment; filename="relatorio.xlsx"'
+    client.logout()
+    assert client.get(reverse("relatorio-exportacao-download", args=[job["id"]])).status_code == 401
+    client.force_authenticate(user=outro_master)
+
+    # Abaixo do limite segue síncrono
+    assert client.get(reverse("relatorio-excel"), {"ano": 2025, "mes": 1}).status_code == 200
+
+
+@pytest.mark.django_db
+def test_placeholders_invalidam_relatorios_pelo_recalculo_dos_fatos(django_capture_on_commit_callbacks):
+    from api.services.cache_relatorios import versao_dados
+    from api.services.preenchimentos import criar_placeholders
+
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    setor = Setor.objects.create(nome="Operações")
+    Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                             mes_inicial="2025-01-01")
+    antes = versao_dados()
+
+    # INSERT direto (sem signals): só o recálculo dos fatos avisa o cache
+    with django_capture_on_commit_callbacks(execute=True):
+        assert criar_placeholders(Indicador.objects.all(), master, date(2025, 3, 1)) == 3
+
+    assert FatoMensal.objects.count() == 3
+    assert versao_dados() > antes
+
+
+@pytest.mark.django_db
+def test_job_de_exportacao_versao_persistida_timeout_e_limpeza(settings, tmp_path, django_capture_on_commit_callbacks):
+    from datetime import timedelta
+    from django.core.cache import cache
+    from django.utils.timezone import now
+    from api.services.jobs_relatorios import obter_ou_criar_job, limpar_exportacoes
+
+    settings.REPORT_EXPORT_ROOT = str(tmp_path)
+    settings.REPORT_EXPORT_EAGER = True
+    master = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    setor = Setor.objects.create(nome="Operações")
+    ind = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                   mes_inicial="2025-01-01")
+    with django_capture_on_commit_callbacks(execute=True):
+        Preenchimento.objects.create(indicador=ind, ano=2025, mes=1, preenchido_por=master, valor_realizado=12)
+    with django_capture_on_commit_callbacks(execute=True):
+        antigo = obter_ou_criar_job(master, {"ano": "2025"}, "xlsx")
+    with django_capture_on_commit_callbacks(execute=True):
+        Preenchimento.objects.create(indicador=ind, ano=2025, mes=2, preenchido_por=master, valor_realizado=8)
+    with django_capture_on_commit_callbacks(execute=True):
+        novo = obter_ou_criar_job(master, {"ano": "2025"}, "xlsx")
+    assert novo.pk != antigo.pk
+
+    # Versão vem do banco: cache zerado (reinício/LocMem) não ressuscita o job antigo
+    cache.clear()
+    assert obter_ou_criar_job(master, {"ano": "2025"}, "xlsx").pk == novo.pk
+
+    # Travado além do timeout → falho e redespachado
+    settings.REPORT_EXPORT_EAGER = False
+    with django_capture_on_commit_callbacks(execute=False):
+        travado = obter_ou_criar_job(master, {"ano": "2025"}, "pdf")
+    ExportacaoRelatorio.objects.filter(pk=travado.pk).update(criado_em=now() - timedelta(hours=1))
+    settings.REPORT_EXPORT_EAGER = True
+    with django_capture_on_commit_callbacks(execute=True):
+        refeito = obter_ou_criar_job(master, {"ano": "2025"}, "pdf")
+    assert refeito.pk != travado.pk
+    refeito.refresh_from_db()
+    assert refeito.status == "done"
+    assert ExportacaoRelatorio.objects.get(pk=travado.pk).status == "failed"
+
+    # TTL: jobs e arquivos velhos saem
+    arquivo = ExportacaoRelatorio.objects.get(pk=antigo.pk).arquivo
+    assert (tmp_path / arquivo).is_file()
+    assert limpar_exportacoes(agora=now() + timedelta(hours=25)) == 4
+    assert not ExportacaoRelatorio.objects.exists() and not (tmp_path / arquivo).exists()
+
+
+@pytest.mark.django_db
+def test_renomear_ou_excluir_setor_invalida_relatorios(django_capture_on_commit_callbacks):
+    from api.services.cache_relatorios import versao_dados
+
+    setor = Setor.objects.create(nome="Operações")
+    antes = versao_dados()
+    with django_capture_on_commit_callbacks(execute=True):
+        setor.nome = "Logística"
+        setor.save()
+    renomeado = versao_dados()
+    assert renomeado > antes
+
+    with django_capture_on_commit_callbacks(execute=True):
+        setor.delete()
+    assert versao_dados() > renomeado
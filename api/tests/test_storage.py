@@ -0,0 +1,191 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+from api.models import ConfiguracaoArmazenamento
+from api.services import storage
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_cliente_de_storage_reaproveitado_ate_editar_configuracao(monkeypatch):
+    criados = []
+    monkeypatch.setitem(storage.FABRICAS_CLIENTE, 'aws', lambda cfg: criados.append(cfg.aws_access_key) or object())
+    storage.descartar_clientes()
+
+    cfg = ConfiguracaoArmazenamento.objects.create(
+        tipo="aws", ativo=True, aws_access_key="AK1", aws_secret_key="s", aws_region="sa-east-1", aws_bucket_name="provas",
+    )
+    primeiro = storage.obter_cliente(cfg)
+    assert storage.obter_cliente(ConfiguracaoArmazenamento.objects.get(pk=cfg.pk)) is primeiro
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(email="master@empresa.com", password="123", perfil="master"))
+    response = client.patch(reverse("configuracao-arm-detail", args=[cfg.pk]), {"aws_access_key": "AK2"}, format="json")
+    assert response.status_code == 200
+
+    cfg.refresh_from_db()
+    assert storage.obter_cliente(cfg) is not primeiro
+    assert criados == ["AK1", "AK2"]
+
+
+@pytest.mark.django_db
+def test_configuracao_em_cache_e_invalidada_ao_salvar(django_assert_num_queries):
+    from api.services.configuracoes import configuracao_sistema, permitir_editar_meta_gestor
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(email="master@empresa.com", password="123", perfil="master"))
+
+    assert configuracao_sistema().dia_limite_preenchimento == 10
+    with django_assert_num_queries(0):
+        assert permitir_editar_meta_gestor() is False
+
+    response = client.patch(reverse("configuracao-detail", args=[configuracao_sistema().pk]),
+                            {"permitir_editar_meta_gestor": True}, format="json")
+    assert response.status_code == 200
+    assert permitir_editar_meta_gestor() is True
+
+
+class S3Falso:
+    """Cliente S3 local: guarda as partes recebidas em memória (só p/ testes)."""
+
+    def __init__(self):
+        self.objetos, self.partes = {}, {}
+
+    def put_object(self, Bucket, Key, Body, **extra):
+        self.objetos[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key, **extra):
+        self.partes[Key] = []
+        return {'UploadId': 'u1'}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.partes[Key].append(Body)
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        assert [p['PartNumber'] for p in MultipartUpload['Parts']] == list(range(1, len(self.partes[Key]) + 1))
+        self.objetos[Key] = b"".join(self.partes[Key])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.partes.pop(Key, None)
+
+
+@pytest.mark.django_db
+def test_envio_s3_em_partes_com_sha256(monkeypatch, settings):
+    import hashlib
+    from io import BytesIO
+
+    settings.STORAGE_PARTE_BYTES = 5 * 1024 * 1024
+    falso = S3Falso()
+    monkeypatch.setitem(storage.FABRICAS_CLIENTE, 'aws', lambda cfg: falso)
+    storage.descartar_clientes()
+    cfg = ConfiguracaoArmazenamento.objects.create(
+        tipo="aws", ativo=True, aws_access_key="AK", aws_secret_key="s", aws_region="sa-east-1",
+        aws_bucket_name="provas",
+    )
+
+    conteudo = b"x" * (11 * 1024 * 1024)
+    enviado = storage.enviar_arquivo(BytesIO(conteudo), "planilha.xlsx", cfg)
+
+    assert [len(p) for p in falso.partes[enviado.chave]] == [5 * 1024 * 1024, 5 * 1024 * 1024, 1024 * 1024]
+    assert falso.objetos[enviado.chave] == conteudo
+    assert (enviado.sha256, enviado.tamanho) == (hashlib.sha256(conteudo).hexdigest(), len(conteudo))
+
+    # Arquivo pequeno: um único PUT
+    pequeno = storage.enviar_arquivo(BytesIO(b"%PDF-1.4"), "prova.pdf", cfg)
+    assert falso.objetos[pequeno.chave] == b"%PDF-1.4" and pequeno.chave not in falso.partes
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migrar_armazenamento_local_para_s3_e_retomavel(monkeypatch, settings, tmp_path):
+    from django.core.management import call_command
+    from api.models import Indicador, MigracaoArmazenamentoItem, Preenchimento, Setor
+    from api.services.provas import armazenar_prova
+
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    falso = S3Falso()
+    monkeypatch.setitem(storage.FABRICAS_CLIENTE, 'aws', lambda cfg: falso)
+    storage.descartar_clientes()
+
+    local = ConfiguracaoArmazenamento.objects.create(tipo="local", ativo=False)
+    s3 = ConfiguracaoArmazenamento.objects.create(
+        tipo="aws", ativo=True, aws_access_key="AK", aws_secret_key="s", aws_region="sa-east-1",
+        aws_bucket_name="provas",
+    )
+    user = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    setor = Setor.objects.create(nome="Financeiro")
+    indicador = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                         visibilidade=True, periodicidade=1, mes_inicial="2025-01-01")
+
+    original = tmp_path / "extrato.pdf"
+    original.write_bytes(b"%PDF-1.4 extrato")
+    prova = armazenar_prova(str(original), local)
+    com_prova = [
+        Preenchimento.objects.create(indicador=indicador, mes=m, ano=2025, preenchido_por=user,
+                                     arquivo=prova.url, prova=prova)
+        for m in (1, 2)
+    ]
+    (tmp_path / "media" / "provas" / "antigo.pdf").write_bytes(b"%PDF-1.4 antigo")
+    legado = Preenchimento.objects.create(indicador=indicador, mes=3, ano=2025, preenchido_por=user,
+                                          arquivo="/media/provas/antigo.pdf")
+
+    call_command("migrar_armazenamento", "--origem", str(local.pk), "--dry-run")
+    assert falso.objetos == {}
+
+    call_command("migrar_armazenamento", "--origem", str(local.pk), "--workers", "4", "--lote", "1")
+
+    assert sorted(falso.objetos.values()) == [b"%PDF-1.4 antigo", b"%PDF-1.4 extrato"]
+    for p in com_prova + [legado]:
+        p.refresh_from_db()
+        assert p.arquivo.name.startswith("https://provas.s3.sa-east-1.amazonaws.com/provas/")
+        assert p.prova.armazenamento_id == s3.pk
+    assert com_prova[0].prova_id == com_prova[1].prova_id
+    assert set(MigracaoArmazenamentoItem.objects.values_list("status", flat=True)) == {"concluido"}
+
+    # Retomada: nada mais referencia a origem → nenhuma cópia nova
+    falso.objetos.clear()
+    call_command("migrar_armazenamento", "--origem", str(local.pk))
+    assert falso.objetos == {}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migracao_nao_sobrescreve_prova_enviada_durante_a_copia(monkeypatch, settings, tmp_path):
+    from api.models import Indicador, Preenchimento, Setor
+    from api.services import migracao_armazenamento
+
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    falso = S3Falso()
+    monkeypatch.setitem(storage.FABRICAS_CLIENTE, 'aws', lambda cfg: falso)
+    storage.descartar_clientes()
+
+    local = ConfiguracaoArmazenamento.objects.create(tipo="local", ativo=False)
+    ConfiguracaoArmazenamento.objects.create(
+        tipo="aws", ativo=True, aws_access_key="AK", aws_secret_key="s", aws_region="sa-east-1",
+        aws_bucket_name="provas",
+    )
+    user = User.objects.create_user(email="master@empresa.com", password="123", perfil="master")
+    setor = Setor.objects.create(nome="Financeiro")
+    indicador = Indicador.objects.create(nome="Receita", setor=setor, valor_meta=10, tipo_meta="crescente",
+                                         visibilidade=True, periodicidade=1, mes_inicial="2025-01-01")
+    (tmp_path / "media" / "provas").mkdir(parents=True)
+    (tmp_path / "media" / "provas" / "antigo.pdf").write_bytes(b"%PDF-1.4 antigo")
+    legado = Preenchimento.objects.create(indicador=indicador, mes=3, ano=2025, preenchido_por=user,
+                                          arquivo="/media/provas/antigo.pdf")
+
+    copiar = migracao_armazenamento._copiar
+
+    def copiar_com_reenvio(item, origem, destino):
+        prova = copiar(item, origem, destino)
+        # usuário troca o arquivo enquanto o objeto antigo é copiado
+        Preenchimento.objects.filter(pk=legado.pk).update(arquivo="/media/provas/novo.pdf")
+        return prova
+
+    monkeypatch.setattr(migracao_armazenamento, "_copiar", copiar_com_reenvio)
+    migracao_armazenamento.migrar_armazenamento(local, ConfiguracaoArmazenamento.objects.get(tipo="aws"),
+                                                workers=1)
+
+    legado.refresh_from_db()
+    assert legado.arquivo.name == "/media/provas/novo.pdf"
+    assert legado.prova_id is None
@@ -0,0 +1,73 @@
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+# Campos de arquivo sujeitos ao limite de tamanho das provas
+CAMPOS_PROVA = ('arquivo',)
+
+# Folga para os demais campos do multipart (indicador, valor, comentário...)
+MARGEM_MULTIPART = 64 * 1024
+
+
+def limite_prova() -> int:
+    return int(getattr(settings, 'PROVA_MAX_BYTES', 2 * 1024 * 1024))
+
+
+class LimiteEHashUploadHandler(FileUploadHandler):
+    """
+    Primeiro handler da cadeia, instalado só nas views de prova (LimiteProvaMixin):
+    não guarda nada, só observa os chunks e os repassa aos handlers seguintes (memória/disco).
+
+    - Content-Length muito acima do limite → recusa antes de ler o corpo
+    - Arquivo de prova passou do limite → para de guardar no chunk em que estourou
+    - Calcula o SHA-256 durante o streaming → request.upload_sha256[campo]
+
+    A recusa fica marcada em request.upload_excedido; o serializer responde 400.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.request.upload_sha256 = {}
+        if content_length and content_length > limite_prova() + MARGEM_MULTIPART:
+            # Nem começa a ler o corpo: devolve POST/FILES vazios
+            self.request.upload_excedido = True
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self._monitorar = field_name in CAMPOS_PROVA
+        self._hash = hashlib.sha256()
+        self._lidos = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self._lidos += len(raw_data)
+        if self._monitorar and self._lidos > limite_prova():
+            self._recusar()
+        self._hash.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_sha256'):
+            self.request.upload_sha256 = {}
+        self.request.upload_sha256[self.field_name] = self._hash.hexdigest()
+        return None  # o arquivo em si é montado pelo próximo handler
+
+    def _recusar(self):
+        self.request.upload_excedido = True
+        # Sem reset: o restante do corpo é descartado e o cliente recebe o 400
+        raise StopUpload(connection_reset=False)
+
+
+class LimiteProvaMixin:
+    """
+    Para views que recebem prova: instala o LimiteEHashUploadHandler na
+    requisição antes do parse. Nas demais o upload segue o padrão do Django.
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        if request.method in ('POST', 'PUT', 'PATCH'):
+            request.upload_handlers.insert(0, LimiteEHashUploadHandler(request))
+        return super().initialize_request(request, *args, **kwargs)
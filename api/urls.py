@@ -8,10 +8,16 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from api.views.setores import SetorViewSet
 from api.views.usuarios import UsuarioViewSet
 from api.views.indicadores import IndicadorViewSet, MetaMensalViewSet, IndicadoresConsolidadosView, MetaCreateView
-from api.views.preenchimentos import PreenchimentoViewSet, meus_preenchimentos, indicadores_pendentes
+from api.views.preenchimentos import (
+    PreenchimentoViewSet, meus_preenchimentos, indicadores_pendentes, indicadores_pendentes_contagem,
+)
 from api.views.configuracoes import ConfiguracaoArmazenamentoViewSet, ConfiguracaoViewSet
 from api.views.logs import LogDeAcaoViewSet
-from api.views.relatorios import RelatorioView, relatorio_pdf, relatorio_excel
+from api.views.relatorios import (
+    RelatorioView, SerieTemporalView, relatorio_pdf, relatorio_excel,
+    relatorio_exportacao, relatorio_exportacao_download,
+)
+from api.views.exportacoes import exportar_preenchimentos_csv, exportar_preenchimentos_ndjson
 from api.views.auth import MyTokenObtainPairView, me, meu_usuario, usuario_logado
 
 # -----------------------------
@@ -42,8 +48,16 @@ urlpatterns = [
 
     # Relatórios
     path('relatorios/', RelatorioView.as_view(), name='relatorios'),
+    path('relatorios/series/', SerieTemporalView.as_view(), name='relatorios-series'),
     path('relatorios/pdf/', relatorio_pdf, name='relatorio-pdf'),       # <- usa a view correta
     path('relatorios/excel/', relatorio_excel, name='relatorio-excel'), # <- usa a view correta
+    path('relatorios/exportacoes/<int:pk>/', relatorio_exportacao, name='relatorio-exportacao'),
+    path('relatorios/exportacoes/<int:pk>/download/', relatorio_exportacao_download,
+         name='relatorio-exportacao-download'),
+
+    # Exportações em streaming (BI)
+    path('exportacoes/preenchimentos.csv', exportar_preenchimentos_csv, name='exportar-preenchimentos-csv'),
+    path('exportacoes/preenchimentos.ndjson', exportar_preenchimentos_ndjson, name='exportar-preenchimentos-ndjson'),
 
     # Criação de Meta (não conflita com metas-mensais do router)
     path('metas/', MetaCreateView.as_view(), name='criar-meta'),
@@ -51,6 +65,7 @@ urlpatterns = [
     # Endpoints custom usados pelo frontend
     path('preenchimentos/meus/', meus_preenchimentos, name='meus-preenchimentos'),
     path('indicadores/pendentes/', indicadores_pendentes, name='indicadores-pendentes'),
+    path('indicadores/pendentes/contagem/', indicadores_pendentes_contagem, name='indicadores-pendentes-contagem'),
     path('indicadores/dados-consolidados/', IndicadoresConsolidadosView.as_view(), name='indicadores-consolidados'),
 
     # Por último: rotas dos ViewSets
@@ -1,4 +1,4 @@
 from .logs import registrar_log
-from .normalizers import parse_mes_inicial, normalize_number
+from .normalizers import parse_mes_inicial, parse_competencia, normalize_number
 
-__all__ = ["registrar_log", "parse_mes_inicial", "normalize_number"]
+__all__ = ["registrar_log", "parse_mes_inicial", "parse_competencia", "normalize_number"]
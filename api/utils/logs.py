@@ -1,9 +1,12 @@
-from api.models import LogDeAcao
+from api.services.auditoria import registrar
 
 
-def registrar_log(usuario, acao: str):
+def registrar_log(usuario, acao: str, **campos):
     """
-    Cria um log de ação associado ao usuário.
-    Uso em qualquer ViewSet ou serviço.
+    Registra um log de ação associado ao usuário.
+    Uso em qualquer ViewSet ou serviço. 'campos' preenche as colunas
+    estruturadas (tipo_acao, indicador, setor, competencia, valor).
+    A gravação é adiada para depois do commit e agrupada por
+    requisição/job (ver api.services.auditoria).
     """
-    LogDeAcao.objects.create(usuario=usuario, acao=acao)
+    registrar(usuario, acao, **campos)
@@ -28,6 +28,19 @@ def parse_mes_inicial(v):
     return v
 
 
+def parse_competencia(valor, campo):
+    """'YYYY-MM' ou 'YYYY-MM-DD' → date(ano, mes, 1). Vazio → None. Inválido → ValidationError({campo})."""
+    if not valor:
+        return None
+    try:
+        d = parse_mes_inicial(valor)
+    except ValueError:
+        d = None
+    if not isinstance(d, date):
+        raise serializers.ValidationError({campo: "Use o formato AAAA-MM."})
+    return d
+
+
 def normalize_number(value, field_name="valor"):
     """
     Normaliza número aceitando pt-BR e en-US e PRESERVANDO o sinal negativo.
@@ -12,6 +12,7 @@ from .preenchimentos import (
     PreenchimentoListCreateView,
     meus_preenchimentos,
     indicadores_pendentes,
+    indicadores_pendentes_contagem,
 )
 from .configuracoes import (
     ConfiguracaoViewSet,
@@ -20,8 +21,15 @@ from .configuracoes import (
 from .logs import LogDeAcaoViewSet
 from .relatorios import (
     RelatorioView,
+    SerieTemporalView,
     gerar_relatorio_pdf,
     gerar_relatorio_excel,
+    relatorio_exportacao,
+    relatorio_exportacao_download,
+)
+from .exportacoes import (
+    exportar_preenchimentos_csv,
+    exportar_preenchimentos_ndjson,
 )
 from .auth import (
     MyTokenObtainPairView,
@@ -42,12 +50,18 @@ __all__ = [
     "PreenchimentoListCreateView",
     "meus_preenchimentos",
     "indicadores_pendentes",
+    "indicadores_pendentes_contagem",
     "ConfiguracaoViewSet",
     "ConfiguracaoArmazenamentoViewSet",
     "LogDeAcaoViewSet",
     "RelatorioView",
+    "SerieTemporalView",
     "gerar_relatorio_pdf",
     "gerar_relatorio_excel",
+    "relatorio_exportacao",
+    "relatorio_exportacao_download",
+    "exportar_preenchimentos_csv",
+    "exportar_preenchimentos_ndjson",
     "MyTokenObtainPairView",
     "me",
     "meu_usuario",
@@ -0,0 +1,155 @@
+import os
+import re
+import mimetypes
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from api.services.estaticos import delegar_ao_proxy, nome_imutavel
+
+# Variantes pré-comprimidas, em ordem de preferência
+CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_BLOCO = 64 * 1024
+
+
+# =========================
+#   ARQUIVOS (FRONT E MÍDIA)
+# =========================
+def _cache_control(caminho: str) -> str:
+    if nome_imutavel(caminho):
+        return f"public, max-age={getattr(settings, 'ARQUIVOS_MAX_AGE_IMUTAVEL', 31536000)}, immutable"
+    max_age = getattr(settings, 'ARQUIVOS_MAX_AGE', 0)
+    # Sem hash no nome: o navegador guarda, mas revalida (ETag/Last-Modified → 304)
+    return f"public, max-age={max_age}" if max_age else "no-cache"
+
+
+def _etag(st, sufixo: str = '') -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}{sufixo}"'
+
+
+def _escolher_codificacao(request, completo: str):
+    """('br', caminho.br) / ('gzip', caminho.gz) conforme Accept-Encoding, ou (None, caminho)."""
+    aceitas = {p.split(';')[0].strip().lower() for p in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')}
+    for codificacao, sufixo in CODIFICACOES:
+        if codificacao in aceitas and os.path.isfile(completo + sufixo):
+            return codificacao, completo + sufixo
+    return None, completo
+
+
+def _intervalo(request, tamanho: int, etag: str, last_modified: int):
+    """
+    (inicio, fim) inclusivo do header Range, None para resposta completa ou
+    False se não satisfazível. Só um intervalo por pedido; múltiplos → completo.
+    """
+    cabecalho = request.META.get('HTTP_RANGE', '').strip()
+    if not cabecalho:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None  # representação mudou desde o download parcial: manda inteiro
+
+    m = _RANGE.match(cabecalho)
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if m.group(1):
+        inicio = int(m.group(1))
+        fim = min(int(m.group(2)), tamanho - 1) if m.group(2) else tamanho - 1
+    else:
+        # 'bytes=-N': os últimos N bytes
+        inicio, fim = max(0, tamanho - int(m.group(2))), tamanho - 1
+    if inicio >= tamanho or inicio > fim:
+        return False
+    return inicio, fim
+
+
+def _ler_trecho(caminho: str, inicio: int, quantidade: int):
+    with open(caminho, 'rb') as f:
+        f.seek(inicio)
+        while quantidade > 0:
+            bloco = f.read(min(_BLOCO, quantidade))
+            if not bloco:
+                break
+            quantidade -= len(bloco)
+            yield bloco
+
+
+@require_safe
+def servir_arquivo(request, path, document_root, prefixo_interno=None):
+    """
+    Substitui django.views.static.serve em produção:
+      - Cache-Control longo + immutable para nomes com hash; revalidação para o resto
+      - ETag/Last-Modified com GET condicional (304)
+      - Range de um intervalo (206/416) para downloads retomáveis
+      - variantes .br/.gz pré-comprimidas (Vary: Accept-Encoding)
+      - X-Accel-Redirect/X-Sendfile opcionais: o worker Python não transmite bytes
+    """
+    try:
+        completo = safe_join(os.fspath(document_root), path)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404("Arquivo não encontrado.")
+    if not path or not os.path.isfile(completo) or completo.endswith(tuple(s for _, s in CODIFICACOES)):
+        raise Http404("Arquivo não encontrado.")
+
+    content_type, _ = mimetypes.guess_type(completo)
+    content_type = content_type or 'application/octet-stream'
+    st_original = os.stat(completo)
+    last_modified = int(st_original.st_mtime)
+
+    # Range vale sobre a representação sem compressão
+    codificacao, servido = (None, completo) if request.META.get('HTTP_RANGE') else _escolher_codificacao(request, completo)
+    st = os.stat(servido) if servido != completo else st_original
+    etag = _etag(st, f"-{codificacao}" if codificacao else '')
+
+    cabecalhos = {
+        'Cache-Control': _cache_control(completo),
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Accept-Ranges': 'bytes',
+    }
+
+    def finalizar(response):
+        for nome, valor in cabecalhos.items():
+            response[nome] = valor
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    condicional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if condicional is not None:
+        return finalizar(condicional)
+
+    delegado = delegar_ao_proxy(completo, path, prefixo_interno)
+    if delegado is not None:
+        delegado['Content-Type'] = content_type
+        return finalizar(delegado)
+
+    intervalo = _intervalo(request, st.st_size, etag, last_modified)
+    if intervalo is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{st.st_size}"
+        return finalizar(response)
+
+    if intervalo:
+        inicio, fim = intervalo
+        tamanho = fim - inicio + 1
+        corpo = [] if request.method == 'HEAD' else _ler_trecho(servido, inicio, tamanho)
+        response = StreamingHttpResponse(corpo, status=206, content_type=content_type)
+        response['Content-Range'] = f"bytes {inicio}-{fim}/{st.st_size}"
+    else:
+        tamanho = st.st_size
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+        else:
+            # FileResponse usa wsgi.file_wrapper (sendfile) quando o servidor oferece
+            response = FileResponse(open(servido, 'rb'), content_type=content_type,
+                                    filename=os.path.basename(completo))
+        if codificacao:
+            response['Content-Encoding'] = codificacao
+    response['Content-Length'] = str(tamanho)
+    return finalizar(response)
@@ -1,14 +1,17 @@
 from django.db import IntegrityError
 from rest_framework import viewsets, status
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
 
-from api.models import Configuracao, ConfiguracaoArmazenamento
+from api.models import Configuracao, ConfiguracaoArmazenamento, LogDeAcao
 from api.serializers import (
     ConfiguracaoSerializer,
     ConfiguracaoArmazenamentoSerializer
 )
 from api.utils import registrar_log
+from api.services.storage import descartar_clientes
+from api.services.configuracoes import configuracao_sistema
 from api.permissions import IsMasterOrReadOnly # leitura p/ autenticados, escrita só Master
 
 
@@ -25,6 +28,9 @@ class ConfiguracaoViewSet(viewsets.ModelViewSet):
 
     # 🔸 Garante que SEMPRE exista/retorne a mesma instância (singleton)
     def _ensure_instance(self):
+        # Leitura: instância em cache (sem consulta). Escrita: sempre a do banco.
+        if self.request.method in SAFE_METHODS:
+            return configuracao_sistema()
         obj = self.get_queryset().first()
         if not obj:
             # se nunca foi criado, cria um com defaults
@@ -47,20 +53,20 @@ class ConfiguracaoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         obj = serializer.save()
-        registrar_log(self.request.user, "Atualizou as configurações do sistema (upsert via POST).")
+        registrar_log(self.request.user, "Atualizou as configurações do sistema (upsert via POST).", tipo_acao=LogDeAcao.CONFIGURACAO)
         return Response(self.get_serializer(obj).data, status=status.HTTP_200_OK)
 
     # 🔸 PATCH/PUT mantém logs centralizados e não criam duplicatas
     def perform_update(self, serializer):
         obj = serializer.save()
-        registrar_log(self.request.user, "Atualizou as configurações do sistema.")
+        registrar_log(self.request.user, "Atualizou as configurações do sistema.", tipo_acao=LogDeAcao.CONFIGURACAO)
         return obj
 
     # 🔸 Bloqueia DELETE para evitar ficar sem registro (opcional; remova se quiser permitir)
     def perform_destroy(self, instance):
         # Opcionalmente, você pode impedir a remoção:
         # raise ValidationError({"detail": "Remoção de Configuração não é permitida."})
-        registrar_log(self.request.user, "Removeu as configurações do sistema.")
+        registrar_log(self.request.user, "Removeu as configurações do sistema.", tipo_acao=LogDeAcao.CONFIGURACAO)
         instance.delete()
 
 
@@ -80,7 +86,7 @@ class ConfiguracaoArmazenamentoViewSet(viewsets.ModelViewSet):
                 "ativo": "Já existe uma configuração de armazenamento ativa. "
                          "Desative a atual antes de criar outra."
             }) from e
-        registrar_log(self.request.user, f"Criou configuração de armazenamento ({obj.tipo}).")
+        registrar_log(self.request.user, f"Criou configuração de armazenamento ({obj.tipo}).", tipo_acao=LogDeAcao.CONFIGURACAO)
         return obj
 
     def perform_update(self, serializer):
@@ -91,9 +97,12 @@ class ConfiguracaoArmazenamentoViewSet(viewsets.ModelViewSet):
                 "ativo": "Já existe uma configuração de armazenamento ativa. "
                          "Desative a atual antes de ativar outra."
             }) from e
-        registrar_log(self.request.user, f"Atualizou configuração de armazenamento ({obj.tipo}).")
+        # Credenciais podem ter mudado: o próximo upload recria o cliente
+        descartar_clientes(obj.pk)
+        registrar_log(self.request.user, f"Atualizou configuração de armazenamento ({obj.tipo}).", tipo_acao=LogDeAcao.CONFIGURACAO)
         return obj
 
     def perform_destroy(self, instance):
-        registrar_log(self.request.user, f"Removeu configuração de armazenamento ({instance.tipo}).")
+        registrar_log(self.request.user, f"Removeu configuração de armazenamento ({instance.tipo}).", tipo_acao=LogDeAcao.CONFIGURACAO)
+        descartar_clientes(instance.pk)
         instance.delete()
@@ -0,0 +1,43 @@
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+
+from api.services.exportacoes import linhas_preenchimentos, stream_csv, stream_ndjson
+from api.utils import parse_competencia
+
+
+# =========================
+#   EXPORTAÇÕES PARA BI
+# =========================
+def _linhas_da_requisicao(request):
+    """Filtros: ?desde=AAAA-MM, ?ate=AAAA-MM (inclusivos) e ?setor=<id>."""
+    params = request.query_params
+    desde = parse_competencia(params.get('desde'), 'desde')
+    ate = parse_competencia(params.get('ate'), 'ate')
+    setor = params.get('setor')
+    if setor and not str(setor).isdigit():
+        raise ValidationError({"setor": "Deve ser o ID numérico do setor."})
+    return linhas_preenchimentos(request.user, setor=setor, desde=desde, ate=ate)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exportar_preenchimentos_csv(request):
+    response = StreamingHttpResponse(
+        stream_csv(_linhas_da_requisicao(request)),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'attachment; filename="preenchimentos.csv"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exportar_preenchimentos_ndjson(request):
+    response = StreamingHttpResponse(
+        stream_ndjson(_linhas_da_requisicao(request)),
+        content_type='application/x-ndjson; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'attachment; filename="preenchimentos.ndjson"'
+    return response
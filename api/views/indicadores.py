@@ -1,10 +1,9 @@
 from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
-from django.utils.timezone import make_aware
 from django.conf import settings
 from typing import Optional
-from datetime import date, datetime
+from datetime import date
 from dateutil.relativedelta import relativedelta
 import logging, traceback
 
@@ -15,16 +14,22 @@ from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import PermissionDenied
 
-from api.models import Indicador, Preenchimento, Meta, MetaMensal, PermissaoIndicador
+from api.models import Indicador, LogDeAcao, Preenchimento, Meta, MetaMensal, PermissaoIndicador
 from api.serializers import (
     IndicadorSerializer,
     MetaSerializer,
-    MetaMensalSerializer
+    MetaMensalSerializer,
+    MetaMensalLoteSerializer,
 )
 from api.utils import registrar_log
 from api.permissions import IsMasterUser, HasIndicadorPermission
 from api.utils.periodicidade import mes_alinhado, meses_permitidos
+from api.services.preenchimentos import criar_placeholders, indicadores_gravaveis
+from api.services.metas import MetaResolver, definir_metas_em_lote
+from api.services.configuracoes import permitir_editar_meta_gestor
+from api.services.imagens import url_variante
 
 logger = logging.getLogger(__name__)
 
@@ -115,45 +120,6 @@ def _last_month_first_day(today: Optional[date] = None) -> date:
     t = today or date.today()
     return _first_of_month(t) - relativedelta(months=1)
 
-def _backfill_preenchimentos_zero(indicador, autor):
-    """
-    Cria Preenchimento(valor_realizado=0) apenas nos meses alinhados
-    à periodicidade/âncora, do mes_inicial até (mês atual - 1). Idempotente.
-    """
-    if not getattr(indicador, "mes_inicial", None):
-        return 0
-
-    limite = _last_month_first_day()
-    if limite < _first_of_month(indicador.mes_inicial):
-        return 0
-
-    # (ano, mes) já existentes para este indicador (independente do usuário)
-    existentes = set(
-        Preenchimento.objects.filter(indicador=indicador)
-        .values_list("ano", "mes")
-    )
-
-    # 👇 meses alinhados (YYYY-MM-01) até o limite
-    permitidos = meses_permitidos(indicador, ate=limite)
-
-    to_create = []
-    for d in sorted(permitidos):
-        chave = (d.year, d.month)
-        if chave not in existentes:
-            to_create.append(Preenchimento(
-                indicador=indicador,
-                ano=d.year,
-                mes=d.month,
-                valor_realizado=0,
-                preenchido_por=autor,
-                data_preenchimento=make_aware(datetime(d.year, d.month, 1, 0, 0, 0)),
-                origem="backfill-auto",
-            ))
-
-    if to_create:
-        Preenchimento.objects.bulk_create(to_create, ignore_conflicts=True)
-    return len(to_create)
-
 # =========================
 #       INDICADORES
 # =========================
@@ -223,7 +189,8 @@ class IndicadorViewSet(viewsets.ModelViewSet):
             indicador = serializer.save()
             indicador = Indicador.objects.select_related('setor').get(pk=indicador.pk)
             data = self.get_serializer(indicador).data
-            registrar_log(request.user, f"Cadastrou o indicador '{data.get('nome')}'")
+            registrar_log(request.user, f"Cadastrou o indicador '{data.get('nome')}'",
+                          tipo_acao=LogDeAcao.INDICADOR_CRIADO, indicador=indicador)
             headers = self.get_success_headers(serializer.validated_data)
             return Response(data, status=status.HTTP_201_CREATED, headers=headers)
         except serializers.ValidationError:
@@ -240,15 +207,18 @@ class IndicadorViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(indicador, data=request.data, partial=parcial)
         serializer.is_valid(raise_exception=True)
         indicador_atualizado = serializer.save()
-        registrar_log(request.user, f"Editou o indicador '{nome_anterior}'")
+        registrar_log(request.user, f"Editou o indicador '{nome_anterior}'",
+                      tipo_acao=LogDeAcao.INDICADOR_EDITADO, indicador=indicador_atualizado)
         indicador_atualizado = Indicador.objects.select_related('setor').get(pk=indicador_atualizado.pk)
         return Response(self.get_serializer(indicador_atualizado).data)
 
     def destroy(self, request, *args, **kwargs):
         indicador = self.get_object()
-        nome = indicador.nome
+        nome, indicador_id, setor_id = indicador.nome, indicador.pk, indicador.setor_id
         indicador.delete()
-        registrar_log(request.user, f"Excluiu o indicador '{nome}'")
+        registrar_log(request.user, f"Excluiu o indicador '{nome}'",
+                      tipo_acao=LogDeAcao.INDICADOR_EXCLUIDO, indicador=indicador_id, setor=setor_id,
+                      indicador_nome=nome)
         return Response({"detail": "Indicador excluído com sucesso."}, status=status.HTTP_204_NO_CONTENT)
     
     @action(detail=False, methods=['POST'], url_path='backfill-zeros', permission_classes=[IsAuthenticated])
@@ -259,19 +229,11 @@ class IndicadorViewSet(viewsets.ModelViewSet):
         os meses retroativos SEM preenchimento com valor_realizado=0, até (mês atual - 1).
         Assina com o usuário autenticado que chamou a ação.
         """
-        usuario = request.user
-        criados_total = 0
-
         qs = Indicador.objects.filter(ativo=True).exclude(mes_inicial__isnull=True)
         # Se quiser restringir ao escopo do usuário (gestor), pode reusar a mesma lógica do get_queryset()
         # qs = self.get_queryset().filter(ativo=True).exclude(mes_inicial__isnull=True)
 
-        for ind in qs.select_related('setor'):
-            try:
-                criados = _backfill_preenchimentos_zero(ind, usuario)
-                criados_total += criados
-            except Exception:
-                logger.exception("Falha no backfill do indicador id=%s", ind.id)
+        criados_total = criar_placeholders(qs, request.user, ate=_last_month_first_day())
 
         return Response({"detail": "Backfill concluído.", "criados": criados_total}, status=200)
 
@@ -289,7 +251,7 @@ class IndicadoresConsolidadosView(APIView):
             qs_ind = (
                 Indicador.objects
                 .select_related("setor")
-                .prefetch_related("metas_mensais", "preenchimentos")
+                .prefetch_related("metas_mensais", "preenchimentos", "preenchimentos__prova")
             )
 
             if getattr(usuario, "perfil", None) == "gestor":
@@ -304,6 +266,14 @@ class IndicadoresConsolidadosView(APIView):
                 ).distinct()
 
             dados = []
+            qs_ind = list(qs_ind)
+
+            # Metas de todas as competências preenchidas (MetaMensal → fallback valor_meta) numa consulta
+            metas = MetaResolver.da_requisicao(request)
+            metas.carregar(
+                (indicador.id, date(p.ano, p.mes, 1))
+                for indicador in qs_ind for p in indicador.preenchimentos.all()
+            )
 
             for indicador in qs_ind:
                 try:
@@ -316,20 +286,14 @@ class IndicadoresConsolidadosView(APIView):
                     preenchimentos = sorted(preenchimentos, key=lambda p: _ts_or_0(p.data_preenchimento))
                     ultimo = preenchimentos[-1] if preenchimentos else None
 
-                    # metas_dict (ignora None)
-                    metas_dict = {}
                     # 👇 calcule meses alinhados até HOJE (ou use um "horizonte" se preferir)
                     permitidos = meses_permitidos(indicador, ate=date.today())
 
-                    for m in indicador.metas_mensais.all():
-                        mes_m = getattr(m, "mes", None)
-                        if not mes_m:
-                            continue
-                        if _first_of_month(mes_m) not in permitidos:
-                            continue  # ignora metas desalinhadas
-                        k = _ym_key(mes_m)
-                        if k:
-                            metas_dict[k] = _to_float(m.valor_meta)
+                    def meta_do_mes(competencia):
+                        # MetaMensal só vale em mês do calendário até hoje; fora dele, valor_meta
+                        if competencia in permitidos:
+                            return metas.meta(indicador.id, competencia)
+                        return indicador.valor_meta
 
                     valor_atual = None
                     atingido = False
@@ -358,8 +322,7 @@ class IndicadoresConsolidadosView(APIView):
                         if origem and str(origem).startswith(("http://", "https://")):
                             provas.append(origem)
 
-                        chave_meta = f"{ultimo.ano}-{str(ultimo.mes).zfill(2)}"
-                        valor_meta_atual = metas_dict.get(chave_meta, valor_meta_atual)
+                        valor_meta_atual = _to_float(meta_do_mes(date(ultimo.ano, ultimo.mes, 1)))
 
                     v_atual = _to_float(valor_atual)
                     v_meta = _to_float(valor_meta_atual)
@@ -379,10 +342,10 @@ class IndicadoresConsolidadosView(APIView):
                     historico = []
                     for p in preenchimentos:
                         try:
-                            chave_meta = f"{p.ano}-{str(p.mes).zfill(2)}"
-                            meta_val = metas_dict.get(chave_meta, _to_float(indicador.valor_meta))
+                            meta_val = meta_do_mes(date(p.ano, p.mes, 1))
 
                             arq_url = _safe_file_url(request, getattr(p, "arquivo", None))
+                            prova = getattr(p, "prova", None)
                             urls_provas = []
                             if arq_url:
                                 urls_provas.append(arq_url)
@@ -400,6 +363,9 @@ class IndicadoresConsolidadosView(APIView):
                                 "ano": p.ano,
                                 "meta": _to_float(meta_val),
                                 "provas": urls_provas,
+                                # Variantes WebP leves p/ os cards (None se não for imagem)
+                                "preview": url_variante(request, getattr(prova, "preview_url", "")),
+                                "miniatura": url_variante(request, getattr(prova, "miniatura_url", "")),
                             })
                         except Exception:
                             logger.exception("Falha ao montar histórico (preenchimento id=%s)", getattr(p, "id", None))
@@ -476,3 +442,36 @@ class MetaMensalViewSet(viewsets.ModelViewSet):
     filterset_fields = ['indicador', 'mes']
     ordering_fields = ['mes']
     ordering = ['mes']
+
+    @action(detail=False, methods=['POST'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Define várias metas mensais de uma vez (upsert em um único comando),
+        em vez de um PATCH/POST por mês. Ver MetaMensalLoteSerializer.
+        """
+        if getattr(request.user, 'perfil', None) != 'master' and not permitir_editar_meta_gestor():
+            raise PermissionDenied("Edição de metas restrita ao master.")
+
+        entrada = MetaMensalLoteSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        itens = entrada.validated_data['itens']
+
+        if getattr(request.user, 'perfil', None) != 'master':
+            # Gestor: só indicadores dos seus setores ou liberados manualmente (PermissaoIndicador)
+            pedidos = {indicador_id for indicador_id, _, _ in itens}
+            negados = pedidos - indicadores_gravaveis(request.user, pedidos, incluir_publicos=False)
+            if negados:
+                raise PermissionDenied(
+                    f"Sem permissão para definir metas dos indicadores: {', '.join(map(str, sorted(negados)))}."
+                )
+
+        linhas = definir_metas_em_lote(itens)
+
+        registrar_log(request.user, f"Definiu {len(linhas)} metas mensais em lote", tipo_acao=LogDeAcao.METAS_EM_LOTE)
+        return Response({
+            "atualizadas": len(linhas),
+            "metas": [
+                {"id": pk, "indicador": indicador_id, "mes": _ymd(mes), "valor_meta": _to_float(valor)}
+                for pk, indicador_id, mes, valor in linhas
+            ],
+        }, status=200)
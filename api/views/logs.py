@@ -1,8 +1,9 @@
+from django.db.models import Q
 from django.utils.dateparse import parse_date
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 
-from api.models import LogDeAcao
+from api.models import Indicador, LogDeAcao
 from api.serializers import LogDeAcaoSerializer
 
 
@@ -41,7 +42,7 @@ class LogDeAcaoViewSet(viewsets.ReadOnlyModelViewSet):
 
         if setor and setor != "todos":
             try:
-                qs = qs.filter(usuario__setores__id=int(setor)).distinct()
+                qs = qs.filter(setor_id=int(setor))  # setor do registro (índice setor+data)
             except (TypeError, ValueError):
                 return LogDeAcao.objects.none()
 
@@ -54,8 +55,32 @@ class LogDeAcaoViewSet(viewsets.ReadOnlyModelViewSet):
             if fim:
                 qs = qs.filter(data__date__lte=fim)
 
-        # 🔹 NOVO: filtro textual no campo 'acao' (onde o nome do indicador aparece nos logs)
+        # 🔹 Colunas estruturadas (índices por tipo/indicador/competência)
+        indicador_param = self.request.query_params.get('indicador')
+        tipo_acao = self.request.query_params.get('tipo_acao')
+        competencia = self.request.query_params.get('competencia')
+
+        if indicador_param:
+            try:
+                qs = qs.filter(indicador_id=int(indicador_param))
+            except (TypeError, ValueError):
+                return LogDeAcao.objects.none()
+        if tipo_acao:
+            qs = qs.filter(tipo_acao=tipo_acao)
+        if competencia:
+            comp = parse_date(f"{competencia[:7]}-01")
+            if not comp:
+                return LogDeAcao.objects.none()
+            qs = qs.filter(competencia=comp)
+
+        # Nome atual → ids na tabela (pequena) de indicadores; nome da época → indicador_nome
+        # (excluídos/renomeados). Logs antigos ainda não estruturados (tipo_acao '') seguem pelo texto
         if indicador_nome:
-            qs = qs.filter(acao__icontains=indicador_nome)
+            ids = list(Indicador.objects.filter(nome__icontains=indicador_nome).values_list('id', flat=True))
+            qs = qs.filter(
+                Q(indicador_id__in=ids) |
+                Q(indicador_nome__icontains=indicador_nome) |
+                Q(tipo_acao='', acao__icontains=indicador_nome)
+            )
 
         return qs.order_by("-data")
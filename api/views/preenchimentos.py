@@ -3,8 +3,7 @@ from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 from django.utils.timezone import make_aware, now
 from django.db import IntegrityError
-from django.db.models import F, Q, Exists, OuterRef
-from django.db.models.functions import ExtractMonth, ExtractYear
+from django.db.models import F, Q, Exists, OuterRef, Func, Value, Count, DateField
 from rest_framework.exceptions import ValidationError
 
 from rest_framework import viewsets, generics, status, serializers
@@ -14,25 +13,31 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
 
-from api.models import Preenchimento, ConfiguracaoArmazenamento, Indicador, MetaMensal, PermissaoIndicador
-from api.serializers import PreenchimentoSerializer
-from api.utils import registrar_log
-from api.services.storage import upload_arquivo
+from api.models import Preenchimento, Indicador, LogDeAcao, MetaMensal, PermissaoIndicador
+from api.serializers import PreenchimentoSerializer, PreenchimentoSlimSerializer
+from api.utils import registrar_log, parse_competencia
+from api.services.uploads import enfileirar_upload
+from api.services.configuracoes import armazenamento_ativo
+from api.services.preenchimentos import indicadores_gravaveis, resolver_ids_em_lote
+from api.upload_handlers import LimiteProvaMixin
 
 
 # =========================
 #     PREENCHIMENTOS
 # =========================
-class PreenchimentoViewSet(viewsets.ModelViewSet):
+class PreenchimentoViewSet(LimiteProvaMixin, viewsets.ModelViewSet):
     queryset = (
         Preenchimento.objects
         .all()
-        .select_related('indicador', 'indicador__setor', 'preenchido_por')
+        .select_related('indicador', 'indicador__setor', 'preenchido_por', 'prova')
     )
     serializer_class = PreenchimentoSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
+    # Limite de competências por chamada em lote do resolve-id
+    RESOLVE_IDS_MAX_ITENS = 2000
+
     # ===== Helpers de mês =====
     def _first_of_month(self, d: date) -> date:
         return date(d.year, d.month, 1)
@@ -178,6 +183,20 @@ class PreenchimentoViewSet(viewsets.ModelViewSet):
         if not self._user_can_write_on(usuario, indicador):
             raise PermissionDenied("Você não tem permissão para preencher este indicador.")
 
+        # Upload/arquivo e origem
+        arquivo = self.request.FILES.get('arquivo')
+        origem = self.request.data.get('origem') or 'manual'
+        storage_cfg = armazenamento_ativo()
+
+        if arquivo and storage_cfg:
+            import os
+            ext_permitidas = ['.pdf', '.jpg', '.jpeg', '.png', '.xlsx']
+            _, ext = os.path.splitext(arquivo.name.lower())
+            if ext not in ext_permitidas:
+                raise serializers.ValidationError(f"Extensão de arquivo não permitida: {ext}")
+            # O arquivo segue pelo pipeline assíncrono; não deixa o FileField gravá-lo no save()
+            serializer.validated_data.pop('arquivo', None)
+
         try:
             preenchimento = serializer.save(preenchido_por=usuario)
         except IntegrityError as e:
@@ -192,24 +211,14 @@ class PreenchimentoViewSet(viewsets.ModelViewSet):
 
         # Se tem valor, é confirmado; se ficar sem valor (None), permanece pendente
         preenchimento.confirmado = (preenchimento.valor_realizado is not None)
-
-        # Upload/arquivo e origem
-        arquivo = self.request.FILES.get('arquivo')
-        origem = self.request.data.get('origem') or 'manual'
-        storage_cfg = ConfiguracaoArmazenamento.objects.filter(ativo=True).first()
-
-        if arquivo and storage_cfg:
-            import os
-            ext_permitidas = ['.pdf', '.jpg', '.jpeg', '.png', '.xlsx']
-            _, ext = os.path.splitext(arquivo.name.lower())
-            if ext not in ext_permitidas:
-                raise serializers.ValidationError(f"Extensão de arquivo não permitida: {ext}")
-            url_arquivo = upload_arquivo(arquivo, arquivo.name, storage_cfg)
-            preenchimento.arquivo = url_arquivo
-
         preenchimento.origem = origem
         preenchimento.save()
 
+        # Staging local + envio em background (responde sem esperar o backend remoto)
+        if arquivo and storage_cfg:
+            sha256 = (getattr(self.request, 'upload_sha256', None) or {}).get('arquivo')
+            enfileirar_upload(preenchimento, arquivo, storage_cfg, sha256=sha256)
+
         # Loga somente se houve valor (deixou de ser pendente)
         if preenchimento.valor_realizado is not None:
             self._registrar_log_preenchimento(preenchimento, usuario, acao="preencheu")
@@ -222,8 +231,10 @@ class PreenchimentoViewSet(viewsets.ModelViewSet):
         if not self._user_can_write_on(usuario, indicador_alvo):
             raise PermissionDenied("Você não tem permissão para alterar este preenchimento.")
 
+        # Arquivo substituído direto no FileField: deixa de apontar para a prova deduplicada
+        extra = {'prova': None} if 'arquivo' in serializer.validated_data else {}
         try:
-            preenchimento = serializer.save(preenchido_por=usuario)
+            preenchimento = serializer.save(preenchido_por=usuario, **extra)
         except IntegrityError as e:
             raise serializers.ValidationError(
                 {"detail": "Já existe preenchimento para este indicador/mês/ano por este usuário."}
@@ -241,7 +252,9 @@ class PreenchimentoViewSet(viewsets.ModelViewSet):
         registrar_log(
             self.request.user,
             f"Excluiu preenchimento do indicador '{instance.indicador.nome}' "
-            f"do mês {str(instance.mes).zfill(2)}/{instance.ano}."
+            f"do mês {str(instance.mes).zfill(2)}/{instance.ano}.",
+            tipo_acao=LogDeAcao.PREENCHIMENTO_EXCLUIDO, indicador=instance.indicador,
+            competencia=instance.competencia_primeiro_dia, valor=instance.valor_realizado,
         )
         instance.delete()
 
@@ -263,7 +276,11 @@ class PreenchimentoViewSet(viewsets.ModelViewSet):
             f"{(usuario.first_name or usuario.email)} {acao} "
             f"o indicador '{nome_indicador}' com {valor_formatado} referente a {mes}/{ano}"
         )
-        registrar_log(usuario, mensagem)
+        registrar_log(
+            usuario, mensagem,
+            tipo_acao=LogDeAcao.PREENCHIMENTO_CRIADO if acao == "preencheu" else LogDeAcao.PREENCHIMENTO_ATUALIZADO,
+            indicador=preenchimento.indicador, competencia=preenchimento.competencia_primeiro_dia, valor=valor,
+        )
 
     @action(detail=False, methods=['get'], url_path='pendentes')
     def pendentes_action(self, request):
@@ -287,7 +304,13 @@ class PreenchimentoViewSet(viewsets.ModelViewSet):
         """
         Retorna o ID do Preenchimento do usuário para (indicador, ano, mes).
         Se não existir, cria um pendente (sem valor) e retorna o ID.
+
+        Modo lote: envie {"itens": [{"indicador", "ano", "mes"}, ...]} para resolver
+        a grade inteira numa só chamada → {"itens": [{"indicador", "ano", "mes", "id"}, ...]}.
         """
+        if 'itens' in request.data:
+            return self._resolve_ids_em_lote(request)
+
         try:
             indicador_id = int(request.data.get('indicador'))
             ano = int(request.data.get('ano'))
@@ -320,10 +343,46 @@ class PreenchimentoViewSet(viewsets.ModelViewSet):
         )
         return Response({'id': obj.id}, status=status.HTTP_200_OK)
 
+    def _resolve_ids_em_lote(self, request):
+        itens = request.data.get('itens')
+        if not isinstance(itens, list) or not itens:
+            raise ValidationError("'itens' deve ser uma lista não vazia de {indicador, ano, mes}.")
+        if len(itens) > self.RESOLVE_IDS_MAX_ITENS:
+            raise ValidationError(f"Máximo de {self.RESOLVE_IDS_MAX_ITENS} itens por requisição.")
+
+        chaves = []
+        for item in itens:
+            try:
+                chave = (int(item.get('indicador')), int(item.get('ano')), int(item.get('mes')))
+            except (AttributeError, TypeError, ValueError):
+                raise ValidationError("Cada item precisa de 'indicador', 'ano' e 'mes' numéricos.")
+            if not (1 <= chave[2] <= 12) or not (1900 <= chave[1] <= 2100):
+                raise ValidationError("Competência inválida (mes 1..12, ano 1900..2100).")
+            chaves.append(chave)
+
+        # Permissão checada uma única vez para todos os indicadores do lote
+        ids_pedidos = {c[0] for c in chaves}
+        permitidos = indicadores_gravaveis(request.user, ids_pedidos)
+        negados = ids_pedidos - permitidos
+        if negados:
+            if Indicador.objects.filter(pk__in=negados).count() != len(negados):
+                raise ValidationError("Indicador inválido.")
+            raise PermissionDenied("Você não tem permissão para preencher este indicador.")
+
+        origem = (request.data.get('origem') or 'manual')
+        resolvidos = resolver_ids_em_lote(request.user, chaves, origem=origem)
+
+        return Response({
+            'itens': [
+                {'indicador': i, 'ano': a, 'mes': m, 'id': resolvidos.get((i, a, m))}
+                for (i, a, m) in dict.fromkeys(chaves)
+            ]
+        }, status=status.HTTP_200_OK)
+
 # =========================
 #  LIST/CREATE auxiliares
 # =========================
-class PreenchimentoListCreateView(generics.ListCreateAPIView):
+class PreenchimentoListCreateView(LimiteProvaMixin, generics.ListCreateAPIView):
     queryset = Preenchimento.objects.all()
     serializer_class = PreenchimentoSerializer
     permission_classes = [IsAuthenticated]
@@ -354,17 +413,103 @@ class PreenchimentoListCreateView(generics.ListCreateAPIView):
 # =========================
 #  ENDPOINTS AUXILIARES
 # =========================
+MEUS_PREENCHIMENTOS_LIMITE_PADRAO = 500
+MEUS_PREENCHIMENTOS_LIMITE_MAX = 2000
+
+
+def _decode_cursor(cursor):
+    """Cursor keyset 'ano-mes-id' (a última linha da página anterior)."""
+    try:
+        ano, mes, pk = (int(x) for x in cursor.split('-'))
+    except (AttributeError, ValueError):
+        raise ValidationError({"cursor": "Cursor inválido."})
+    return ano, mes, pk
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def meus_preenchimentos(request):
-    preenchimentos = (
+    """
+    Preenchimentos do usuário, do mais recente ao mais antigo (competência desc).
+    - ?desde=AAAA-MM / ?ate=AAAA-MM → janela de competência (inclusiva)
+    - ?limite=N (padrão 500, máx. 2000)
+    - paginação keyset por (ano, mes, id): siga 'next' / '?cursor=' até vir null
+    """
+    params = request.query_params
+    desde = parse_competencia(params.get('desde'), 'desde')
+    ate = parse_competencia(params.get('ate'), 'ate')
+
+    try:
+        limite = int(params.get('limite') or MEUS_PREENCHIMENTOS_LIMITE_PADRAO)
+    except ValueError:
+        raise ValidationError({"limite": "Deve ser inteiro."})
+    limite = max(1, min(limite, MEUS_PREENCHIMENTOS_LIMITE_MAX))
+
+    qs = Preenchimento.objects.filter(preenchido_por=request.user)
+    if desde:
+        qs = qs.filter(Q(ano__gt=desde.year) | Q(ano=desde.year, mes__gte=desde.month))
+    if ate:
+        qs = qs.filter(Q(ano__lt=ate.year) | Q(ano=ate.year, mes__lte=ate.month))
+
+    cursor = params.get('cursor')
+    if cursor:
+        c_ano, c_mes, c_id = _decode_cursor(cursor)
+        qs = qs.filter(
+            Q(ano__lt=c_ano) |
+            Q(ano=c_ano, mes__lt=c_mes) |
+            Q(ano=c_ano, mes=c_mes, id__lt=c_id)
+        )
+
+    linhas = list(
+        qs.order_by('-ano', '-mes', '-id')
+        .values(*PreenchimentoSlimSerializer.SLIM_FIELDS)[:limite + 1]
+    )
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    next_cursor = None
+    next_url = None
+    if tem_mais:
+        ultima = linhas[-1]
+        next_cursor = f"{ultima['ano']}-{ultima['mes']}-{ultima['id']}"
+        q = params.copy()
+        q['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{q.urlencode()}")
+
+    return Response({
+        "next": next_url,
+        "cursor": next_cursor,
+        "results": PreenchimentoSlimSerializer(linhas, many=True).data,
+    })
+
+
+def _competencia_preenchimento():
+    """Chave de competência do Preenchimento: make_date(ano, mes, 1) — compara direto com MetaMensal.mes."""
+    return Func(F('ano'), F('mes'), Value(1), function='MAKE_DATE', output_field=DateField())
+
+
+def _metas_pendentes_qs(usuario):
+    """
+    MetaMensal (competências previstas) SEM Preenchimento confirmado, para os
+    indicadores ativos visíveis ao usuário. Um único anti-join (NOT EXISTS)
+    sobre a chave (indicador_id, competência) — sem Extract no lado externo.
+    """
+    metas = MetaMensal.objects.filter(indicador__ativo=True)
+    if getattr(usuario, "perfil", None) != 'master':
+        perm_subq = PermissaoIndicador.objects.filter(usuario=usuario, indicador=OuterRef('indicador_id'))
+        metas = metas.filter(
+            Q(indicador__setor__in=usuario.setores.all()) |
+            Q(indicador__visibilidade=True) |
+            Exists(perm_subq)
+        )
+
+    confirmados = (
         Preenchimento.objects
-        .filter(preenchido_por=request.user)
-        .select_related('indicador', 'indicador__setor')
-        .order_by('-data_preenchimento')
+        .filter(confirmado=True, indicador_id=OuterRef('indicador_id'))
+        .annotate(competencia=_competencia_preenchimento())
+        .filter(competencia=OuterRef('mes'))
     )
-    serializer = PreenchimentoSerializer(preenchimentos, many=True, context={"request": request})
-    return Response(serializer.data)
+    return metas.filter(~Exists(confirmados))
 
 
 @api_view(['GET'])
@@ -374,51 +519,65 @@ def indicadores_pendentes(request):
     Lista pendências com base EXCLUSIVAMENTE nas metas existentes (MetaMensal),
     respeitando o intervalo que foi criado no serializer (mes_inicial..mes_final).
     Não cria meses automaticamente até 'hoje'.
-    """
-    usuario = request.user
 
-    # 1) Indicadores ativos e visíveis ao usuário (ou concedidos via permissão manual)
-    indicadores = Indicador.objects.filter(ativo=True)
-    if getattr(usuario, "perfil", None) != 'master':
-        perm_subq = PermissaoIndicador.objects.filter(usuario=usuario, indicador=OuterRef('pk'))
-        indicadores = indicadores.filter(
-            Q(setor__in=usuario.setores.all()) | Q(visibilidade=True) | Exists(perm_subq)
+    ?resumo=1 → apenas contagens agrupadas por setor e por competência.
+    """
+    pendentes_qs = _metas_pendentes_qs(request.user)
+
+    if str(request.query_params.get('resumo')).lower() in ('1', 'true', 't', 'yes', 'y'):
+        por_setor = list(
+            pendentes_qs
+            .values('indicador__setor_id', 'indicador__setor__nome')
+            .annotate(total=Count('id'))
+            .order_by('indicador__setor__nome')
         )
+        por_mes = (
+            pendentes_qs
+            .values('mes')
+            .annotate(total=Count('id'))
+            .order_by('mes')
+        )
+        return Response({
+            "total": sum(r['total'] for r in por_setor),
+            "por_setor": [
+                {"setor": r['indicador__setor_id'], "setor_nome": r['indicador__setor__nome'], "total": r['total']}
+                for r in por_setor
+            ],
+            "por_mes": [
+                {"ano": r['mes'].year, "mes": r['mes'].month, "total": r['total']}
+                for r in por_mes
+            ],
+        })
 
-    # 2) Metas já criadas são a 'fonte da verdade' do range
-    metas = (
-        MetaMensal.objects
-        .select_related('indicador', 'indicador__setor')
-        .filter(indicador__in=indicadores)
-    )
-
-    # 3) Verifica se há Preenchimento correspondente por competência
-    preench_qs = Preenchimento.objects.filter(
-        indicador_id=OuterRef('indicador_id'),
-        mes=ExtractMonth(OuterRef('mes')),
-        ano=ExtractYear(OuterRef('mes')),
-        confirmado=True
-    )
-
-    metas_sem_preenchimento = (
-        metas
-        .annotate(tem_preenchimento=Exists(preench_qs))
-        .filter(tem_preenchimento=False)
+    linhas = (
+        pendentes_qs
         .order_by('indicador_id', 'mes')
+        .values(
+            'indicador_id', 'mes',
+            'indicador__nome', 'indicador__tipo_valor', 'indicador__extracao_indicador',
+            'indicador__setor_id', 'indicador__setor__nome',
+        )
     )
 
-    # 4) Monta o payload esperado pelo front
-    pendentes = []
-    for m in metas_sem_preenchimento:
-        pendentes.append({
-            "id": m.indicador_id,
-            "nome": m.indicador.nome,
-            "mes": m.mes.month,
-            "ano": m.mes.year,
-            "tipo_valor": m.indicador.tipo_valor,
-            "descricao": m.indicador.extracao_indicador or "",
-            "setor": m.indicador.setor_id,
-            "setor_nome": m.indicador.setor.nome,
-        })
-
+    # Payload esperado pelo front
+    pendentes = [
+        {
+            "id": r['indicador_id'],
+            "nome": r['indicador__nome'],
+            "mes": r['mes'].month,
+            "ano": r['mes'].year,
+            "tipo_valor": r['indicador__tipo_valor'],
+            "descricao": r['indicador__extracao_indicador'] or "",
+            "setor": r['indicador__setor_id'],
+            "setor_nome": r['indicador__setor__nome'],
+        }
+        for r in linhas
+    ]
     return Response(pendentes)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def indicadores_pendentes_contagem(request):
+    """Total de competências pendentes (badge da navbar): um único COUNT."""
+    return Response({"total": _metas_pendentes_qs(request.user).count()})
@@ -1,12 +1,25 @@
-from django.db.models import F, Q, Count, Exists, OuterRef, Subquery, IntegerField, Sum, Case, When
-from django.db.models.functions import ExtractMonth, ExtractYear, Coalesce
+import mimetypes
+
+from django.conf import settings
+from django.db.models import Q, Count
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError, NotFound
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 
-from api.models import Preenchimento, Indicador, PermissaoIndicador, MetaMensal
-from api.services.reports import gerar_relatorio_pdf, gerar_relatorio_excel
+from api.services.reports import gerar_relatorio_pdf, gerar_relatorio_excel, _build_fatos_queryset
+from api.services.series import montar_series, NIVEIS, PERIODOS, AGREGACOES
+from api.services.cache_relatorios import obter_ou_calcular, hash_escopo
+from api.services.jobs_relatorios import exportacao_em_segundo_plano, storage_exportacoes
+from api.services.estaticos import delegar_ao_proxy
+from api.models import ExportacaoRelatorio
+from api.serializers import ExportacaoRelatorioSerializer
+from api.utils import parse_competencia
 
 
 # =========================
@@ -20,114 +33,170 @@ class RelatorioView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        setor = request.query_params.get('setor')
-        mes = request.query_params.get('mes')
-        ano = request.query_params.get('ano')
-        indicador = request.query_params.get('indicador')
-
-        # Base otimizada
-        preenchimentos = (
-            Preenchimento.objects
-            .select_related('indicador', 'indicador__setor')
-            .all()
+        # Cache por (escopo do usuário, filtros normalizados, versão dos dados)
+        dados = obter_ou_calcular(
+            'resumo', request.user, request.query_params,
+            lambda: self._calcular(request.user, request.query_params),
         )
-
-        # 🔒 Regra de visibilidade do Gestor (visível | setor | permissão manual)
-        if getattr(user, 'perfil', None) == 'gestor':
-            perm_subq = PermissaoIndicador.objects.filter(usuario=user, indicador=OuterRef('indicador_id'))
-            preenchimentos = preenchimentos.filter(
-                Q(indicador__visibilidade=True) |
-                Q(indicador__setor__in=user.setores.all()) |
-                Exists(perm_subq)
-            )
-
-        # 🔎 Filtros opcionais
-        if setor:
-            preenchimentos = preenchimentos.filter(indicador__setor_id=setor)
-        if indicador:
-            preenchimentos = preenchimentos.filter(indicador_id=indicador)
-        if mes:
-            try:
-                preenchimentos = preenchimentos.filter(mes=int(mes))
-            except ValueError:
-                pass
-        if ano:
-            try:
-                preenchimentos = preenchimentos.filter(ano=int(ano))
-            except ValueError:
-                pass
-
-        # 📊 Atingidos usando MetaMensal (se existir) com fallback para Indicador.valor_meta
-        meta_subq = (
-            MetaMensal.objects
-            .filter(indicador_id=OuterRef('indicador_id'))
-            .annotate(y=ExtractYear('mes'), m=ExtractMonth('mes'))
-            .filter(y=OuterRef('ano'), m=OuterRef('mes'))
-            .values('valor_meta')[:1]
-        )
-
-        preenchimentos = preenchimentos.annotate(
-            valor_meta_ref=Coalesce(Subquery(meta_subq), F('indicador__valor_meta'))
-        )
-
-        agregados = preenchimentos.aggregate(
-            total=Count('id'),
-            atingidos=Sum(
-                Case(
-                    When(valor_realizado__gte=F('valor_meta_ref'), then=1),
-                    default=0,
-                    output_field=IntegerField()
-                )
-            )
-        )
-        total = agregados.get('total') or 0
-        atingidos = agregados.get('atingidos') or 0
-        nao_atingidos = total - atingidos
-
-        dados_por_indicador_qs = (
-            preenchimentos
-            .values('indicador__nome')
+        return Response(dados)
+
+    @staticmethod
+    def _calcular(user, params):
+        # Fatos mensais pré-agregados: custo proporcional ao nº de meses, não de preenchimentos
+        fatos = _build_fatos_queryset(user=user, params=params)
+
+        # 📊 Um único GROUP BY por indicador; os totais saem da soma das linhas
+        dados_por_indicador = list(
+            fatos
+            .order_by()
+            .values('indicador_id', 'indicador__nome')
             .annotate(
                 total=Count('id'),
-                atingidos=Sum(
-                    Case(
-                        When(valor_realizado__gte=F('valor_meta_ref'), then=1),
-                        default=0,
-                        output_field=IntegerField()
-                    )
-                ),
-                nao_atingidos=Sum(
-                    Case(
-                        When(valor_realizado__lt=F('valor_meta_ref'), then=1),
-                        default=0,
-                        output_field=IntegerField()
-                    )
-                ),
+                atingidos=Count('id', filter=Q(atingido=True)),
+                nao_atingidos=Count('id', filter=Q(atingido=False)),
             )
-            .order_by('indicador__nome')
+            .order_by('indicador__nome', 'indicador_id')
         )
 
-        dados_por_indicador = list(dados_por_indicador_qs)
+        total = sum(d['total'] for d in dados_por_indicador)
+        atingidos = sum(d['atingidos'] for d in dados_por_indicador)
+        nao_atingidos = total - atingidos
 
-        return Response({
+        return {
             "total_registros": total,
             "atingidos": atingidos,
             "nao_atingidos": nao_atingidos,
             "detalhes_por_indicador": dados_por_indicador
+        }
+
+
+class SerieTemporalView(APIView):
+    """
+    Séries mensais (ou trimestrais/anuais) por setor ou indicador, calculadas no banco.
+    Parâmetros: nivel=setor|indicador, periodo=mes|trimestre|ano, agregacao=soma|media,
+    desde/ate=AAAA-MM, media_movel=N, yoy=1 e os filtros do relatório (setor, indicador, ano, mes).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        nivel = params.get('nivel') or 'setor'
+        periodo = params.get('periodo') or 'mes'
+        agregacao = params.get('agregacao') or 'soma'
+
+        erros = {}
+        if nivel not in NIVEIS:
+            erros['nivel'] = f"Use um de: {', '.join(NIVEIS)}."
+        if periodo not in PERIODOS:
+            erros['periodo'] = f"Use um de: {', '.join(PERIODOS)}."
+        if agregacao not in AGREGACOES:
+            erros['agregacao'] = f"Use um de: {', '.join(AGREGACOES)}."
+
+        media_movel = None
+        if params.get('media_movel'):
+            try:
+                media_movel = int(params.get('media_movel'))
+                if not (2 <= media_movel <= 36):
+                    raise ValueError
+            except ValueError:
+                erros['media_movel'] = "Janela deve ser um inteiro entre 2 e 36."
+
+        competencias = {}
+        for campo in ('desde', 'ate'):
+            try:
+                competencias[campo] = parse_competencia(params.get(campo), campo)
+            except ValidationError as e:
+                erros.update(e.detail)
+        desde, ate = competencias.get('desde'), competencias.get('ate')
+        if erros:
+            raise ValidationError(erros)
+
+        yoy = str(params.get('yoy')).lower() in ('1', 'true', 't', 'yes', 'y')
+
+        def calcular():
+            fatos = _build_fatos_queryset(user=request.user, params=params)
+            if desde:
+                fatos = fatos.filter(competencia__gte=desde)
+            if ate:
+                fatos = fatos.filter(competencia__lte=ate)
+            return montar_series(
+                fatos, nivel=nivel, periodo=periodo, agregacao=agregacao,
+                media_movel=media_movel, yoy=yoy,
+            )
+
+        series = obter_ou_calcular('series', request.user, params, calcular)
+        return Response({
+            "nivel": nivel,
+            "periodo": periodo,
+            "agregacao": agregacao,
+            "series": series,
         })
 
 
 # =========================
 #    EXPORTAÇÕES (PDF/XLSX)
 # =========================
+def _resposta_job(request, job):
+    """202 + job: o cliente acompanha em 'url' até 'download_url' ficar disponível."""
+    dados = ExportacaoRelatorioSerializer(job, context={'request': request}).data
+    dados['url'] = request.build_absolute_uri(reverse('relatorio-exportacao', args=[job.pk]))
+    return Response(dados, status=status.HTTP_202_ACCEPTED)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def relatorio_pdf(request):
-    return gerar_relatorio_pdf()
+    # Relatórios grandes (ou ?assincrono=1) viram job em segundo plano
+    job = exportacao_em_segundo_plano(request.user, request.query_params, ExportacaoRelatorio.FORMATO_PDF)
+    if job is not None:
+        return _resposta_job(request, job)
+    # Escopo do usuário + mesmos filtros da tela de relatórios
+    return gerar_relatorio_pdf(user=request.user, params=request.query_params)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def relatorio_excel(request):
-    return gerar_relatorio_excel()
+    job = exportacao_em_segundo_plano(request.user, request.query_params, ExportacaoRelatorio.FORMATO_XLSX)
+    if job is not None:
+        return _resposta_job(request, job)
+    # Escopo do usuário + mesmos filtros da tela de relatórios
+    return gerar_relatorio_excel(user=request.user, params=request.query_params)
+
+
+def _job_do_usuario(request, pk):
+    """Jobs são compartilhados por quem tem o mesmo escopo de visibilidade."""
+    job = get_object_or_404(ExportacaoRelatorio, pk=pk)
+    if job.escopo != hash_escopo(request.user):
+        raise NotFound()
+    return job
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def relatorio_exportacao(request, pk):
+    job = _job_do_usuario(request, pk)
+    return Response(ExportacaoRelatorioSerializer(job, context={'request': request}).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def relatorio_exportacao_download(request, pk):
+    job = _job_do_usuario(request, pk)
+    if job.status != ExportacaoRelatorio.CONCLUIDO or not job.arquivo:
+        return Response({"detail": "Exportação ainda não concluída."}, status=status.HTTP_409_CONFLICT)
+    storage = storage_exportacoes()
+    if not storage.exists(job.arquivo):
+        raise NotFound("Arquivo da exportação expirado.")
+    filename = f"relatorio.{job.formato}"
+
+    # Permissão já conferida aqui: o nginx só entrega a location interna (X-Accel-Redirect)
+    delegado = delegar_ao_proxy(storage.path(job.arquivo), job.arquivo, settings.REPORT_EXPORT_ACCEL_PREFIX)
+    if delegado is not None:
+        delegado['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        delegado['Content-Disposition'] = f'attachment; filename="{filename}"'
+        delegado['Cache-Control'] = 'private, no-store'
+        return delegado
+    response = FileResponse(storage.open(job.arquivo, 'rb'), as_attachment=True, filename=filename)
+    response['Cache-Control'] = 'private, no-store'
+    return response
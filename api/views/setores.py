@@ -1,7 +1,7 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 
-from api.models import Setor
+from api.models import LogDeAcao, Setor
 from api.serializers import SetorSerializer
 from api.utils import registrar_log
 from api.permissions import IsMasterOrReadOnly  # leitura p/ autenticados; escrita só Master
@@ -14,18 +14,18 @@ class SetorViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         obj = serializer.save()
-        registrar_log(self.request.user, f"Cadastrou o setor '{obj.nome}'")
+        registrar_log(self.request.user, f"Cadastrou o setor '{obj.nome}'", tipo_acao=LogDeAcao.SETOR_CRIADO, setor=obj)
         return obj
 
     def perform_update(self, serializer):
         nome_anterior = serializer.instance.nome
         obj = serializer.save()
-        registrar_log(self.request.user, f"Editou o setor '{nome_anterior}'")
+        registrar_log(self.request.user, f"Editou o setor '{nome_anterior}'", tipo_acao=LogDeAcao.SETOR_EDITADO, setor=obj)
         return obj
 
     def destroy(self, request, *args, **kwargs):
         setor = self.get_object()
-        nome = setor.nome
+        nome, setor_id = setor.nome, setor.pk
         setor.delete()
-        registrar_log(request.user, f"Excluiu o setor '{nome}'")
+        registrar_log(request.user, f"Excluiu o setor '{nome}'", tipo_acao=LogDeAcao.SETOR_EXCLUIDO, setor=setor_id)
         return Response({"detail": "Setor excluído com sucesso."}, status=status.HTTP_204_NO_CONTENT)
@@ -6,9 +6,10 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError
 
-from api.models import Usuario, LogDeAcao
+from api.models import LogDeAcao, Usuario
 from api.serializers import UsuarioSerializer
 from api.permissions import IsMasterUser
+from api.utils import registrar_log
 
 
 class UsuarioViewSet(viewsets.ModelViewSet):
@@ -115,8 +116,6 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         usuario_alvo.set_password(nova_senha)
         usuario_alvo.save()
 
-        LogDeAcao.objects.create(
-            usuario=solicitante,
-            acao=f"Alterou a senha do usuário '{usuario_alvo.first_name or usuario_alvo.email}'"
-        )
+        registrar_log(solicitante, f"Alterou a senha do usuário '{usuario_alvo.first_name or usuario_alvo.email}'",
+                      tipo_acao=LogDeAcao.SENHA_ALTERADA)
         return Response({"mensagem": "Senha alterada com sucesso."}, status=status.HTTP_200_OK)
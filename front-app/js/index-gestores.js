@@ -110,59 +110,24 @@ async function gestorPodeEditarMeta() {
   } catch (_) { return false; }
 }
 
-/* === Upsert de meta mensal via API === */
+/* === Upsert de meta mensal via API (uma requisição: /metas-mensais/bulk/) === */
 async function upsertMetaMensal(indicadorId, competenciaYYYYMM, valorMeta) {
-  const mesISO = `${competenciaYYYYMM}-01`; // backend espera "YYYY-MM-01"
-
-  // 1) Verifica se já existe meta para o mês
-  const resCheck = await fetch(
-    `${apiBase}/metas-mensais/?indicador=${indicadorId}&mes=${mesISO}`,
-    { headers: { "Authorization": `Bearer ${token}` } }
-  );
-
-  if (!resCheck.ok) {
-    const msg = await resCheck.text().catch(() => "");
-    throw new Error(`Falha ao consultar metas mensais. ${msg}`);
-  }
-
-  const data = await resCheck.json();
-  const existentes = Array.isArray(data?.results) ? data.results : (Array.isArray(data) ? data : []);
-
-  // 2) Se existe, PATCH; se não, POST
-  if (existentes.length > 0) {
-    const id = existentes[0].id;
-    const r = await fetch(`${apiBase}/metas-mensais/${id}/`, {
-      method: "PATCH",
-      headers: {
-        "Content-Type": "application/json",
-        "Authorization": `Bearer ${token}`
-      },
-      body: JSON.stringify({ valor_meta: Number(valorMeta) })
-    });
-    if (!r.ok) {
-      const msg = await r.text().catch(() => "");
-      throw new Error(`Falha ao atualizar a meta mensal. ${msg}`);
-    }
-    return await r.json();
-  } else {
-    const r = await fetch(`${apiBase}/metas-mensais/`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-        "Authorization": `Bearer ${token}`
-      },
-      body: JSON.stringify({
-        indicador: indicadorId,
-        mes: mesISO,                      // <<< campo correto
-        valor_meta: Number(valorMeta)
-      })
-    });
-    if (!r.ok) {
-      const msg = await r.text().catch(() => "");
-      throw new Error(`Falha ao criar a meta mensal. ${msg}`);
-    }
-    return await r.json();
+  const r = await fetch(`${apiBase}/metas-mensais/bulk/`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "Authorization": `Bearer ${token}`
+    },
+    body: JSON.stringify({
+      metas: [{ indicador: indicadorId, mes: competenciaYYYYMM, valor_meta: Number(valorMeta) }]
+    })
+  });
+  if (!r.ok) {
+    const msg = await r.text().catch(() => "");
+    throw new Error(`Falha ao salvar a meta mensal. ${msg}`);
   }
+  const data = await r.json();
+  return data.metas[0];
 }
 
 /* === Ação do botão da tabela === */
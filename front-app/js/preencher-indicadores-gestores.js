@@ -339,14 +339,20 @@ async function carregarPreenchimentos() {
   const token = localStorage.getItem('access');
 
   try {
-    const res = await fetch(`${window.API_BASE_URL}/api/preenchimentos/meus/`, {
-      headers: { 'Authorization': `Bearer ${token}` }
-    });
-
-    if (!res.ok) throw new Error("Erro ao buscar preenchimentos");
-
-    const data = await res.json();
-    if (!Array.isArray(data)) throw new Error("Resposta inválida (esperado array)");
+    // Paginação keyset: segue 'next' até acabar
+    const data = [];
+    let url = `${window.API_BASE_URL}/api/preenchimentos/meus/`;
+    while (url) {
+      const res = await fetch(url, {
+        headers: { 'Authorization': `Bearer ${token}` }
+      });
+
+      if (!res.ok) throw new Error("Erro ao buscar preenchimentos");
+
+      const page = await res.json();
+      data.push(...asList(page));
+      url = Array.isArray(page) ? null : page.next;
+    }
 
     // 🔹 Limpa e repopula conforme a regra
     preenchimentosRealizados = new Set();
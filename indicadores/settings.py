@@ -9,6 +9,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 ENV_FILE = BASE_DIR / '.env'
 config = Config(RepositoryEnv(str(ENV_FILE)))
 FRONTEND_DIR = os.path.join(BASE_DIR, 'front-app')
+# Saída do 'manage.py empacotar_front' (nomes com hash + .gz/.br); servida no lugar do FRONTEND_DIR quando existe
+FRONTEND_BUILD_DIR = config('FRONTEND_BUILD_DIR', default=os.path.join(BASE_DIR, 'front-build'))
 
 # === SEGURANÇA E DEPLOY ===
 SECRET_KEY = config('SECRET_KEY', default='__TEMP_DEV_SECRET_REPLACE_ME__')
@@ -54,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.AuditoriaMiddleware',  # logs de ação agrupados por requisição
 ]
 
 # === TEMPLATES ===
@@ -89,6 +92,30 @@ DATABASES = {
     }
 }
 
+# === CACHE ===
+# Sem REDIS_URL: cache local por processo (desenvolvimento / worker único)
+# ⚠️ Em produção (DEBUG=False) sem REDIS_URL o cache de relatórios fica desligado:
+# com LocMem cada worker guardaria sua cópia e serviria dados antigos
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+REPORT_CACHE_ATIVO = config('REPORT_CACHE_ATIVO', default=bool(REDIS_URL) or DEBUG, cast=bool)
+
+# Configurações do sistema/armazenamento em cache por processo (segundos)
+CONFIG_CACHE_TTL = config('CONFIG_CACHE_TTL', default=30, cast=int)
+
 # === AUTENTICAÇÃO E USUÁRIO ===
 AUTH_USER_MODEL = 'api.Usuario'
 
@@ -113,6 +140,58 @@ STATIC_ROOT = '/home/gestorkpi/www/static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/home/gestorkpi/www/media'
 
+# Entrega de /front-app/ e /media/ (api.views.arquivos.servir_arquivo)
+ARQUIVOS_MAX_AGE_IMUTAVEL = config('ARQUIVOS_MAX_AGE_IMUTAVEL', default=31536000, cast=int)  # nomes com hash
+ARQUIVOS_MAX_AGE = config('ARQUIVOS_MAX_AGE', default=0, cast=int)  # 0 → no-cache (revalida com ETag)
+# '' (Django transmite) | 'x-accel' (nginx, usa os prefixos internos abaixo) | 'x-sendfile' (Apache/lighttpd)
+ARQUIVOS_OFFLOAD = config('ARQUIVOS_OFFLOAD', default='')
+FRONT_ACCEL_PREFIX = config('FRONT_ACCEL_PREFIX', default='/_interno/front-app/')
+MEDIA_ACCEL_PREFIX = config('MEDIA_ACCEL_PREFIX', default='/_interno/media/')
+
+# === UPLOAD ASSÍNCRONO DE PROVAS ===
+UPLOAD_STAGING_DIR = config('UPLOAD_STAGING_DIR', default='/home/gestorkpi/www/staging')
+UPLOAD_WORKERS = config('UPLOAD_WORKERS', default=2, cast=int)
+# Conexões HTTP por cliente de storage (S3); mantenha >= UPLOAD_WORKERS
+STORAGE_MAX_POOL_CONNECTIONS = config('STORAGE_MAX_POOL_CONNECTIONS', default=10, cast=int)
+UPLOAD_MAX_TENTATIVAS = config('UPLOAD_MAX_TENTATIVAS', default=3, cast=int)
+UPLOAD_BACKOFF_SEGUNDOS = config('UPLOAD_BACKOFF_SEGUNDOS', default=2, cast=float)
+UPLOAD_PIPELINE_EAGER = config('UPLOAD_PIPELINE_EAGER', default=False, cast=bool)  # executa inline (testes)
+# Tamanho máximo da prova; multipart bem acima disso é recusado antes de ler o corpo
+# (api.upload_handlers.LimiteProvaMixin, só nas views de preenchimento)
+PROVA_MAX_BYTES = config('PROVA_MAX_BYTES', default=2 * 1024 * 1024, cast=int)
+# Parte/bloco/chunk dos envios em partes (S3 multipart, Azure blocks, GCS resumível)
+STORAGE_PARTE_BYTES = config('STORAGE_PARTE_BYTES', default=8 * 1024 * 1024, cast=int)
+# Lado máximo (px) das variantes WebP geradas para provas em imagem
+PROVA_PREVIEW_PX = config('PROVA_PREVIEW_PX', default=1280, cast=int)
+PROVA_MINIATURA_PX = config('PROVA_MINIATURA_PX', default=320, cast=int)
+
+# === RELATÓRIOS ===
+REPORT_PDF_PARALELO_MIN_LINHAS = config('REPORT_PDF_PARALELO_MIN_LINHAS', default=20000, cast=int)
+REPORT_PDF_WORKERS = config('REPORT_PDF_WORKERS', default=4, cast=int)
+REPORT_CACHE_TIMEOUT = config('REPORT_CACHE_TIMEOUT', default=3600, cast=int)
+# PDF/XLSX com mais linhas que isso são gerados em segundo plano (202 + job)
+REPORT_EXPORT_ASYNC_MIN_LINHAS = config('REPORT_EXPORT_ASYNC_MIN_LINHAS', default=5000, cast=int)
+REPORT_EXPORT_WORKERS = config('REPORT_EXPORT_WORKERS', default=2, cast=int)
+REPORT_EXPORT_EAGER = config('REPORT_EXPORT_EAGER', default=False, cast=bool)  # testes/dev: gera no commit
+# Arquivos das exportações: fora do MEDIA_ROOT (não são públicos), entregues só pelo download autenticado
+REPORT_EXPORT_ROOT = config('REPORT_EXPORT_ROOT', default='/home/gestorkpi/www/exportacoes')
+REPORT_EXPORT_ACCEL_PREFIX = config('REPORT_EXPORT_ACCEL_PREFIX', default='/_interno/exportacoes/')  # ARQUIVOS_OFFLOAD
+# Job na fila/gerando além disso é dado como falho e refeito; arquivos vivem REPORT_EXPORT_TTL_HORAS
+REPORT_EXPORT_TIMEOUT = config('REPORT_EXPORT_TIMEOUT', default=1800, cast=int)  # segundos
+REPORT_EXPORT_TTL_HORAS = config('REPORT_EXPORT_TTL_HORAS', default=24, cast=int)
+
+# === TAREFAS AGENDADAS ===
+# Virada de mês: 'manage.py rollover_mensal' no crontab (ex.: de hora em hora);
+# o watermark (RolloverMensal) torna as execuções repetidas no-op
+# Cria Preenchimento zerado ('backfill-auto') nos meses sem preenchimento
+ROLLOVER_PLACEHOLDERS = config('ROLLOVER_PLACEHOLDERS', default=False, cast=bool)
+ROLLOVER_AUTOR_EMAIL = config('ROLLOVER_AUTOR_EMAIL', default='')  # vazio → master ativo mais antigo
+
+# === AUDITORIA ===
+# Logs de ação ficam em memória até o commit/fim da requisição; jobs longos
+# (e transações longas) gravam a cada N registros
+AUDITORIA_BUFFER_MAX = config('AUDITORIA_BUFFER_MAX', default=500, cast=int)
+
 # === DJANGO REST FRAMEWORK ===
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
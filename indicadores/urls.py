@@ -1,9 +1,12 @@
+import os
+
 from django.contrib import admin
 from django.urls import path, re_path, include
 from django.views.generic import RedirectView
 from django.conf import settings
-from django.conf.urls.static import static  # opcional em DEV
-from django.views.static import serve as static_serve
+
+from api.views.arquivos import servir_arquivo
+from api.services.estaticos import MANIFESTO
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -15,15 +18,22 @@ urlpatterns = [
 ]
 
 # Servir os arquivos do front em /front-app/...
+# Com build (manage.py empacotar_front) serve a versão com hash + pré-comprimida;
+# sem build, os fontes direto (DEV)
+FRONT_ROOT = (
+    settings.FRONTEND_BUILD_DIR
+    if os.path.isfile(os.path.join(settings.FRONTEND_BUILD_DIR, MANIFESTO))
+    else settings.FRONTEND_DIR
+)
 urlpatterns += [
-    re_path(r'^front-app/(?P<path>.*)$', static_serve, {'document_root': settings.FRONTEND_DIR}),
+    re_path(r'^front-app/(?P<path>.*)$', servir_arquivo, {
+        'document_root': FRONT_ROOT, 'prefixo_interno': settings.FRONT_ACCEL_PREFIX,
+    }),
 ]
 
 # Servir uploads (provas) em /media/...
 urlpatterns += [
-    re_path(r'^media/(?P<path>.*)$', static_serve, {'document_root': settings.MEDIA_ROOT}),
+    re_path(r'^media/(?P<path>.*)$', servir_arquivo, {
+        'document_root': settings.MEDIA_ROOT, 'prefixo_interno': settings.MEDIA_ACCEL_PREFIX,
+    }),
 ]
-
-# (Opcional – útil em DEV) também expõe /media/ via helper do Django
-# Não conflita com o re_path acima.
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)